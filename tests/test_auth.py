@@ -38,7 +38,7 @@ def test_get_credentials_valid(monkeypatch):
     mock_creds = MagicMock(spec=Credentials)
     mock_creds.expired = False
     monkeypatch.setattr(
-        'utils.auth.Credentials.from_authorized_user_info',
+        'utils.auth.credentials.Credentials.from_authorized_user_info',
         MagicMock(return_value=mock_creds),
     )
 
@@ -61,7 +61,7 @@ def test_get_credentials_invalid(monkeypatch):
     mock_creds.expired = True
     mock_creds.refresh.side_effect = Exception('invalid_scope')
     monkeypatch.setattr(
-        'utils.auth.Credentials.from_authorized_user_info',
+        'utils.auth.credentials.Credentials.from_authorized_user_info',
         MagicMock(return_value=mock_creds),
     )
 
@@ -0,0 +1,174 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the cache module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import os
+import sys
+
+sys.path.append('.')
+
+import pytest
+
+from utils.cache import VideoCache
+
+
+def writer(size):
+    def write(path):
+        with open(path, 'wb') as file:
+            file.write(b'x' * size)
+
+    return write
+
+
+def test_fetch_creates_nested_directories(tmp_path):
+    """Blob names with prefixes are written into subdirectories.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    cache = VideoCache(str(tmp_path))
+
+    path = cache.fetch('brand/2025/ad.mp4', writer(10))
+
+    assert path == str(tmp_path / 'brand' / '2025' / 'ad.mp4')
+    assert os.path.getsize(path) == 10
+    assert cache.size == 10
+
+
+def test_fetch_hit_does_not_rewrite(tmp_path):
+    """A cached file is returned without calling the writer again.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    cache = VideoCache(str(tmp_path))
+    cache.fetch('ad.mp4', writer(10))
+
+    def fail(_):
+        raise AssertionError('writer called on a cache hit')
+
+    assert cache.fetch('ad.mp4', fail).endswith('ad.mp4')
+
+
+def test_failed_write_leaves_no_file(tmp_path):
+    """A failed download does not leave partial files behind.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    cache = VideoCache(str(tmp_path))
+
+    def broken(path):
+        with open(path, 'wb') as file:
+            file.write(b'partial')
+        raise OSError('connection reset')
+
+    with pytest.raises(OSError):
+        cache.fetch('ad.mp4', broken)
+
+    assert os.listdir(tmp_path) == []
+    assert cache.size == 0
+
+
+def test_evicts_least_recently_used(tmp_path):
+    """Files are evicted in LRU order once the budget is exceeded.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    cache = VideoCache(str(tmp_path), max_bytes=25)
+    first = cache.fetch('a/first.mp4', writer(10))
+    cache.fetch('second.mp4', writer(10))
+    cache.fetch('a/first.mp4', writer(10))
+
+    cache.fetch('third.mp4', writer(10))
+
+    assert os.path.exists(first)
+    assert not os.path.exists(tmp_path / 'second.mp4')
+    assert cache.size == 20
+
+
+def test_pinned_files_are_not_evicted(tmp_path):
+    """Pinned files survive eviction until they are released.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    cache = VideoCache(str(tmp_path), max_bytes=15)
+    pinned = cache.fetch('a/pinned.mp4', writer(10), pin=True)
+
+    cache.fetch('other.mp4', writer(10))
+
+    assert os.path.exists(pinned)
+    cache.release(pinned)
+    assert not os.path.exists(pinned)
+    assert not os.path.exists(tmp_path / 'a')
+
+
+def test_refresh_rewrites_a_cached_file(tmp_path):
+    """A refreshing fetch writes an overwritten object again in place.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    cache = VideoCache(str(tmp_path))
+    path = cache.fetch('ad.mp4', writer(10))
+
+    assert cache.fetch('ad.mp4', writer(20), refresh=True) == path
+    assert os.path.getsize(path) == 20
+    assert cache.size == 20
+
+
+def test_refresh_keeps_a_pinned_copy_until_released(tmp_path):
+    """A new version of a pinned file gets a fresh path.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    cache = VideoCache(str(tmp_path))
+    old = cache.fetch('ad.mp4', writer(10), pin=True)
+
+    new = cache.fetch('ad.mp4', writer(20), pin=True, refresh=True)
+
+    assert new != old
+    assert new.endswith('.mp4')
+    assert os.path.getsize(old) == 10
+    assert os.path.getsize(new) == 20
+    cache.release(old)
+    assert not os.path.exists(old)
+    assert os.path.getsize(new) == 20
+    assert cache.size == 20
+    assert cache.fetch('ad.mp4', writer(30), refresh=True) == old
+    assert os.path.getsize(old) == 30
+
+
+def test_rejects_names_outside_root(tmp_path):
+    """Object names cannot escape the cache directory.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    cache = VideoCache(str(tmp_path / 'cache'))
+
+    with pytest.raises(ValueError, match='Invalid object name'):
+        cache.path_for('../escape.mp4')
+
+
+def test_scan_indexes_existing_files(tmp_path):
+    """Files from previous runs count towards the budget.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    (tmp_path / 'old.mp4').write_bytes(b'x' * 5)
+    (tmp_path / '.stale.part').write_bytes(b'x' * 5)
+    (tmp_path / '.gitkeep').write_bytes(b'')
+
+    cache = VideoCache(str(tmp_path))
+
+    assert cache.size == 5
+    assert not (tmp_path / '.stale.part').exists()
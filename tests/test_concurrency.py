@@ -0,0 +1,79 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the concurrency module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+from utils.concurrency import AdaptiveConcurrencyController, is_overload_error
+
+
+class QuotaError(Exception):
+    code = 429
+
+
+def test_is_overload_error():
+    """Quota errors and timeouts are overload, other errors are not."""
+    assert is_overload_error(QuotaError('quota'))
+    assert is_overload_error(Exception('429 RESOURCE_EXHAUSTED.'))
+    assert is_overload_error(TimeoutError())
+    assert not is_overload_error(ValueError('bad request'))
+
+
+def test_limit_increases_additively_when_healthy():
+    """Healthy windows raise the limit by one at a time."""
+    controller = AdaptiveConcurrencyController(initial_limit=2, max_limit=4)
+
+    for _ in range(5):
+        controller.record_success(time.monotonic())
+
+    assert controller.limit == 3
+    for _ in range(100):
+        controller.record_success(time.monotonic())
+    assert controller.limit == 4
+
+
+def test_limit_decreases_multiplicatively_on_overload():
+    """Overload halves the limit once per burst of failures."""
+    controller = AdaptiveConcurrencyController(initial_limit=8, max_limit=8)
+    started = time.monotonic()
+
+    assert controller.record_failure(started, QuotaError())
+    assert controller.record_failure(started, QuotaError())
+
+    assert controller.limit == 4
+    assert [limit for _, limit in controller.history] == [8, 4]
+
+
+def test_call_retries_overloaded_calls(monkeypatch):
+    """Overloaded calls are retried, other errors are raised.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    """
+    monkeypatch.setattr('utils.concurrency.time.sleep', MagicMock())
+    controller = AdaptiveConcurrencyController(initial_limit=2, max_limit=2)
+    function = MagicMock(side_effect=[QuotaError(), 'result'])
+
+    assert controller.call(function, 'video.mp4') == 'result'
+    assert function.call_count == 2
+
+    with pytest.raises(ValueError, match='bad'):
+        controller.call(MagicMock(side_effect=ValueError('bad')))
@@ -76,6 +76,72 @@ def test_config_initialization_from_file(monkeypatch):
     assert config.model == 'test_model'
 
 
+def test_config_overrides(monkeypatch):
+    """Overrides, e.g. of a tenant, replace the values of the file.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    """
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file',
+        MagicMock(return_value={'bucket_name': 'shared', 'model': 'base'}),
+    )
+
+    config = Config({'bucket_name': 'tenant', 'tenant_name': 'acme'})
+
+    assert config.bucket_name == 'tenant'
+    assert config.model == 'base'
+    assert config.tenant_name == 'acme'
+    assert config.tenant_weight == 1
+
+
+def test_config_keeps_zero_retries(monkeypatch):
+    """An explicit max_retries of 0 disables retries instead of defaulting.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    """
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file',
+        MagicMock(return_value={'max_retries': 0}),
+    )
+
+    assert Config().max_retries == 0
+    assert Config({'max_retries': None}).max_retries == 3
+
+
+def test_config_keeps_zero_segment_overlap(monkeypatch):
+    """Segments can be configured without any overlap.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    """
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file',
+        MagicMock(
+            return_value={'segment_seconds': 5, 'segment_overlap_seconds': 0}
+        ),
+    )
+
+    assert Config().segment_overlap_seconds == 0
+    assert (
+        Config({'segment_overlap_seconds': None}).segment_overlap_seconds == 5
+    )
+
+
+def test_config_keeps_zero_request_timeout(monkeypatch):
+    """A request_timeout_seconds of 0 lets calls run without a deadline.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    """
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file',
+        MagicMock(return_value={'request_timeout_seconds': 0}),
+    )
+
+    assert Config().request_timeout_seconds == 0
+    assert Config(
+        {'request_timeout_seconds': None}
+    ).request_timeout_seconds == (600)
+
+
 def test_config_credentials_valid(monkeypatch):
     """Tests the credentials property with valid credentials.
     Args:
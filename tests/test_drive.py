@@ -0,0 +1,212 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the drive module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import threading
+from pathlib import Path
+
+import pytest
+
+from utils.cache import VideoCache
+from utils.drive import DriveVideoSource, parse_folder_id
+
+_FOLDER = 'application/vnd.google-apps.folder'
+
+
+class FakeDriveClient:
+    """In-memory stand-in for the Drive API with a changes feed."""
+
+    def __init__(self):
+        self.items = {}
+        self.changes = []
+        self.listed = []
+        self.downloaded = []
+        self._lock = threading.Lock()
+
+    def put(self, file_id, name, parent, content=None):
+        item = {
+            'id': file_id,
+            'name': name,
+            'parents': [parent],
+            'mimeType': _FOLDER if content is None else 'video/mp4',
+        }
+        if content is not None:
+            item['md5Checksum'] = str(hash(content))
+            item['content'] = content
+        self.items[file_id] = item
+        self.changes.append({'fileId': file_id, 'file': item})
+
+    def list_children(self, folder_id):
+        with self._lock:
+            self.listed.append(folder_id)
+        return [
+            item for item in self.items.values() if folder_id in item['parents']
+        ]
+
+    def download(self, file_id, path):
+        with self._lock:
+            self.downloaded.append(file_id)
+        Path(path).write_bytes(self.items[file_id]['content'])
+
+    def get_start_page_token(self):
+        return str(len(self.changes))
+
+    def list_changes(self, page_token):
+        return self.changes[int(page_token) :], str(len(self.changes))
+
+
+@pytest.fixture
+def drive():
+    """Drive tree with videos in nested folders."""
+    client = FakeDriveClient()
+    client.put('sub', 'campaign', 'root')
+    client.put('deep', 'cuts', 'sub')
+    client.put('a', 'a.mp4', 'root', b'a')
+    client.put('b', 'b.MP4', 'sub', b'b')
+    client.put('c', 'c.mp4', 'deep', b'c')
+    client.put('notes', 'notes.txt', 'sub', b'notes')
+    return client
+
+
+def make_source(client, tmp_path):
+    return DriveVideoSource(
+        client,
+        'root',
+        VideoCache(str(tmp_path / 'cache')),
+        str(tmp_path / 'state.json'),
+        ['.mp4'],
+        max_workers=4,
+    )
+
+
+def test_parse_folder_id():
+    """Folder ids are extracted from the common Drive URL formats."""
+    assert parse_folder_id('https://drive.google.com/drive/folders/ab-C1') == (
+        'ab-C1'
+    )
+    assert parse_folder_id('https://drive.google.com/open?id=xyz') == 'xyz'
+    assert parse_folder_id(' xyz ') == 'xyz'
+
+
+def test_first_sync_lists_tree_and_downloads(drive, tmp_path):
+    """The first run walks every folder and downloads every video.
+    Args:
+        drive: Fake Drive fixture.
+        tmp_path: pytest temporary directory fixture.
+    """
+    source = make_source(drive, tmp_path)
+
+    videos = source.sync()
+    paths = list(source.iter_downloads(videos))
+    source.commit()
+
+    assert [video['path'] for video in videos] == [
+        'a.mp4',
+        'campaign/b.MP4',
+        'campaign/cuts/c.mp4',
+    ]
+    assert sorted(drive.listed) == ['deep', 'root', 'sub']
+    assert [Path(path).read_bytes() for path in paths] == [b'a', b'b', b'c']
+
+
+def test_next_sync_only_returns_new_or_modified(drive, tmp_path):
+    """Later runs use the changes feed instead of listing the tree.
+    Args:
+        drive: Fake Drive fixture.
+        tmp_path: pytest temporary directory fixture.
+    """
+    source = make_source(drive, tmp_path)
+    list(source.iter_downloads(source.sync()))
+    source.commit()
+    drive.listed.clear()
+    drive.downloaded.clear()
+
+    drive.put('b', 'b.MP4', 'sub', b'b2')
+    drive.put('new', 'new', 'deep')
+    drive.put('d', 'd.mp4', 'new', b'd')
+    drive.put('outside', 'x.mp4', 'elsewhere', b'x')
+    source = make_source(drive, tmp_path)
+    videos = source.sync()
+    paths = list(source.iter_downloads(videos))
+
+    assert [video['path'] for video in videos] == [
+        'campaign/b.MP4',
+        'campaign/cuts/new/d.mp4',
+    ]
+    assert drive.listed == []
+    assert sorted(drive.downloaded) == ['b', 'd']
+    assert Path(paths[0]).read_bytes() == b'b2'
+
+
+def test_uncommitted_sync_is_repeated(drive, tmp_path):
+    """Videos are returned again if the previous run did not commit.
+    Args:
+        drive: Fake Drive fixture.
+        tmp_path: pytest temporary directory fixture.
+    """
+    make_source(drive, tmp_path).sync()
+
+    assert len(make_source(drive, tmp_path).sync()) == 3
+
+
+def test_videos_without_results_are_synced_again(drive, tmp_path):
+    """Only the videos analyzed successfully are committed as seen.
+    Args:
+        drive: Fake Drive fixture.
+        tmp_path: pytest temporary directory fixture.
+    """
+    source = make_source(drive, tmp_path)
+    paths = list(source.iter_downloads(source.sync()))
+    source.commit(analyzed=paths[:1])
+
+    source = make_source(drive, tmp_path)
+    videos = source.sync()
+    list(source.iter_downloads(videos))
+    source.commit(analyzed=[])
+
+    assert [video['id'] for video in videos] == ['b', 'c']
+    assert [video['id'] for video in make_source(drive, tmp_path).sync()] == [
+        'b',
+        'c',
+    ]
+
+
+def test_renamed_folder_moves_its_descendants(drive, tmp_path):
+    """Renaming or moving a folder updates the paths below it.
+    Args:
+        drive: Fake Drive fixture.
+        tmp_path: pytest temporary directory fixture.
+    """
+    source = make_source(drive, tmp_path)
+    list(source.iter_downloads(source.sync()))
+    source.commit()
+
+    drive.put('sub', 'renamed', 'root')
+    drive.put('e', 'e.mp4', 'deep', b'e')
+    assert [video['path'] for video in make_source(drive, tmp_path).sync()] == [
+        'renamed/cuts/e.mp4'
+    ]
+
+    drive.put('deep', 'cuts', 'elsewhere')
+    drive.put('f', 'f.mp4', 'sub', b'f')
+    source = make_source(drive, tmp_path)
+    assert [video['path'] for video in source.sync()] == ['renamed/f.mp4']
+    assert sorted(
+        video['path'] for video in source._pending_state['videos'].values()
+    ) == ['a.mp4', 'renamed/b.MP4', 'renamed/f.mp4']
@@ -0,0 +1,151 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the gcs module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from utils.config import Config
+from utils.gcs import list_video_blobs
+
+
+class FakeIterator(list):
+    def __init__(self, items, prefixes=()):
+        super().__init__(items)
+        self.prefixes = set(prefixes)
+
+
+def make_blob(name, updated=None, content_type='video/mp4'):
+    blob = MagicMock()
+    blob.name = name
+    blob.updated = updated or datetime(2025, 1, 1, tzinfo=timezone.utc)
+    blob.content_type = content_type
+    return blob
+
+
+class FakeClient:
+    def __init__(self, blobs):
+        self.blobs = blobs
+        self.calls = []
+
+    def list_blobs(self, bucket_name, prefix=None, delimiter=None, **kwargs):
+        self.calls.append(
+            {
+                'bucket_name': bucket_name,
+                'prefix': prefix,
+                'delimiter': delimiter,
+                **kwargs,
+            }
+        )
+        prefix = prefix or ''
+        items, prefixes = [], set()
+        for blob in self.blobs:
+            if not blob.name.startswith(prefix):
+                continue
+            rest = blob.name[len(prefix) :]
+            if delimiter and delimiter in rest:
+                prefixes.add(prefix + rest.split(delimiter)[0] + delimiter)
+            else:
+                items.append(blob)
+        return FakeIterator(items, prefixes)
+
+
+@pytest.fixture
+def config(monkeypatch):
+    """Config object with the default listing options."""
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file',
+        MagicMock(return_value={'bucket_name': 'test_bucket'}),
+    )
+    return Config()
+
+
+def test_list_video_blobs_filters_by_extension(config):
+    """Only real video extensions are listed, regardless of case.
+    Args:
+        config: Config fixture.
+    """
+    client = FakeClient(
+        [
+            make_blob('a.mp4'),
+            make_blob('b.MP4'),
+            make_blob('mp4_notes.txt'),
+            make_blob('folder/'),
+        ]
+    )
+
+    blobs = list_video_blobs(client, config)
+
+    assert [blob.name for blob in blobs] == ['a.mp4', 'b.MP4']
+
+
+def test_list_video_blobs_shards_by_prefix(config):
+    """Discovered prefixes are listed as separate shards with projection.
+    Args:
+        config: Config fixture.
+    """
+    client = FakeClient(
+        [
+            make_blob('root.mp4'),
+            make_blob('x/one.mp4'),
+            make_blob('y/two.mp4'),
+            make_blob('y/deep/three.mp4'),
+        ]
+    )
+
+    blobs = list_video_blobs(client, config)
+
+    assert [blob.name for blob in blobs] == [
+        'root.mp4',
+        'x/one.mp4',
+        'y/deep/three.mp4',
+        'y/two.mp4',
+    ]
+    shard_prefixes = {call['prefix'] for call in client.calls}
+    assert {call['bucket_name'] for call in client.calls} == {'test_bucket'}
+    assert {'x/', 'y/'} <= shard_prefixes
+    assert all('items(name,size' in call['fields'] for call in client.calls)
+
+
+def test_list_video_blobs_applies_filters(config):
+    """Configured prefixes, exclusions and updated_since are honoured.
+    Args:
+        config: Config fixture.
+    """
+    config.gcs_prefixes = ['ads/']
+    config.gcs_include_glob = 'ads/**.mp4'
+    config.gcs_exclude_globs = ['ads/drafts/*']
+    config.updated_since = '2025-06-01'
+    client = FakeClient(
+        [
+            make_blob('ads/new.mp4', datetime(2025, 7, 1, tzinfo=timezone.utc)),
+            make_blob('ads/old.mp4'),
+            make_blob(
+                'ads/drafts/new.mp4', datetime(2025, 7, 1, tzinfo=timezone.utc)
+            ),
+            make_blob('other/new.mp4'),
+        ]
+    )
+
+    blobs = list_video_blobs(client, config)
+
+    assert [blob.name for blob in blobs] == ['ads/new.mp4']
+    assert client.calls[0]['match_glob'] == 'ads/**.mp4'
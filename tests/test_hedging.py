@@ -0,0 +1,150 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the hedging module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import threading
+import time
+
+import pytest
+
+from utils.concurrency import AdaptiveConcurrencyController
+from utils.hedging import HedgedCaller
+
+
+def warmed_up_caller(max_hedge_ratio=1.0, controller=None):
+    caller = HedgedCaller(
+        percentile=90,
+        max_hedge_ratio=max_hedge_ratio,
+        max_workers=4,
+        controller=controller,
+        max_retries=0,
+    )
+    for _ in range(caller.min_samples):
+        caller.record(0.01)
+    caller.calls = 10
+    return caller
+
+
+def test_no_hedging_before_enough_samples():
+    """Calls run inline until the latency percentile is known."""
+    caller = HedgedCaller(percentile=90, max_hedge_ratio=1.0, max_workers=2)
+
+    assert caller.call(lambda x: x + 1, 1) == 2
+    assert caller.hedge_delay() is None
+    assert caller.hedges == 0
+    caller.shutdown()
+
+
+def test_slow_call_is_hedged_and_duplicate_wins():
+    """A call stuck past the percentile loses to its duplicate."""
+    caller = warmed_up_caller()
+    release = threading.Event()
+    attempts = []
+
+    def call():
+        attempts.append(None)
+        if len(attempts) == 1:
+            release.wait(5)
+            return 'primary'
+        return 'hedge'
+
+    started = time.monotonic()
+    result = caller.call(call)
+
+    assert result == 'hedge'
+    assert time.monotonic() - started < 1
+    assert caller.hedges == caller.hedges_won == 1
+    release.set()
+    caller.shutdown()
+
+
+def test_hedge_budget_is_capped():
+    """No duplicate is issued once the hedge budget is used up."""
+    caller = warmed_up_caller(max_hedge_ratio=0.0)
+
+    def call():
+        time.sleep(0.05)
+        return 'primary'
+
+    assert caller.call(call) == 'primary'
+    assert caller.hedges == 0
+    caller.shutdown()
+
+
+def test_failed_copy_falls_back_to_the_other():
+    """An error of one copy is raised only if the other copy fails too."""
+    caller = warmed_up_caller()
+    attempts = []
+
+    def call():
+        attempts.append(None)
+        if len(attempts) == 1:
+            time.sleep(0.1)
+            raise TimeoutError('deadline exceeded')
+        time.sleep(0.2)
+        return 'hedge'
+
+    def failing_call():
+        raise ValueError('bad')
+
+    assert caller.call(call) == 'hedge'
+    with pytest.raises(ValueError):
+        caller.call(failing_call)
+    caller.shutdown()
+
+
+def test_waiting_for_a_slot_does_not_trigger_a_hedge():
+    """The hedge delay only counts time spent running in a slot."""
+    controller = AdaptiveConcurrencyController(initial_limit=1, max_limit=1)
+    caller = warmed_up_caller(controller=controller)
+    controller.acquire()
+    timer = threading.Timer(0.2, controller.release)
+    timer.start()
+
+    assert caller.call(lambda: 'primary') == 'primary'
+    assert caller.hedges == 0
+    assert max(caller._latencies) < 0.1
+    timer.join()
+    caller.shutdown()
+
+
+def test_abandoned_copy_frees_its_slot_before_cleanup():
+    """The losing copy gives its slot back and cleanup waits for it."""
+    controller = AdaptiveConcurrencyController(initial_limit=2, max_limit=2)
+    caller = warmed_up_caller(controller=controller)
+    release = threading.Event()
+    attempts = []
+    cleaned = threading.Event()
+
+    def call():
+        attempts.append(None)
+        if len(attempts) == 1:
+            release.wait(5)
+            return 'primary'
+        return 'hedge'
+
+    copies = []
+    assert caller.call(call, copies=copies) == 'hedge'
+    caller.defer(copies, cleaned.set)
+
+    assert controller._in_flight == 0
+    assert not cleaned.is_set()
+    release.set()
+    assert cleaned.wait(1)
+    caller.shutdown()
@@ -0,0 +1,72 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the lazy module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import subprocess
+import textwrap
+
+from utils.lazy import LazyModule
+
+# Cumulative import time budget of the entry point, in microseconds.
+_IMPORT_TIME_BUDGET_US = 300_000
+_HEAVY_MODULES = (
+    'pandas',
+    'gspread',
+    'google.genai',
+    'google.cloud.storage',
+    'google.oauth2.credentials',
+    'smart_open',
+    'yaml',
+)
+
+
+def test_lazy_module_forwards_attributes():
+    """Attribute access and assignment reach the real module."""
+    module = LazyModule('textwrap')
+
+    assert module.dedent('  a') == 'a'
+    module.test_attribute = 1
+    assert textwrap.test_attribute == 1
+    del module.test_attribute
+    assert not hasattr(textwrap, 'test_attribute')
+
+
+def test_entry_point_import_time_budget():
+    """Importing the entry point skips heavy backends and stays in budget."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            '-X',
+            'importtime',
+            '-c',
+            'import video_ads_compass',
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    imported = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        imported[name.strip()] = int(cumulative)
+
+    assert not [name for name in _HEAVY_MODULES if name in imported]
+    assert imported['video_ads_compass'] < _IMPORT_TIME_BUDGET_US
@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the logging module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import json
+import logging
+
+import pytest
+
+from utils.logging import JsonFormatter, Tracer
+
+
+def record_spans(tracer):
+    with tracer.span('list', source='gcs'):
+        pass
+    with tracer.span('download', video='a.mp4'):
+        pass
+    with tracer.span('analyze', video='a.mp4', video_key=0):
+        with tracer.span('model_call'):
+            pass
+    with tracer.span('analyze', video='b.mp4', video_key=1):
+        pass
+
+
+def test_one_trace_per_video():
+    """Spans of the same video share a trace, children link to parents."""
+    tracer = Tracer()
+
+    record_spans(tracer)
+
+    spans = {(span.name, span.video): span for span in tracer.spans}
+    download = spans[('download', 'a.mp4')]
+    analyze = spans[('analyze', 'a.mp4')]
+    model_call = spans[('model_call', 'a.mp4')]
+    assert download.trace_id == analyze.trace_id == model_call.trace_id
+    assert model_call.parent_id == analyze.span_id
+    assert model_call.attributes['video_key'] == 0
+    assert spans[('analyze', 'b.mp4')].trace_id != analyze.trace_id
+    assert spans[('list', None)].trace_id != analyze.trace_id
+
+
+def test_tracer_memory_is_bounded():
+    """Old spans are dropped and a video's trace id ends with its root span."""
+    tracer = Tracer(max_spans=3)
+
+    for index in range(5):
+        video = f'{index}.mp4'
+        with tracer.span('download', video=video):
+            pass
+        with tracer.span('analyze', video=video, end_trace=True):
+            with tracer.span('model_call'):
+                pass
+
+    assert len(tracer.spans) == 3
+    assert tracer.dropped == 12
+    assert tracer.spans[-1].name == 'analyze'
+    assert tracer.spans[-2].trace_id == tracer.spans[-1].trace_id
+    assert not tracer._trace_ids
+
+
+def test_span_records_errors():
+    """Errors are recorded on the span and re-raised."""
+    tracer = Tracer()
+
+    with pytest.raises(ValueError, match='bad'), tracer.span('parse'):
+        raise ValueError('bad')
+
+    assert tracer.spans[0].error == 'ValueError: bad'
+
+
+def test_export_chrome_trace(tmp_path):
+    """The Chrome export has one complete event per span.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    tracer = Tracer()
+    record_spans(tracer)
+    path = tmp_path / 'trace.json'
+
+    tracer.export(str(path), 'chrome')
+
+    events = json.loads(path.read_text())['traceEvents']
+    assert len(events) == 5
+    assert {event['ph'] for event in events} == {'X'}
+    assert all(event['dur'] >= 0 for event in events)
+    assert events[0]['args']['source'] == 'gcs'
+
+
+def test_export_otlp(tmp_path):
+    """The OTLP export keeps the trace and parent ids.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    tracer = Tracer()
+    record_spans(tracer)
+    path = tmp_path / 'trace.otlp.json'
+
+    tracer.export(str(path), 'otlp')
+
+    spans = json.loads(path.read_text())['resourceSpans'][0]['scopeSpans'][0][
+        'spans'
+    ]
+    model_call = next(span for span in spans if span['name'] == 'model_call')
+    analyze = next(
+        span for span in spans if span['spanId'] == model_call['parentSpanId']
+    )
+    assert analyze['traceId'] == model_call['traceId']
+    assert len(model_call['traceId']) == 32
+    assert {'key': 'video', 'value': {'stringValue': 'a.mp4'}} in (
+        model_call['attributes']
+    )
+
+
+def test_json_formatter_carries_video_key():
+    """JSON logs inside a span carry the video and its key."""
+    tracer = Tracer()
+    record = logging.LogRecord(
+        'video_ads_compass', logging.INFO, __file__, 1, 'done', (), None
+    )
+
+    with tracer.span('analyze', video='a.mp4', video_key=3):
+        entry = json.loads(JsonFormatter().format(record))
+
+    assert entry['message'] == 'done'
+    assert entry['video'] == 'a.mp4'
+    assert entry['video_key'] == 3
+    assert entry['span'] == 'analyze'
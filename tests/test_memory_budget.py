@@ -0,0 +1,77 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the memory budget module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import threading
+import time
+
+from utils.memory_budget import (
+    STREAMED_WEIGHT,
+    MemoryBudget,
+    estimate_video_weight,
+)
+
+
+def test_estimate_video_weight(tmp_path):
+    """Inline videos weigh more than their size, uploaded ones a chunk.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    video = tmp_path / 'ad.mp4'
+    video.write_bytes(b'x' * 300)
+
+    assert estimate_video_weight(str(video), inline_max_bytes=1000) == 700
+    assert estimate_video_weight(str(video), inline_max_bytes=100) == (
+        STREAMED_WEIGHT
+    )
+    assert estimate_video_weight(str(tmp_path / 'missing.mp4'), 100) == 0
+
+
+def test_budget_blocks_until_released():
+    """Work that does not fit waits for in-flight work to finish."""
+    budget = MemoryBudget(100)
+    budget.acquire(60)
+    admitted = threading.Event()
+
+    def worker():
+        budget.acquire(60)
+        admitted.set()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    time.sleep(0.05)
+    assert not admitted.is_set()
+
+    budget.release(60)
+    thread.join(timeout=1)
+
+    assert admitted.is_set()
+    assert budget.in_flight == 60
+    assert budget.peak == 60
+
+
+def test_budget_admits_oversized_work_alone():
+    """Work heavier than the budget runs once nothing else is in flight."""
+    budget = MemoryBudget(100)
+
+    with budget.reserve(500):
+        assert budget.in_flight == 500
+
+    assert budget.in_flight == 0
+    assert budget.peak == 500
@@ -0,0 +1,120 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the modality module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from utils.modality import TranscriptRouter
+from utils.rules import parse_rules
+from utils.vertex_ai import RESPONSE_SCHEMA
+
+RULES = parse_rules(
+    'Rule ID,Rule Description,Modality\n'
+    '01,No alcohol,visual\n'
+    '02,No false health claims,audio\n'
+    '03,No guaranteed returns,text\n'
+)
+
+
+def response(rules, violated=()):
+    return json.dumps(
+        {
+            'overall_compliance_assessment': 0,
+            'rules': [
+                {
+                    'rule_index': rule.index,
+                    'rule_violation': rule.index in violated,
+                    'violation_score': 3 if rule.index in violated else 0,
+                    'violation_reason': '',
+                    'violation_time': '',
+                }
+                for rule in rules
+            ],
+        }
+    )
+
+
+@pytest.fixture
+def executor():
+    """Executor for the transcript reviews.
+    Yields:
+        The executor.
+    """
+    with ThreadPoolExecutor(max_workers=2) as transcript_executor:
+        yield transcript_executor
+
+
+def test_transcript_rules_skip_the_video(monkeypatch, executor):
+    """Audio and text rules go to the transcript, visual ones to the video.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        executor: The executor fixture.
+    """
+    monkeypatch.setattr(
+        'utils.modality.extract_audio', MagicMock(return_value=True)
+    )
+    transcribe = MagicMock(return_value='[00:01] Cures everything!')
+    analyze_transcript = MagicMock(
+        side_effect=lambda _transcript, rules: response(rules, violated=(2,))
+    )
+    analyze_video = MagicMock(
+        side_effect=lambda _path, rules=None: response(rules or RULES)
+    )
+    router = TranscriptRouter(
+        transcribe, analyze_transcript, executor, RESPONSE_SCHEMA
+    )
+
+    result = json.loads(router.analyze(analyze_video, 'a.mp4', RULES))
+    router.analyze(analyze_video, 'a.mp4', RULES, RULES[1:2])
+
+    video_rules = analyze_video.call_args_list[0][0][1]
+    assert [rule.index for rule in video_rules] == [1]
+    assert analyze_transcript.call_args_list[0][0] == (
+        '[00:01] Cures everything!',
+        RULES[1:],
+    )
+    assert sorted(rule['rule_index'] for rule in result['rules']) == [1, 2, 3]
+    assert result['overall_compliance_assessment'] == pytest.approx(66.67)
+    assert transcribe.call_count == 1
+    assert analyze_video.call_count == 1
+
+
+def test_no_audio_falls_back_to_the_video(monkeypatch, executor):
+    """Without an audio track every rule is sent with the video.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        executor: The executor fixture.
+    """
+    monkeypatch.setattr(
+        'utils.modality.extract_audio', MagicMock(return_value=False)
+    )
+    analyze_transcript = MagicMock()
+    analyze_video = MagicMock(return_value=response(RULES))
+    router = TranscriptRouter(
+        MagicMock(), analyze_transcript, executor, RESPONSE_SCHEMA
+    )
+
+    router.analyze(analyze_video, 'a.mp4', RULES)
+
+    analyze_video.assert_called_once_with('a.mp4')
+    analyze_transcript.assert_not_called()
@@ -0,0 +1,79 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the probe module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import json
+from unittest.mock import MagicMock
+
+from utils.probe import probe_duration, probe_media
+
+
+def test_probe_media(monkeypatch):
+    """Duration, resolution and audio presence are read from ffprobe.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    """
+    output = json.dumps(
+        {
+            'streams': [
+                {'codec_type': 'video', 'width': 1280, 'height': 720},
+                {'codec_type': 'audio'},
+            ],
+            'format': {'duration': '30.5'},
+        }
+    )
+    monkeypatch.setattr(
+        'utils.probe.subprocess.run',
+        MagicMock(return_value=MagicMock(stdout=output)),
+    )
+
+    media_info = probe_media('video.mp4')
+
+    assert media_info.duration == 30.5
+    assert (media_info.width, media_info.height) == (1280, 720)
+    assert media_info.has_audio
+
+
+def test_probe_url_sends_headers(monkeypatch):
+    """A URL is probed in place with the given request headers.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    """
+    run = MagicMock(side_effect=OSError('ffprobe'))
+    monkeypatch.setattr('utils.probe.subprocess.run', run)
+
+    probe_media('https://host/video.mp4', {'Authorization': 'Bearer t'})
+
+    command = run.call_args[0][0]
+    assert command[-1] == 'https://host/video.mp4'
+    headers = command[command.index('-headers') + 1]
+    assert headers == 'Authorization: Bearer t\r\n'
+
+
+def test_probe_failure_returns_none(monkeypatch):
+    """A missing ffprobe binary is reported as an unprobed video.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    """
+    monkeypatch.setattr(
+        'utils.probe.subprocess.run', MagicMock(side_effect=OSError('ffprobe'))
+    )
+
+    assert probe_media('video.mp4') is None
+    assert probe_duration('video.mp4') is None
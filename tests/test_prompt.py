@@ -0,0 +1,85 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the prompt module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import copy
+import sys
+
+import pytest
+
+sys.path.append('.')
+from utils.prompt import PromptBuilder, approximate_token_count
+from utils.rules import parse_rules
+from utils.vertex_ai import RESPONSE_SCHEMA
+
+RULES_CSV = (
+    'Rule ID,Rule Description,Modality\n'
+    '01,No alcohol,visual\n'
+    '02,"No gambling,   including lotteries",audio\n'
+    '03,No smoking,visual\n'
+)
+
+
+def test_prompt_follows_response_schema():
+    """The prompt explains exactly the fields the schema accepts."""
+    prompt = PromptBuilder(parse_rules(RULES_CSV), RESPONSE_SCHEMA).build()
+
+    for field in RESPONSE_SCHEMA['properties']['rules']['items']['properties']:
+        assert field in prompt
+    assert 'overall_compliance_assessment' in prompt
+    assert 'confidence_score' not in prompt
+    assert prompt.endswith(
+        '1|No alcohol\n2|No gambling, including lotteries\n3|No smoking'
+    )
+
+
+def test_prompt_for_rules_subset():
+    """A rules subset prompt lists only the rules of the subset."""
+    rules = parse_rules(RULES_CSV)
+    builder = PromptBuilder(rules, RESPONSE_SCHEMA)
+
+    prompt = builder.build(rules[1:2])
+
+    assert '2|No gambling' in prompt
+    assert 'No alcohol' not in prompt
+    assert 'No smoking' not in prompt
+    assert len(prompt) < len(builder.build())
+
+
+def test_prompt_rejects_unknown_schema_fields():
+    """Schema fields the prompt cannot explain fail fast."""
+    schema = copy.deepcopy(RESPONSE_SCHEMA)
+    schema['properties']['rules']['items']['properties']['extra'] = {
+        'type': 'string'
+    }
+
+    with pytest.raises(ValueError):
+        PromptBuilder(parse_rules(RULES_CSV), schema)
+
+
+def test_count_tokens():
+    """Prompt tokens are counted with the given counter or approximated."""
+    rules = parse_rules(RULES_CSV)
+    builder = PromptBuilder(rules, RESPONSE_SCHEMA)
+    counted = []
+
+    def counter(text):
+        counted.append(text)
+        return 42
+
+    assert builder.count_tokens(counter=counter) == 42
+    assert counted == [builder.build()]
+    assert builder.count_tokens() == approximate_token_count(builder.build())
@@ -0,0 +1,55 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the rate limiter module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import time
+
+from utils.rate_limiter import RateLimiter
+
+
+def test_burst_then_throttle():
+    """A full bucket allows a burst, then calls wait for refills."""
+    rate_limiter = RateLimiter(10, period=0.5)
+
+    for _ in range(10):
+        assert rate_limiter.acquire() == 0
+    started = time.monotonic()
+    rate_limiter.acquire(2)
+
+    assert time.monotonic() - started >= 0.09
+    assert not rate_limiter.try_acquire()
+
+
+def test_oversize_amount_leaves_debt():
+    """Amounts above the capacity wait for a full bucket and go negative."""
+    rate_limiter = RateLimiter(10, period=0.5)
+
+    rate_limiter.acquire(25)
+
+    assert rate_limiter.available < -14
+
+
+def test_unlimited_and_drain():
+    """A zero rate never waits and draining empties the bucket."""
+    assert RateLimiter(0).acquire(1000) == 0
+    rate_limiter = RateLimiter(60)
+
+    rate_limiter.drain()
+
+    assert not rate_limiter.try_acquire()
@@ -0,0 +1,141 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the response parser module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import copy
+import json
+
+import pytest
+
+from utils.response_parser import analyze_with_followup, parse_response
+from utils.rules import parse_rules
+from utils.vertex_ai import RESPONSE_SCHEMA
+
+RULES = parse_rules(
+    'Rule ID,Rule Description\n01,No alcohol\n02,No gambling\n03,No tobacco\n'
+)
+
+
+def verdict(rule_index, violation=False):
+    return {
+        'rule_index': rule_index,
+        'rule_violation': violation,
+        'violation_score': 4 if violation else 0,
+        'violation_reason': 'reason',
+        'violation_time': '00:01' if violation else '',
+    }
+
+
+def response(rule_indexes, overall=80):
+    return json.dumps(
+        {
+            'overall_compliance_assessment': overall,
+            'rules': [verdict(rule_index) for rule_index in rule_indexes],
+        }
+    )
+
+
+def test_parse_truncated_response_keeps_complete_rules():
+    """Complete rule objects before the truncation point are kept."""
+    text = response([1, 2, 3])[:-40]
+
+    result = parse_response(text, RESPONSE_SCHEMA)
+
+    assert [rule['rule_index'] for rule in result['rules']] == [1, 2]
+    assert result['overall_compliance_assessment'] == 80
+
+
+def test_parse_response_drops_invalid_rules():
+    """Rules not matching the schema are dropped, valid ones kept."""
+    invalid = verdict(2)
+    invalid['violation_score'] = 'high'
+    text = json.dumps(
+        {
+            'overall_compliance_assessment': 'n/a',
+            'rules': [verdict(1), invalid, {'rule_index': 3}],
+        }
+    )
+
+    result = parse_response(text, RESPONSE_SCHEMA)
+
+    assert [rule['rule_index'] for rule in result['rules']] == [1]
+    assert result['overall_compliance_assessment'] is None
+
+
+def test_parse_skips_broken_rule_in_the_middle():
+    """A syntactically broken rule does not hide the rules after it."""
+    text = response([1, 2, 3]).replace('"rule_index": 2,', '"rule_index": ,')
+
+    result = parse_response(text, RESPONSE_SCHEMA)
+
+    assert [rule['rule_index'] for rule in result['rules']] == [1, 3]
+
+
+def test_followup_requests_only_missing_rules():
+    """Only the rules lost in the first response are requested again."""
+    calls = []
+
+    def analyze(rules_subset):
+        calls.append(rules_subset)
+        if rules_subset is None:
+            return response([1, 2, 3])[:-40]
+        return response([rule.index for rule in rules_subset])
+
+    result = analyze_with_followup(analyze, RULES, RESPONSE_SCHEMA)
+
+    assert [rule.index for rule in calls[1]] == [3]
+    assert len(calls) == 2
+    assert [rule['rule_index'] for rule in result['rules']] == [1, 2, 3]
+
+
+def test_followup_matches_rule_ids_across_types():
+    """Answered rules are matched whether their ids are ints or text."""
+    schema = copy.deepcopy(RESPONSE_SCHEMA)
+    schema['properties']['rules']['items']['properties']['rule_index'] = {
+        'type': 'string'
+    }
+    rules = parse_rules('Rule ID,Rule Description\n01,No alcohol\nB2,No bets\n')
+    calls = []
+
+    def analyze(rules_subset):
+        calls.append(rules_subset)
+        return response([str(rule.index) for rule in rules_subset or rules])
+
+    result = analyze_with_followup(analyze, rules, schema)
+
+    assert calls == [None]
+    assert [rule['rule_index'] for rule in result['rules']] == ['1', 'B2']
+
+
+def test_followup_limit_and_unrecoverable_response():
+    """Follow-ups stop at the limit and garbage responses raise."""
+    calls = []
+
+    def analyze(rules_subset):
+        calls.append(rules_subset)
+        return response([1])
+
+    result = analyze_with_followup(
+        analyze, RULES, RESPONSE_SCHEMA, max_followups=0
+    )
+
+    assert len(calls) == 1
+    assert len(result['rules']) == 1
+    with pytest.raises(ValueError):
+        analyze_with_followup(lambda _: 'not json', [], RESPONSE_SCHEMA)
@@ -0,0 +1,57 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the rules module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+from utils.rules import parse_rules
+
+RULES_CSV = (
+    'Rule ID,Rule Description\n'
+    '01,No alcohol\n'
+    '02,"No gambling, including lotteries"\n'
+)
+
+
+def test_parse_rules():
+    """Rule ids become the integer index the model reports."""
+    rules = parse_rules(RULES_CSV)
+
+    assert [rule.index for rule in rules] == [1, 2]
+    assert rules[1].description == 'No gambling, including lotteries'
+
+
+def test_rule_hash_changes_only_for_edited_rules():
+    """Editing one rule changes only that rule's hash."""
+    before = parse_rules(RULES_CSV)
+    after = parse_rules(RULES_CSV.replace('No alcohol', 'No alcohol use'))
+
+    assert before[0].hash != after[0].hash
+    assert before[1].hash == after[1].hash
+
+
+def test_modality_column():
+    """The optional Modality column routes rules, visual by default."""
+    rules = parse_rules(
+        'Rule ID,Rule Description,Modality\n'
+        '01,No alcohol,Visual\n'
+        '02,No false health claims,Audio\n'
+        '03,No profanity\n'
+    )
+
+    assert [rule.modality for rule in rules] == ['visual', 'audio', 'visual']
+    assert rules[1].description == 'No false health claims'
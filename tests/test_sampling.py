@@ -0,0 +1,117 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the sampling module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append('.')
+from utils.sampling import (
+    StratifiedSampler,
+    estimate_rate,
+    sample_until_precision,
+    stratum_key,
+)
+
+
+def _blob(name, size=1, updated=None):
+    """Builds a listed blob.
+    Args:
+        name: The object name.
+        size: The object size in bytes.
+        updated: The object update time.
+    Returns:
+        The blob.
+    """
+    return SimpleNamespace(name=name, size=size, updated=updated)
+
+
+def test_stratum_key():
+    """Blobs are stratified on one or more listing attributes."""
+    blob = _blob('brand/ad.mp4', 60 * 1024 * 1024, datetime(2025, 3, 1))
+
+    assert stratum_key('prefix')(blob) == 'brand'
+    assert stratum_key('prefix')(_blob('ad.mp4')) == '(root)'
+    assert stratum_key('month, size')(blob) == '2025-03|50-200MB'
+    assert stratum_key('none')(blob) == 'all'
+    with pytest.raises(ValueError):
+        stratum_key('color')
+
+
+def test_sampler_allocates_proportionally_without_replacement():
+    """Every stratum is sampled in proportion and no item twice."""
+    items = [f'a/{i}' for i in range(80)] + [f'b/{i}' for i in range(20)]
+    sampler = StratifiedSampler(items, lambda item: item[0], seed=1)
+
+    first = sampler.draw(10)
+    second = sampler.draw(30)
+
+    assert sampler.sampled == {'a': 24, 'b': 6}
+    assert len(first) + len(second) == 30
+    assert len({item for _, item in first + second}) == 30
+    assert sampler.draw(30) == []
+    sampler.draw(1000)
+    assert sampler.exhausted
+
+
+def test_sampler_samples_every_stratum():
+    """Small strata get one item once the sample can cover every stratum."""
+    items = [f'a/{i}' for i in range(98)] + ['b/0', 'c/0']
+    sampler = StratifiedSampler(items, lambda item: item[0], seed=1)
+
+    sampler.draw(5)
+
+    assert sampler.sampled['b'] == 1
+    assert sampler.sampled['c'] == 1
+
+
+def test_estimate_rate():
+    """The rate is weighted by stratum size and the interval covers it."""
+    estimate = estimate_rate(
+        {'a': (10, 50), 'b': (0, 50)}, {'a': 900, 'b': 100}
+    )
+
+    assert estimate.rate == pytest.approx(0.18)
+    assert estimate.low < 0.18 < estimate.high
+    assert estimate.sampled == 100
+    assert estimate_rate({'a': (0, 20)}, {'a': 1000}).high > 0
+    assert estimate_rate({'a': (3, 10)}, {'a': 10}).half_width == 0
+
+
+def test_sample_until_precision_adds_samples():
+    """Samples are added until the intervals are narrow enough."""
+    items = [f'a/{i}' for i in range(2000)] + [f'b/{i}' for i in range(2000)]
+    sampler = StratifiedSampler(items, lambda item: item[0], seed=1)
+    batches = []
+
+    def analyze(batch):
+        batches.append(len(batch))
+        return [
+            (stratum, 1, int(item.split('/')[1]) % 5 == 0)
+            for stratum, item in batch
+        ]
+
+    estimates = sample_until_precision(
+        sampler, analyze, 20, 0.05, 1000, confidence=0.95
+    )
+
+    assert len(batches) > 1
+    assert batches[0] == 20
+    assert estimates[1].half_width <= 0.05 or sum(batches) == 1000
+    assert estimates[1].low <= 0.2 <= estimates[1].high
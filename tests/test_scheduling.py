@@ -0,0 +1,117 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the scheduling module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+from utils.probe import MediaInfo
+from utils.scheduling import (
+    TokenEstimator,
+    shortest_job_first,
+    summarize_estimates,
+)
+
+MEDIA = {
+    'short.mp4': MediaInfo(15, 1920, 1080, has_audio=True),
+    'silent.mp4': MediaInfo(15, 1920, 1080, has_audio=False),
+    'long.mp4': MediaInfo(300, 1920, 1080, has_audio=True),
+}
+
+
+def test_estimate_from_duration_and_audio():
+    """Tokens grow with duration, audio and segment overlap."""
+    estimator = TokenEstimator(
+        prompt_tokens=1000, rule_count=10, probe=MEDIA.get
+    )
+    segmented = TokenEstimator(
+        prompt_tokens=1000,
+        rule_count=10,
+        segment_seconds=120,
+        overlap_seconds=10,
+        probe=MEDIA.get,
+    )
+
+    short = estimator.estimate('short.mp4')
+    silent = estimator.estimate('silent.mp4')
+    long = segmented.estimate('long.mp4')
+
+    assert short.input_tokens == 15 * (258 + 32) + 1000
+    assert silent.input_tokens == 15 * 258 + 1000
+    assert short.output_tokens == 800
+    assert long.calls == 3
+    assert long.input_tokens > 300 * (258 + 32) + 3 * 1000
+
+
+def test_unprobed_video_is_estimated_from_size(tmp_path):
+    """Videos ffprobe cannot read are estimated from their size.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    path = tmp_path / 'video.mp4'
+    path.write_bytes(b'\0' * 500_000)
+    estimator = TokenEstimator(
+        prompt_tokens=0, rule_count=1, probe=lambda _: None
+    )
+
+    estimate = estimator.estimate(str(path))
+
+    assert estimate.media_info is None
+    assert estimate.duration == 2
+
+
+def test_remote_video_is_estimated_from_listed_size():
+    """Videos not on disk are estimated from the size they were listed with."""
+    estimator = TokenEstimator(
+        prompt_tokens=0,
+        rule_count=1,
+        probe=lambda _: None,
+        size={'https://host/video.mp4': 750_000}.get,
+    )
+
+    assert estimator.estimate('https://host/video.mp4').duration == 3
+
+
+def test_shortest_job_first_with_aging():
+    """Short jobs go first, but a long job waits at most max_skips turns."""
+    jobs = [100, 1, 2, 3, 4, 5, 6]
+
+    order = list(
+        shortest_job_first(jobs, cost=lambda job: job, lookahead=4, max_skips=3)
+    )
+
+    assert order == [1, 2, 3, 100, 4, 5, 6]
+    assert list(shortest_job_first(jobs, lambda job: job, 10, 10)) == sorted(
+        jobs
+    )
+
+
+def test_summarize_estimates():
+    """The dry run summary totals tokens, cost and quota bound time."""
+    estimator = TokenEstimator(prompt_tokens=0, rule_count=0, probe=MEDIA.get)
+    estimates = [estimator.estimate('short.mp4')] * 4
+
+    summary = summarize_estimates(
+        estimates,
+        tokens_per_minute=17400,
+        input_price_per_million=1.0,
+        output_price_per_million=0,
+    )
+
+    assert summary['videos'] == 4
+    assert summary['input_tokens'] == 4 * 15 * 290
+    assert summary['estimated_cost'] == 0.0174
+    assert summary['minimum_minutes'] == 1.0
@@ -0,0 +1,127 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the segments module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils.segments import (
+    analyze_segmented,
+    merge_segment_results,
+    offset_violation_time,
+    parse_timestamp,
+    plan_segments,
+)
+
+
+def rule(index, violation, score=0, reason='', time=''):
+    return {
+        'rule_index': index,
+        'rule_violation': violation,
+        'violation_score': score,
+        'violation_reason': reason,
+        'violation_time': time,
+    }
+
+
+def test_plan_segments_covers_video_with_overlap():
+    """Windows overlap and the last one ends at the video duration."""
+    assert plan_segments(130, 60, 10) == [
+        (0.0, 60),
+        (50.0, 110.0),
+        (100.0, 130),
+    ]
+    assert plan_segments(30, 60, 10) == [(0.0, 30)]
+
+
+def test_plan_segments_rejects_overlap_longer_than_segments():
+    """Windows that would not advance fail instead of shrinking the step."""
+    with pytest.raises(ValueError, match='overlap'):
+        plan_segments(3600, 10, 10)
+
+
+def test_offset_violation_time():
+    """Every timestamp format is shifted to absolute time."""
+    assert offset_violation_time('00:05-00:12', 60) == '01:05-01:12'
+    assert offset_violation_time('at 15s', 50) == 'at 01:05'
+    assert offset_violation_time('59:30', 60) == '01:00:30'
+    assert offset_violation_time('', 60) == ''
+    assert parse_timestamp('01:02:03') == 3723
+
+
+def test_merge_takes_max_severity_and_dedupes_overlap():
+    """Overlapping findings are kept once with the highest severity."""
+    merged = merge_segment_results(
+        [
+            (
+                0,
+                {
+                    'overall_compliance_assessment': 90,
+                    'rules': [
+                        rule(1, True, 2, 'logo', '00:52'),
+                        rule(2, False, 0, 'fine'),
+                    ],
+                },
+            ),
+            (
+                50,
+                {
+                    'overall_compliance_assessment': 70,
+                    'rules': [
+                        rule(1, True, 4, 'logo again', '00:03'),
+                        rule(1, True, 3, 'claim', '00:40'),
+                        rule(2, False, 0, 'fine'),
+                    ],
+                },
+            ),
+        ],
+        dedupe_seconds=5,
+    )
+
+    assert merged['overall_compliance_assessment'] == 70
+    first, second = merged['rules']
+    assert first['rule_violation'] is True
+    assert first['violation_score'] == 4
+    assert first['violation_time'] == '00:53, 01:30'
+    assert first['violation_reason'] == 'logo again | claim'
+    assert second == rule(2, False, 0, 'fine')
+
+
+def test_analyze_segmented_calls_each_window():
+    """Each window is analyzed and the results are merged."""
+    calls = []
+
+    def analyze_segment(start, end):
+        calls.append((start, end))
+        return json.dumps(
+            {
+                'overall_compliance_assessment': 100,
+                'rules': [rule(1, start > 0, 1, 'late', '00:01')],
+            }
+        )
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = json.loads(
+            analyze_segmented(analyze_segment, 100, 60, 10, executor)
+        )
+
+    assert sorted(calls) == [(0.0, 60), (50.0, 100)]
+    assert result['rules'][0]['violation_time'] == '00:51'
@@ -24,88 +24,186 @@ import pandas as pd
 import pytest
 
 from utils.config import Config
-from utils.sheets import GoogleSheetsHandler
-
-
-class TestConfig(Config):
-    def __init__(self):
-        self.bucket_name = 'test_bucket'
+from utils.rate_limiter import RateLimiter
+from utils.sheets import (
+    SheetsRunWriter,
+    summarize_by_rule,
+    summarize_by_video,
+)
+
+RESULTS = pd.DataFrame(
+    {
+        'video_type': ['all'] * 4,
+        'video_key': [0, 0, 1, 1],
+        'video_uri': ['a.mp4', 'a.mp4', 'b.mp4', 'b.mp4'],
+        'overall_compliance_assessment': [50, 50, 100, 100],
+        'rule_index': [1, 2, 1, 2],
+        'rule_violation': [True, False, False, False],
+        'violation_score': [4, 0, 0, 0],
+        'violation_reason': ['alcohol', '', '', ''],
+        'violation_time': ['00:03', '', '', ''],
+    }
+)
 
 
 @pytest.fixture
-def test_config(monkeypatch):
-    """Mocks the configuration object for testing."""
-    mock_creds = MagicMock()
+def loaded_config(monkeypatch):
+    """Config object loaded from a configuration file with a spreadsheet.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    Returns:
+        Config: A configuration object with a spreadsheet id.
+    """
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file',
+        MagicMock(return_value={'spreadsheet_id': 'sheet-id'}),
+    )
     monkeypatch.setattr(
-        'utils.config.auth._get_credentials', MagicMock(return_value=mock_creds)
+        'utils.config.auth._get_credentials', MagicMock(return_value=None)
     )
-    return TestConfig()
+    return Config()
+
+
+def test_summaries():
+    """Per video and per rule summaries count violations."""
+    by_video = summarize_by_video(RESULTS)
+    by_rule = summarize_by_rule(RESULTS)
 
+    assert by_video['violations'].tolist() == [1, 0]
+    assert by_video['rules'].tolist() == [2, 2]
+    assert by_video['max_violation_score'].tolist()[0] == 4
+    assert by_rule['violation_rate'].tolist() == [0.5, 0.0]
+    assert by_rule['videos'].tolist() == [2, 2]
 
-def test_create_spreadsheet(monkeypatch, mock_config):
-    """Tests the create_spreadsheet method.
+
+def test_write_run_uses_fixed_number_of_requests(monkeypatch, loaded_config):
+    """A run adds worksheets, values and formatting in three requests.
     Args:
         monkeypatch: pytest monkeypatch fixture.
-        mock_config: Mock configuration object.
+        loaded_config: A configuration object with a spreadsheet id.
     """
     mock_gc = MagicMock()
-    mock_spreadsheet = MagicMock()
-    mock_gc.create.return_value = mock_spreadsheet
+    spreadsheet = mock_gc.open_by_key.return_value
+    spreadsheet.batch_update.return_value = {
+        'replies': [
+            {'addSheet': {'properties': {'sheetId': sheet_id}}}
+            for sheet_id in (11, 12, 13)
+        ]
+    }
     monkeypatch.setattr(
         'utils.sheets.gspread.Client', MagicMock(return_value=mock_gc)
     )
 
-    sheets_handler = GoogleSheetsHandler(mock_config)
-
-    spreadsheet = sheets_handler.create_spreadsheet()
+    SheetsRunWriter(loaded_config).write_run(RESULTS, run_name='run')
+
+    mock_gc.open_by_key.assert_called_once_with('sheet-id')
+    mock_gc.create.assert_not_called()
+    assert spreadsheet.batch_update.call_count == 2
+    data = spreadsheet.values_batch_update.call_args[0][0]['data']
+    assert [entry['range'] for entry in data] == [
+        "'run results'!A1",
+        "'run by video'!A1",
+        "'run by rule'!A1",
+    ]
+    assert len(data[0]['values']) == len(RESULTS) + 1
+    format_requests = spreadsheet.batch_update.call_args[0][0]['requests']
+    borders = [r for r in format_requests if 'updateBorders' in r]
+    assert [r['updateBorders']['range']['startRowIndex'] for r in borders] == [
+        1,
+        3,
+    ]
+
+
+def test_writer_backs_off_on_quota_errors(monkeypatch, loaded_config):
+    """Quota errors are retried after draining the rate limiter.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with a spreadsheet id.
+    """
+    quota_error = Exception('quota')
+    quota_error.code = 429
+    mock_gc = MagicMock()
+    mock_gc.open_by_key.side_effect = [quota_error, 'spreadsheet']
+    monkeypatch.setattr(
+        'utils.sheets.gspread.Client', MagicMock(return_value=mock_gc)
+    )
+    monkeypatch.setattr('utils.sheets.time.sleep', MagicMock())
+    rate_limiter = RateLimiter(60)
+    writer = SheetsRunWriter(loaded_config, rate_limiter)
 
-    assert spreadsheet is not None
+    assert writer.open_spreadsheet() == 'spreadsheet'
+    assert rate_limiter.available < 1
 
 
-def test_upload_dataframe(monkeypatch, mock_config):
-    """Tests the upload_dataframe method.
+def test_append_results_adds_worksheet_once(monkeypatch, loaded_config):
+    """Streamed results add the worksheet once, then one append each.
     Args:
         monkeypatch: pytest monkeypatch fixture.
-        mock_config: Mock configuration object.
+        loaded_config: A configuration object with a spreadsheet id.
     """
     mock_gc = MagicMock()
-    mock_spreadsheet = MagicMock()
-    mock_worksheet = MagicMock()
-    mock_spreadsheet.sheet1 = mock_worksheet
-    mock_gc.create.return_value = mock_spreadsheet
+    spreadsheet = mock_gc.open_by_key.return_value
+    spreadsheet.batch_update.return_value = {
+        'replies': [{'addSheet': {'properties': {'sheetId': 11}}}]
+    }
     monkeypatch.setattr(
         'utils.sheets.gspread.Client', MagicMock(return_value=mock_gc)
     )
+    writer = SheetsRunWriter(loaded_config)
 
-    sheets_handler = GoogleSheetsHandler(mock_config)
+    writer.append_results(RESULTS.iloc[:2], run_name='watch')
+    writer.append_results(RESULTS.iloc[2:], run_name='watch')
 
-    data = {'col1': [1, 2], 'col2': [3, 4]}
-    df = pd.DataFrame(data)
+    mock_gc.open_by_key.assert_called_once_with('sheet-id')
+    assert spreadsheet.batch_update.call_count == 2
+    header = spreadsheet.values_batch_update.call_args[0][0]['data'][0]
+    assert header['values'] == [RESULTS.columns.tolist()]
+    appends = spreadsheet.values_append.call_args_list
+    assert [call[0][0] for call in appends] == ["'watch results'!A1"] * 2
+    assert [len(call[0][2]['values']) for call in appends] == [2, 2]
 
-    sheets_handler.upload_dataframe(mock_spreadsheet, df)
 
-    expected_data = [['col1', 'col2'], [1, 3], [2, 4]]
-    mock_worksheet.update.assert_called_once_with(expected_data)
-
-
-def test_format_spreadsheet(monkeypatch, mock_config):
-    """Tests the format_spreadsheet method.
+def test_new_spreadsheet_drops_default_sheet(monkeypatch, loaded_config):
+    """The empty default worksheet is deleted with the first run added.
     Args:
         monkeypatch: pytest monkeypatch fixture.
-        mock_config: Mock configuration object.
+        loaded_config: A configuration object with a spreadsheet id.
     """
     mock_gc = MagicMock()
-    mock_spreadsheet = MagicMock()
-    mock_worksheet = MagicMock()
-    mock_spreadsheet.sheet1 = mock_worksheet
-    mock_gc.create.return_value = mock_spreadsheet
+    spreadsheet = mock_gc.create.return_value
+    mock_gc.open_by_key.return_value = spreadsheet
+    spreadsheet.batch_update.return_value = {
+        'replies': [{'addSheet': {'properties': {'sheetId': 11}}}, {}]
+    }
     monkeypatch.setattr(
         'utils.sheets.gspread.Client', MagicMock(return_value=mock_gc)
     )
-    mock_worksheet.get_all_records.return_value = []
-
-    sheets_handler = GoogleSheetsHandler(mock_config)
-
-    sheets_handler.format_spreadsheet(mock_spreadsheet)
-
-    assert mock_worksheet.format.call_count > 0
+    loaded_config.spreadsheet_id = ''
+    writer = SheetsRunWriter(loaded_config)
+
+    writer.write_table(RESULTS, 'table')
+    writer.write_table(RESULTS, 'table 2')
+
+    first, _, second, _ = spreadsheet.batch_update.call_args_list
+    assert first[0][0]['requests'][-1] == {'deleteSheet': {'sheetId': 0}}
+    assert all('deleteSheet' not in r for r in second[0][0]['requests'])
+    header = first[0][0]['requests'][0]
+    assert header['addSheet']['properties']['title'] == 'table'
+
+
+def test_violation_highlight_past_column_z():
+    """The violation formula addresses columns beyond Z."""
+    df = RESULTS.copy()
+    for i in range(30):
+        df.insert(0, f'extra_{i}', '')
+
+    (rule,) = [
+        r
+        for r in SheetsRunWriter._results_requests(11, df)
+        if 'addConditionalFormatRule' in r
+    ]
+
+    condition = rule['addConditionalFormatRule']['rule']['booleanRule']
+    assert condition['condition']['values'][0]['userEnteredValue'] == (
+        '=$AJ2=TRUE'
+    )
@@ -0,0 +1,154 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the tenants module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top, protected-access
+
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.append('.')
+from utils.tenants import (
+    FairScheduler,
+    TenantMetrics,
+    load_manifest,
+    tenant_path,
+)
+
+
+def _wait_until(condition, timeout=5.0):
+    """Waits for a condition set by another thread.
+    Args:
+        condition: Returns True once the awaited state is reached.
+        timeout: The most seconds to wait.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+
+def test_fair_scheduler_shares_slots_by_weight():
+    """Backlogged tenants get slots in proportion to their weights."""
+    scheduler = FairScheduler(1)
+    scheduler.acquire('warmup')
+    granted = []
+
+    def tenant(name, weight):
+        for _ in range(6):
+            scheduler.acquire(name, weight)
+            granted.append(name)
+
+    threads = [
+        threading.Thread(target=tenant, args=('big', 2), daemon=True),
+        threading.Thread(target=tenant, args=('small', 1), daemon=True),
+    ]
+    for started, thread in enumerate(threads, 1):
+        thread.start()
+        _wait_until(lambda: len(scheduler._waiting) == started)
+    for count in range(6):
+        _wait_until(lambda: len(scheduler._waiting) == 2)
+        scheduler.release()
+        _wait_until(lambda: len(granted) == count + 1)
+
+    assert granted.count('big') == 4
+    assert granted.count('small') == 2
+
+
+def test_fair_scheduler_admits_up_to_slots():
+    """Requests only wait once every slot is taken."""
+    scheduler = FairScheduler(2)
+
+    assert scheduler.acquire('a') == 0
+    assert scheduler.acquire('b') == 0
+    waiter = threading.Thread(target=scheduler.acquire, args=('a',))
+    waiter.start()
+    _wait_until(lambda: len(scheduler._waiting) == 1)
+    scheduler.release()
+    waiter.join(timeout=5)
+
+    assert not waiter.is_alive()
+
+
+def test_tenant_metrics():
+    """Videos without verdicts count as failed."""
+    metrics = TenantMetrics()
+
+    metrics.record_dispatch(1.5, 100)
+    metrics.record_video(3)
+    metrics.record_video(0)
+
+    assert metrics.as_dict() == {
+        'videos': 2,
+        'failed_videos': 1,
+        'verdicts': 3,
+        'estimated_tokens': 100,
+        'queue_seconds': 1.5,
+        'run_seconds': 0.0,
+        'error': '',
+    }
+
+
+def test_load_manifest(tmp_path):
+    """Tenants need unique names.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    path = tmp_path / 'tenants.yaml'
+    path.write_text(
+        'tenants:\n'
+        '  - tenant_name: acme\n'
+        '    bucket_name: acme-ads\n'
+        '    tenant_weight: 2\n'
+        '  - tenant_name: globex\n'
+        '    bucket_name: globex-ads\n'
+    )
+
+    tenants = load_manifest(str(path))
+
+    assert [tenant['bucket_name'] for tenant in tenants] == [
+        'acme-ads',
+        'globex-ads',
+    ]
+    path.write_text('tenants:\n  - bucket_name: a\n  - bucket_name: b\n')
+    with pytest.raises(ValueError):
+        load_manifest(str(path))
+
+
+def test_load_manifest_rejects_shared_drive_state(tmp_path):
+    """Two tenants cannot store their Drive state in the same file.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    path = tmp_path / 'tenants.yaml'
+    path.write_text(
+        'tenants:\n'
+        '  - tenant_name: acme\n'
+        '    drive_state_path: state.json\n'
+        '  - tenant_name: globex\n'
+        '    drive_state_path: state.json\n'
+    )
+
+    with pytest.raises(ValueError, match='drive_state_path'):
+        load_manifest(str(path))
+
+
+def test_tenant_path():
+    """The tenant name goes before the extension."""
+    assert tenant_path('./drive_state.json', 'acme') == (
+        './drive_state.acme.json'
+    )
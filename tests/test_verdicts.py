@@ -0,0 +1,130 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the verdicts module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import sys
+
+sys.path.append('.')
+import pytest
+
+from utils.rules import parse_rules
+from utils.verdicts import VerdictStore, video_fingerprint
+
+RULES_CSV = 'Rule ID,Rule Description\n01,No alcohol\n02,No gambling\n'
+
+
+class FakeModel:
+    """Answers with a verdict for every rule it is asked about."""
+
+    def __init__(self, all_rules):
+        self.all_rules = all_rules
+        self.calls = []
+
+    def __call__(self, rules_subset):
+        rules = rules_subset or self.all_rules
+        self.calls.append([rule.index for rule in rules])
+        return {
+            'overall_compliance_assessment': 42,
+            'rules': [
+                {
+                    'rule_index': rule.index,
+                    'rule_violation': rule.index == 1,
+                    'violation_score': 3 if rule.index == 1 else 0,
+                    'violation_reason': rule.description,
+                    'violation_time': '',
+                }
+                for rule in rules
+            ],
+        }
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Creates a verdict store in a temporary directory.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    Yields:
+        The verdict store.
+    """
+    verdict_store = VerdictStore(str(tmp_path / 'verdicts.sqlite'), 'model')
+    yield verdict_store
+    verdict_store.close()
+
+
+def test_first_evaluation_sends_every_rule(store):
+    """Without stored verdicts the whole rules file is used.
+    Args:
+        store: The verdict store fixture.
+    """
+    rules = parse_rules(RULES_CSV)
+    model = FakeModel(rules)
+
+    result = store.evaluate('video', rules, model)
+
+    assert model.calls == [[1, 2]]
+    assert result['overall_compliance_assessment'] == 42
+
+
+def test_only_edited_rules_are_reevaluated(store):
+    """An edited rule is re-sent alone and merged with stored verdicts.
+    Args:
+        store: The verdict store fixture.
+    """
+    rules = parse_rules(RULES_CSV)
+    store.evaluate('video', rules, FakeModel(rules))
+    edited = parse_rules(RULES_CSV.replace('No gambling', 'No betting'))
+    model = FakeModel(edited)
+
+    result = store.evaluate('video', edited, model)
+
+    assert model.calls == [[2]]
+    assert [rule['rule_index'] for rule in result['rules']] == [1, 2]
+    assert result['rules'][1]['violation_reason'] == 'No betting'
+    assert result['overall_compliance_assessment'] == 50
+
+
+def test_unchanged_rules_skip_the_model(store):
+    """Nothing is sent to the model when every verdict is stored.
+    Args:
+        store: The verdict store fixture.
+    """
+    rules = parse_rules(RULES_CSV)
+    store.evaluate('video', rules, FakeModel(rules))
+    model = FakeModel(rules)
+
+    result = store.evaluate('video', rules, model)
+
+    assert not model.calls
+    assert len(result['rules']) == 2
+    assert store.evaluate('other', rules, model) is not None
+    assert model.calls == [[1, 2]]
+
+
+def test_video_fingerprint_follows_content(tmp_path):
+    """Copies of a video share a fingerprint, edits change it.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    content = bytes(range(256)) * 10000
+    first = tmp_path / 'a.mp4'
+    copy = tmp_path / 'b.mp4'
+    edited = tmp_path / 'c.mp4'
+    first.write_bytes(content)
+    copy.write_bytes(content)
+    edited.write_bytes(content[:-1] + b'x')
+
+    assert video_fingerprint(str(first)) == video_fingerprint(str(copy))
+    assert video_fingerprint(str(first)) != video_fingerprint(str(edited))
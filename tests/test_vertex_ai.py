@@ -23,7 +23,8 @@ from unittest.mock import MagicMock
 import pytest
 
 from utils.config import Config
-from utils.vertex_ai import VertexAIHandler
+from utils.rules import Rule
+from utils.vertex_ai import VertexAIHandler, types
 
 
 class TestConfig(Config):
@@ -47,7 +48,7 @@ def test_analyze_video(monkeypatch, mock_config):
     mock_client = MagicMock()
     mock_response = MagicMock()
     mock_response.text = (
-        '{"rules": [], ' '"overall_compliance_assessment": "Compliant"}'
+        '{"rules": [], "overall_compliance_assessment": "Compliant"}'
     )
     mock_client.models.generate_content.return_value = mock_response
     monkeypatch.setattr(
@@ -103,3 +104,216 @@ def test_prompt(monkeypatch, mock_config):
     prompt = vertex_ai_handler.prompt
 
     assert isinstance(prompt, str)
+
+
+@pytest.fixture
+def loaded_config(monkeypatch):
+    """Config object loaded from an empty configuration file.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    Returns:
+        Config: A configuration object with the default values.
+    """
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file', MagicMock(return_value={})
+    )
+    return Config()
+
+
+@pytest.fixture
+def mock_client(monkeypatch):
+    """Replaces the GenAI client of the handler.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    Returns:
+        The mocked client.
+    """
+    client = MagicMock()
+    client.models.generate_content.return_value.text = '{}'
+    monkeypatch.setattr(
+        'utils.vertex_ai.genai.Client', MagicMock(return_value=client)
+    )
+    return client
+
+
+def test_large_video_is_uploaded_and_deleted(
+    monkeypatch, loaded_config, mock_client, tmp_path
+):
+    """Videos over the inline limit are referenced by their uploaded file.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        mock_client: The mocked GenAI client.
+        tmp_path: pytest temporary directory fixture.
+    """
+    video = tmp_path / 'video.mp4'
+    video.write_bytes(b'0' * 10)
+    mock_client.files.upload.return_value = MagicMock(
+        state=types.FileState.PROCESSING
+    )
+    mock_client.files.get.return_value = MagicMock(
+        state=types.FileState.ACTIVE,
+        uri='https://files/video',
+        mime_type='video/mp4',
+    )
+    mock_client.files.get.return_value.name = 'files/video'
+    mock_sleep = MagicMock()
+    monkeypatch.setattr('utils.vertex_ai.time.sleep', mock_sleep)
+    loaded_config.inline_max_bytes = 5
+    handler = VertexAIHandler(loaded_config)
+
+    with handler.video_part(str(video)) as video_part:
+        assert video_part.file_data.file_uri == 'https://files/video'
+        assert video_part.inline_data is None
+        mock_client.files.delete.assert_not_called()
+
+    mock_client.files.upload.assert_called_once_with(
+        file=str(video), config={'mime_type': 'video/mp4'}
+    )
+    mock_sleep.assert_called_once()
+    mock_client.files.delete.assert_called_once_with(name='files/video')
+
+
+def test_failed_upload_raises(
+    monkeypatch, loaded_config, mock_client, tmp_path
+):
+    """An upload the Files API could not process fails the video.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        mock_client: The mocked GenAI client.
+        tmp_path: pytest temporary directory fixture.
+    """
+    video = tmp_path / 'video.mp4'
+    video.write_bytes(b'0' * 10)
+    mock_client.files.upload.return_value = MagicMock(
+        state=types.FileState.FAILED
+    )
+    monkeypatch.setattr('utils.vertex_ai.time.sleep', MagicMock())
+    loaded_config.inline_max_bytes = 5
+    handler = VertexAIHandler(loaded_config)
+
+    with pytest.raises(ValueError, match='failed to process'):
+        handler.analyze_video(str(video))
+    mock_client.models.generate_content.assert_not_called()
+
+
+def test_small_video_is_inlined(loaded_config, mock_client, tmp_path):
+    """Videos within the inline limit are sent as bytes, not uploaded.
+    Args:
+        loaded_config: A configuration object with the default values.
+        mock_client: The mocked GenAI client.
+        tmp_path: pytest temporary directory fixture.
+    """
+    video = tmp_path / 'video.mp4'
+    video.write_bytes(b'0' * 10)
+    handler = VertexAIHandler(loaded_config)
+
+    with handler.video_part(str(video)) as video_part:
+        assert video_part.inline_data.data == b'0' * 10
+
+    mock_client.files.upload.assert_not_called()
+
+
+def test_analyze_video_part_clips_the_segment(loaded_config, mock_client):
+    """Segment offsets are sent as the video metadata of the part.
+    Args:
+        loaded_config: A configuration object with the default values.
+        mock_client: The mocked GenAI client.
+    """
+    handler = VertexAIHandler(loaded_config, rules=[])
+    video_part = types.Part(
+        inline_data=types.Blob(data=b'video', mime_type='video/mp4')
+    )
+
+    handler.analyze_video_part(video_part, 50, 110.5)
+    handler.analyze_video_part(video_part)
+
+    clipped, whole = [
+        call.kwargs['contents'].parts[1]
+        for call in mock_client.models.generate_content.call_args_list
+    ]
+    assert clipped.video_metadata.start_offset == '50.000s'
+    assert clipped.video_metadata.end_offset == '110.500s'
+    assert clipped.inline_data.data == b'video'
+    assert whole.video_metadata is None
+    assert video_part.video_metadata is None
+
+
+def test_requests_carry_the_call_deadline(loaded_config, mock_client):
+    """The request timeout is sent in milliseconds, and left out when 0.
+    Args:
+        loaded_config: A configuration object with the default values.
+        mock_client: The mocked GenAI client.
+    """
+    video_part = types.Part(
+        inline_data=types.Blob(data=b'video', mime_type='video/mp4')
+    )
+    loaded_config.request_timeout_seconds = 2.5
+    VertexAIHandler(loaded_config, rules=[]).analyze_video_part(video_part)
+    loaded_config.request_timeout_seconds = 0
+    VertexAIHandler(loaded_config, rules=[]).analyze_video_part(video_part)
+
+    with_deadline, without_deadline = [
+        call.kwargs['config']
+        for call in mock_client.models.generate_content.call_args_list
+    ]
+    assert with_deadline['http_options'] == {'timeout': 2500}
+    assert with_deadline['response_mime_type'] == 'application/json'
+    assert 'http_options' not in without_deadline
+
+
+def test_transcribe_audio(loaded_config, mock_client, tmp_path):
+    """The audio track is sent inline and transcribed as plain text.
+    Args:
+        loaded_config: A configuration object with the default values.
+        mock_client: The mocked GenAI client.
+        tmp_path: pytest temporary directory fixture.
+    """
+    audio = tmp_path / 'audio.mp3'
+    audio.write_bytes(b'audio')
+    loaded_config.transcription_model = 'transcription_model'
+    mock_client.models.generate_content.return_value.text = '[0:01] Hi.'
+    handler = VertexAIHandler(loaded_config, rules=[])
+
+    transcript = handler.transcribe_audio(str(audio), 'audio/mpeg')
+
+    assert transcript == '[0:01] Hi.'
+    call = mock_client.models.generate_content.call_args
+    assert call.kwargs['model'] == 'transcription_model'
+    audio_part = call.kwargs['contents'].parts[1]
+    assert audio_part.inline_data.mime_type == 'audio/mpeg'
+    assert audio_part.inline_data.data == b'audio'
+    assert 'response_mime_type' not in call.kwargs['config']
+    assert 'response_schema' not in call.kwargs['config']
+
+    mock_client.models.generate_content.return_value.text = None
+    assert handler.transcribe_audio(str(audio), 'audio/mpeg') == ''
+
+
+def test_analyze_transcript(loaded_config, mock_client):
+    """The rules are reviewed against the transcript with the text model.
+    Args:
+        loaded_config: A configuration object with the default values.
+        mock_client: The mocked GenAI client.
+    """
+    loaded_config.text_model = 'text_model'
+    rules = [Rule(['id', 'rule', 'modality'], ['1', 'No slang', 'audio'])]
+    handler = VertexAIHandler(loaded_config, rules=rules)
+
+    handler.analyze_transcript('[0:01] Hi.', rules)
+    handler.analyze_transcript('', rules)
+
+    with_speech, without_speech = (
+        mock_client.models.generate_content.call_args_list
+    )
+    assert with_speech.kwargs['model'] == 'text_model'
+    prompt, transcript = with_speech.kwargs['contents'].parts
+    assert 'No slang' in prompt.text
+    assert transcript.text.endswith('audio track:\n[0:01] Hi.')
+    assert (
+        without_speech.kwargs['contents'].parts[1].text.endswith('(no speech)')
+    )
+    assert (
+        with_speech.kwargs['config']['response_mime_type'] == 'application/json'
+    )
@@ -15,7 +15,10 @@
 """Tests for the Video Ads Compass application."""
 # pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
 
+import json
+import os
 import sys
+import threading
 
 sys.path.append('.')
 from unittest.mock import MagicMock
@@ -23,11 +26,21 @@ from unittest.mock import MagicMock
 import pandas as pd
 import pytest
 
+from utils.cache import VideoCache
 from utils.config import Config
+from utils.probe import MediaInfo
+from utils.sampling import RateEstimate
+from utils.tenants import SharedResources
 from video_ads_compass import (
     download_and_list_video_files_gcs,
+    estimate_run,
+    iter_watched_videos,
     main,
     process_videos_and_create_df,
+    run_batch,
+    run_tenants,
+    sample_videos,
+    watch_videos,
 )
 
 
@@ -103,6 +116,583 @@ def test_main(monkeypatch):
         'video_ads_compass.process_videos_and_create_df',
         MagicMock(return_value=pd.DataFrame()),
     )
-    monkeypatch.setattr('video_ads_compass.GoogleSheetsHandler', MagicMock())
+    monkeypatch.setattr('video_ads_compass.SheetsRunWriter', MagicMock())
 
     main()
+
+
+@pytest.fixture
+def loaded_config(monkeypatch):
+    """Config object loaded from an empty configuration file.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    Returns:
+        Config: A configuration object with the default values.
+    """
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file', MagicMock(return_value={})
+    )
+    return Config()
+
+
+def test_downloaded_gcs_videos_stay_pinned(
+    monkeypatch, loaded_config, tmp_path
+):
+    """Downloaded videos are not evicted before the caller releases them.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: Config fixture.
+        tmp_path: pytest temporary directory fixture.
+    """
+
+    def download(path):
+        with open(path, 'wb') as video_file:
+            video_file.write(b'0' * 10)
+
+    blobs = []
+    for name in ('first.mp4', 'second.mp4'):
+        blob = MagicMock()
+        blob.name = name
+        blob.download_to_filename.side_effect = download
+        blobs.append(blob)
+    monkeypatch.setattr(
+        'video_ads_compass.gcs.list_video_blobs', MagicMock(return_value=blobs)
+    )
+    monkeypatch.setattr('video_ads_compass.storage.Client', MagicMock())
+    cache = VideoCache(str(tmp_path), max_bytes=15)
+
+    video_files = download_and_list_video_files_gcs(loaded_config, cache)
+
+    assert all(os.path.exists(path) for path in video_files)
+    for path in video_files:
+        cache.release(path)
+    assert cache.size <= 15
+
+
+def test_process_videos_and_create_df_concurrent(monkeypatch, loaded_config):
+    """Tests that concurrent analysis keeps results in video order.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+    """
+
+    def analyze_video(file_path):
+        return json.dumps(
+            {
+                'overall_compliance_assessment': 90,
+                'rules': [
+                    {
+                        'rule_index': 1,
+                        'rule_violation': False,
+                        'violation_score': 0,
+                        'violation_reason': file_path,
+                        'violation_time': '',
+                    }
+                ],
+            }
+        )
+
+    mock_vertex_ai_handler = MagicMock()
+    mock_vertex_ai_handler.analyze_video.side_effect = analyze_video
+    monkeypatch.setattr(
+        'video_ads_compass.VertexAIHandler',
+        MagicMock(return_value=mock_vertex_ai_handler),
+    )
+    video_uris = [f'video_{i}.mp4' for i in range(10)]
+
+    df = process_videos_and_create_df(iter(video_uris), loaded_config)
+
+    assert df['video_uri'].tolist() == video_uris
+    assert df['video_key'].tolist() == list(range(10))
+
+
+def test_rules_are_loaded_once_per_run(monkeypatch, loaded_config):
+    """The rules parsed by the run are the ones the handler prompts with.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+    """
+    rules = [MagicMock()]
+    mock_load_rules = MagicMock(return_value=rules)
+    monkeypatch.setattr('video_ads_compass.load_rules', mock_load_rules)
+    mock_handler_class = MagicMock()
+    mock_handler_class.return_value.analyze_video.return_value = ''
+    monkeypatch.setattr('video_ads_compass.VertexAIHandler', mock_handler_class)
+
+    process_videos_and_create_df(['a.mp4'], loaded_config)
+    process_videos_and_create_df(['a.mp4'], loaded_config, rules=rules)
+
+    mock_load_rules.assert_called_once_with(loaded_config.rules_path)
+    for call in mock_handler_class.call_args_list:
+        assert call[0][2] is rules
+
+
+def test_timed_out_video_does_not_fail_the_run(monkeypatch, loaded_config):
+    """A video whose model call times out is dropped, the others are kept.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+    """
+
+    def analyze_video(file_path):
+        if file_path == 'b.mp4':
+            raise TimeoutError('deadline exceeded')
+        return json.dumps(
+            {
+                'overall_compliance_assessment': 100,
+                'rules': [
+                    {
+                        'rule_index': 1,
+                        'rule_violation': False,
+                        'violation_score': 0,
+                        'violation_reason': '',
+                        'violation_time': '',
+                    }
+                ],
+            }
+        )
+
+    mock_vertex_ai_handler = MagicMock()
+    mock_vertex_ai_handler.analyze_video.side_effect = analyze_video
+    monkeypatch.setattr(
+        'video_ads_compass.VertexAIHandler',
+        MagicMock(return_value=mock_vertex_ai_handler),
+    )
+    loaded_config.max_retries = 0
+    resources = SharedResources(loaded_config)
+
+    df = process_videos_and_create_df(
+        ['a.mp4', 'b.mp4', 'c.mp4'], loaded_config, resources=resources
+    )
+
+    assert df['video_uri'].tolist() == ['a.mp4', 'c.mp4']
+    metrics = resources.metrics(loaded_config.tenant_name)
+    assert metrics.as_dict()['failed_videos'] == 1
+
+
+def test_estimate_run(monkeypatch, loaded_config):
+    """The dry run estimates every video without calling the model.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+    """
+    mock_vertex_ai_handler = MagicMock()
+    mock_vertex_ai_handler.count_prompt_tokens.return_value = 100
+    monkeypatch.setattr(
+        'video_ads_compass.VertexAIHandler',
+        MagicMock(return_value=mock_vertex_ai_handler),
+    )
+    monkeypatch.setattr(
+        'utils.scheduling.probe_media',
+        MagicMock(return_value=MediaInfo(10, 640, 360, has_audio=True)),
+    )
+
+    estimate = estimate_run(['a.mp4', 'b.mp4'], loaded_config)
+
+    assert estimate['videos'] == 2
+    assert estimate['input_tokens'] == 2 * (10 * 290 + 100)
+    mock_vertex_ai_handler.analyze_video.assert_not_called()
+
+
+def test_dry_run_probes_without_downloading(
+    monkeypatch, loaded_config, tmp_path
+):
+    """The dry run probes listed videos by URL and downloads nothing.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        tmp_path: pytest temporary directory fixture.
+    """
+    blobs = []
+    for name in ('a.mp4', 'b.mp4'):
+        blob = MagicMock(size=1000, public_url=f'https://gcs/{name}')
+        blob.name = name
+        blobs.append(blob)
+    monkeypatch.setattr(
+        'video_ads_compass.gcs.list_video_blobs', MagicMock(return_value=blobs)
+    )
+    monkeypatch.setattr('utils.clients.storage.Client', MagicMock())
+    monkeypatch.setattr(
+        'video_ads_compass.auth.bearer_headers',
+        MagicMock(return_value={'Authorization': 'Bearer t'}),
+    )
+    mock_probe = MagicMock(return_value=MediaInfo(10, 640, 360, True))
+    monkeypatch.setattr('video_ads_compass.probe_media', mock_probe)
+    mock_vertex_ai_handler = MagicMock()
+    mock_vertex_ai_handler.count_prompt_tokens.return_value = 100
+    monkeypatch.setattr(
+        'video_ads_compass.VertexAIHandler',
+        MagicMock(return_value=mock_vertex_ai_handler),
+    )
+    loaded_config.dry_run = True
+
+    run_batch(loaded_config, VideoCache(str(tmp_path)))
+
+    assert [call[0] for call in mock_probe.call_args_list] == [
+        ('https://gcs/a.mp4', {'Authorization': 'Bearer t'}),
+        ('https://gcs/b.mp4', {'Authorization': 'Bearer t'}),
+    ]
+    assert not any(blob.download_to_filename.called for blob in blobs)
+
+
+def test_estimated_videos_are_probed_once(monkeypatch, loaded_config):
+    """The duration probed for scheduling is reused by the analysis.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+    """
+    mock_vertex_ai_handler = MagicMock()
+    mock_vertex_ai_handler.count_prompt_tokens.return_value = 100
+    mock_vertex_ai_handler.analyze_video.return_value = json.dumps(
+        {'overall_compliance_assessment': 100, 'rules': []}
+    )
+    monkeypatch.setattr(
+        'video_ads_compass.VertexAIHandler',
+        MagicMock(return_value=mock_vertex_ai_handler),
+    )
+    mock_probe = MagicMock(return_value=MediaInfo(10, 640, 360, True))
+    monkeypatch.setattr('utils.scheduling.probe_media', mock_probe)
+    mock_probe_duration = MagicMock()
+    monkeypatch.setattr('video_ads_compass.probe_duration', mock_probe_duration)
+    loaded_config.segment_seconds = 60
+    loaded_config.schedule_lookahead = 4
+
+    process_videos_and_create_df(['a.mp4', 'b.mp4'], loaded_config)
+
+    assert mock_probe.call_count == 2
+    mock_probe_duration.assert_not_called()
+    assert mock_vertex_ai_handler.analyze_video.call_count == 2
+
+
+def test_watch_videos_streams_dropped_videos(
+    monkeypatch, loaded_config, tmp_path
+):
+    """Videos dropped while watching are analyzed and streamed one by one.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        tmp_path: pytest temporary directory fixture.
+    """
+    mock_vertex_ai_handler = MagicMock()
+    mock_vertex_ai_handler.analyze_video.return_value = json.dumps(
+        {
+            'overall_compliance_assessment': 100,
+            'rules': [
+                {
+                    'rule_index': 1,
+                    'rule_violation': False,
+                    'violation_score': 0,
+                    'violation_reason': '',
+                    'violation_time': '',
+                }
+            ],
+        }
+    )
+    monkeypatch.setattr(
+        'video_ads_compass.VertexAIHandler',
+        MagicMock(return_value=mock_vertex_ai_handler),
+    )
+    stop = threading.Event()
+    streamed = []
+
+    def append_results(df):
+        streamed.append(df['video_uri'].iloc[0])
+        if len(streamed) == 2:
+            stop.set()
+
+    mock_writer = MagicMock()
+    mock_writer.append_results.side_effect = append_results
+    monkeypatch.setattr(
+        'video_ads_compass.SheetsRunWriter', MagicMock(return_value=mock_writer)
+    )
+    drop_dir = tmp_path / 'incoming'
+    drop_dir.mkdir()
+    for name in ('a.mp4', 'b.mp4'):
+        (drop_dir / name).write_bytes(b'video')
+    loaded_config.watch_source = 'DIRECTORY'
+    loaded_config.watch_dir = str(drop_dir)
+    loaded_config.watch_poll_seconds = 0.01
+    loaded_config.schedule_lookahead = 4
+
+    watch_videos(loaded_config, VideoCache(str(tmp_path / 'cache')), stop)
+
+    assert sorted(streamed) == [
+        str(drop_dir / 'a.mp4'),
+        str(drop_dir / 'b.mp4'),
+    ]
+    assert loaded_config.schedule_lookahead == 4
+
+
+def test_watch_acks_notifications_after_results_are_written(
+    monkeypatch, loaded_config, tmp_path
+):
+    """A notification is acked once its results reach the spreadsheet.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        tmp_path: pytest temporary directory fixture.
+    """
+    mock_vertex_ai_handler = MagicMock()
+    mock_vertex_ai_handler.analyze_video.side_effect = [
+        json.dumps(
+            {
+                'overall_compliance_assessment': 100,
+                'rules': [
+                    {
+                        'rule_index': 1,
+                        'rule_violation': False,
+                        'violation_score': 0,
+                        'violation_reason': '',
+                        'violation_time': '',
+                    }
+                ],
+            }
+        ),
+        ValueError('bad response'),
+    ]
+    monkeypatch.setattr(
+        'video_ads_compass.VertexAIHandler',
+        MagicMock(return_value=mock_vertex_ai_handler),
+    )
+    events = []
+    mock_writer = MagicMock()
+    mock_writer.append_results.side_effect = lambda _: events.append('write')
+    monkeypatch.setattr(
+        'video_ads_compass.SheetsRunWriter', MagicMock(return_value=mock_writer)
+    )
+    mock_leases = MagicMock()
+    mock_leases.ack.side_effect = lambda path: events.append(('ack', path))
+    monkeypatch.setattr(
+        'video_ads_compass.NotificationLeases',
+        MagicMock(return_value=mock_leases),
+    )
+    monkeypatch.setattr('video_ads_compass.pubsub_v1', MagicMock())
+    monkeypatch.setattr(
+        'video_ads_compass.iter_watched_videos',
+        MagicMock(return_value=iter(['a.mp4', 'b.mp4'])),
+    )
+    loaded_config.watch_source = 'PUBSUB'
+    loaded_config.max_concurrency = 1
+
+    watch_videos(
+        loaded_config, VideoCache(str(tmp_path / 'cache')), threading.Event()
+    )
+
+    assert events == ['write', ('ack', 'a.mp4')]
+    mock_leases.close.assert_called_once()
+
+
+def test_watch_refetches_a_video_overwritten_in_flight(
+    monkeypatch, loaded_config, tmp_path
+):
+    """An overwrite of a video still being analyzed is downloaded again.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        tmp_path: pytest temporary directory fixture.
+    """
+    versions = iter([b'old', b'new'])
+
+    def download(path):
+        with open(path, 'wb') as file:
+            file.write(next(versions))
+
+    mock_client = MagicMock()
+    mock_client.bucket.return_value.blob.return_value.download_to_filename = (
+        download
+    )
+    monkeypatch.setattr(
+        'video_ads_compass.storage.Client', MagicMock(return_value=mock_client)
+    )
+    monkeypatch.setattr(
+        'video_ads_compass.iter_notifications',
+        MagicMock(return_value=iter(['ad.mp4', 'ad.mp4'])),
+    )
+    loaded_config.watch_source = 'PUBSUB'
+    cache = VideoCache(str(tmp_path))
+    leases = MagicMock()
+
+    videos = iter_watched_videos(
+        loaded_config, cache, threading.Event(), leases
+    )
+    old = next(videos)
+    cache.pin(old)
+    new = next(videos)
+
+    assert new != old
+    with open(old, 'rb') as file:
+        assert file.read() == b'old'
+    with open(new, 'rb') as file:
+        assert file.read() == b'new'
+    leases.move.assert_called_once_with(old, new)
+
+
+def test_sample_videos_estimates_rates(monkeypatch, loaded_config, tmp_path):
+    """Only the sample is downloaded and analyzed, rates are estimated.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        tmp_path: pytest temporary directory fixture.
+    """
+
+    def blob(name):
+        mock_blob = MagicMock(size=1, updated=None)
+        mock_blob.name = name
+        mock_blob.download_to_filename.side_effect = lambda path: open(
+            path, 'wb'
+        ).close()
+        return mock_blob
+
+    blobs = [blob(f'{brand}/{i}.mp4') for brand in 'ab' for i in range(10)]
+    monkeypatch.setattr('video_ads_compass.storage.Client', MagicMock())
+    monkeypatch.setattr(
+        'video_ads_compass.gcs.list_video_blobs', MagicMock(return_value=blobs)
+    )
+
+    def analyze_video(file_path):
+        return json.dumps(
+            {
+                'overall_compliance_assessment': 50,
+                'rules': [
+                    {
+                        'rule_index': 1,
+                        'rule_violation': '/a/' in file_path,
+                        'violation_score': 3,
+                        'violation_reason': '',
+                        'violation_time': '',
+                    }
+                ],
+            }
+        )
+
+    mock_vertex_ai_handler = MagicMock()
+    mock_vertex_ai_handler.analyze_video.side_effect = analyze_video
+    monkeypatch.setattr(
+        'video_ads_compass.VertexAIHandler',
+        MagicMock(return_value=mock_vertex_ai_handler),
+    )
+    loaded_config.sample_size = 6
+    loaded_config.sample_target_half_width = 0
+
+    df_results, df_estimates = sample_videos(
+        loaded_config, VideoCache(str(tmp_path / 'cache'))
+    )
+
+    assert len(df_results) == 6
+    assert sum(b.download_to_filename.called for b in blobs) == 6
+    assert df_estimates['rule_index'].tolist() == [1]
+    assert df_estimates['violation_rate'].tolist() == [0.5]
+    assert df_estimates['sampled_videos'].tolist() == [6]
+
+
+def test_sample_estimates_sort_mixed_rule_ids(
+    monkeypatch, loaded_config, tmp_path
+):
+    """Estimates of numeric and text rule ids are listed together.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        tmp_path: pytest temporary directory fixture.
+    """
+    monkeypatch.setattr('video_ads_compass.storage.Client', MagicMock())
+    monkeypatch.setattr(
+        'video_ads_compass.gcs.list_video_blobs', MagicMock(return_value=[])
+    )
+    monkeypatch.setattr(
+        'video_ads_compass.sampling.sample_until_precision',
+        MagicMock(
+            return_value={
+                'B2': RateEstimate(0.1, 0, 0.2, 5),
+                1: RateEstimate(0.5, 0.4, 0.6, 5),
+            }
+        ),
+    )
+
+    _, df_estimates = sample_videos(
+        loaded_config, VideoCache(str(tmp_path / 'cache'))
+    )
+
+    assert df_estimates['rule_index'].tolist() == [1, 'B2']
+
+
+def test_run_tenants_shares_resources(monkeypatch, loaded_config, tmp_path):
+    """Tenants run with their own config over the same shared resources.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        loaded_config: A configuration object with the default values.
+        tmp_path: pytest temporary directory fixture.
+    """
+    monkeypatch.setattr(
+        'video_ads_compass.load_manifest',
+        MagicMock(
+            return_value=[
+                {
+                    'tenant_name': 'acme',
+                    'bucket_name': 'acme-ads',
+                    'cache_dir': str(tmp_path),
+                },
+                {
+                    'tenant_name': 'globex',
+                    'bucket_name': 'globex-ads',
+                    'cache_dir': str(tmp_path),
+                    'tenant_weight': 3,
+                    'drive_state_path': 'globex.json',
+                },
+            ]
+        ),
+    )
+    runs = []
+    mock_run_batch = MagicMock(
+        side_effect=lambda config, cache, resources: runs.append(
+            (
+                config.bucket_name,
+                config.tenant_weight,
+                cache.root,
+                config.drive_state_path,
+                resources,
+            )
+        )
+    )
+    monkeypatch.setattr('video_ads_compass.run_batch', mock_run_batch)
+
+    report = run_tenants(loaded_config)
+
+    assert sorted(run[:4] for run in runs) == [
+        ('acme-ads', 1, str(tmp_path / 'acme'), './drive_state.acme.json'),
+        ('globex-ads', 3, str(tmp_path / 'globex'), 'globex.json'),
+    ]
+    assert runs[0][4] is runs[1][4]
+    assert sorted(report) == ['acme', 'globex']
+
+
+def test_failed_tenant_fails_main(monkeypatch, tmp_path):
+    """A failing tenant does not stop the others but fails the process.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+        tmp_path: pytest temporary directory fixture.
+    """
+    monkeypatch.setattr(
+        'video_ads_compass.load_manifest',
+        MagicMock(
+            return_value=[
+                {'tenant_name': 'acme', 'cache_dir': str(tmp_path)},
+                {'tenant_name': 'globex', 'cache_dir': str(tmp_path)},
+            ]
+        ),
+    )
+
+    def run_batch(config, *_):
+        if config.tenant_name == 'acme':
+            raise RuntimeError('quota')
+
+    monkeypatch.setattr('video_ads_compass.run_batch', run_batch)
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file',
+        MagicMock(return_value={'tenants_path': 'tenants.yaml'}),
+    )
+
+    report = run_tenants(Config())
+
+    assert report['acme']['error'] == "RuntimeError('quota')"
+    assert report['globex']['error'] == ''
+    assert main() == 1
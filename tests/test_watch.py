@@ -0,0 +1,208 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Test file for the watch module."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, g-import-not-at-top
+
+import json
+import sys
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.append('.')
+from utils.config import Config
+from utils.watch import (
+    DirectoryWatcher,
+    NotificationLeases,
+    iter_notifications,
+    poll_new,
+)
+
+
+@pytest.fixture
+def loaded_config(monkeypatch):
+    """Config object watching a bucket.
+    Args:
+        monkeypatch: pytest monkeypatch fixture.
+    Returns:
+        Config: A configuration object with a bucket and subscription.
+    """
+    monkeypatch.setattr(
+        'utils.config.Config.load_config_from_file',
+        MagicMock(
+            return_value={
+                'bucket_name': 'ads',
+                'pubsub_subscription': 'projects/p/subscriptions/s',
+            }
+        ),
+    )
+    return Config()
+
+
+def test_poll_new_yields_only_new_names():
+    """Names of the first listing are skipped unless included."""
+    listings = iter(
+        [[('a', 1)], [('a', 1), ('b', 1)], [('a', 1), ('b', 1), ('c', 1)]]
+    )
+    stop = threading.Event()
+
+    def list_versions():
+        listing = next(listings, None)
+        if listing is None:
+            stop.set()
+            return []
+        return listing
+
+    assert list(poll_new(list_versions, 0, stop)) == ['b', 'c']
+
+
+def test_poll_new_yields_overwritten_names_again():
+    """An object overwritten under the same name has a new version."""
+    listings = iter([[('a', 1)], [('a', 1)], [('a', 2)], [('a', 2)]])
+    stop = threading.Event()
+
+    def list_versions():
+        listing = next(listings, None)
+        if listing is None:
+            stop.set()
+            return []
+        return listing
+
+    assert list(poll_new(list_versions, 0, stop)) == ['a']
+
+
+def test_directory_watcher_waits_for_settled_files(tmp_path):
+    """Files are listed once their size stops changing.
+    Args:
+        tmp_path: pytest temporary directory fixture.
+    """
+    watcher = DirectoryWatcher(str(tmp_path), ['.mp4'])
+    video = tmp_path / 'ad.mp4'
+    video.write_bytes(b'1')
+    (tmp_path / '.ad2.mp4').write_bytes(b'1')
+    (tmp_path / 'notes.txt').write_bytes(b'1')
+
+    assert watcher.list_ready() == []
+    video.write_bytes(b'12')
+    assert watcher.list_ready() == []
+    assert watcher.list_ready() == [(str(video), video.stat().st_mtime_ns)]
+
+
+def _message(ack_id, event, name, bucket='ads'):
+    """Builds a pulled bucket notification.
+    Args:
+        ack_id: The acknowledgement id.
+        event: The notification event type.
+        name: The object name.
+        bucket: The bucket name.
+    Returns:
+        The received message.
+    """
+    received = MagicMock(ack_id=ack_id)
+    received.message.attributes = {
+        'eventType': event,
+        'bucketId': bucket,
+        'objectId': name,
+    }
+    received.message.data = json.dumps({'contentType': 'video/mp4'}).encode()
+    return received
+
+
+def test_iter_notifications(loaded_config):
+    """Video notifications are leased, the others are acked right away.
+    Args:
+        loaded_config: A configuration object with a bucket.
+    """
+    stop = threading.Event()
+    subscriber = MagicMock()
+    subscriber.pull.return_value.received_messages = [
+        _message('1', 'OBJECT_FINALIZE', 'new/ad.mp4'),
+        _message('2', 'OBJECT_DELETE', 'old/ad.mp4'),
+        _message('3', 'OBJECT_FINALIZE', 'new/notes.txt'),
+        _message('4', 'OBJECT_FINALIZE', 'ad.mp4', bucket='other'),
+    ]
+    leases = MagicMock()
+
+    names = []
+    for name in iter_notifications(subscriber, loaded_config, stop, leases):
+        names.append(name)
+        stop.set()
+
+    assert names == ['new/ad.mp4']
+    leases.add.assert_called_once_with('new/ad.mp4', '1')
+    (ack,) = subscriber.acknowledge.call_args_list
+    assert ack.kwargs['request']['ack_ids'] == ['2', '3', '4']
+    assert subscriber.pull.call_args.kwargs['request']['subscription'] == (
+        'projects/p/subscriptions/s'
+    )
+
+
+def test_notification_leases():
+    """Held messages are extended until acked, or returned on close."""
+    subscriber = MagicMock()
+    leases = NotificationLeases(subscriber, 'sub', deadline_seconds=600)
+    leases.add('a.mp4', '1')
+    leases.add('b.mp4', '2')
+
+    leases.extend()
+    leases.ack('a.mp4')
+    leases.close()
+
+    deadlines = [
+        (
+            call.kwargs['request']['ack_ids'],
+            call.kwargs['request']['ack_deadline_seconds'],
+        )
+        for call in subscriber.modify_ack_deadline.call_args_list
+    ]
+    assert deadlines == [
+        (['1'], 600),
+        (['2'], 600),
+        (['1', '2'], 600),
+        (['2'], 0),
+    ]
+    (ack,) = subscriber.acknowledge.call_args_list
+    assert ack.kwargs['request']['ack_ids'] == ['1']
+
+
+def test_notification_leases_move():
+    """Moved messages are acked by their new key only."""
+    subscriber = MagicMock()
+    leases = NotificationLeases(subscriber, 'sub', deadline_seconds=600)
+    leases.add('a.mp4', '1')
+
+    leases.move('a.mp4', 'a.1234.mp4')
+    leases.ack('a.mp4')
+    leases.ack('a.1234.mp4')
+    leases.close()
+
+    (ack,) = subscriber.acknowledge.call_args_list
+    assert ack.kwargs['request']['ack_ids'] == ['1']
+
+
+def test_notification_leases_expire():
+    """A message held longer than the lease limit is no longer extended."""
+    subscriber = MagicMock()
+    leases = NotificationLeases(
+        subscriber, 'sub', deadline_seconds=600, max_lease_seconds=0
+    )
+    leases.add('a.mp4', '1')
+    subscriber.modify_ack_deadline.reset_mock()
+
+    leases.extend()
+    leases.close()
+
+    subscriber.modify_ack_deadline.assert_not_called()
@@ -0,0 +1,61 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for extracting the audio track of videos."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import os
+import subprocess
+
+from utils import logging as log
+
+AUDIO_MIME_TYPE = 'audio/mpeg'
+
+
+def extract_audio(video_path: str, audio_path: str) -> bool:
+    """Extracts the audio track of a video as a small mono MP3 with ffmpeg.
+    Speech stays intelligible at 16 kHz and 32 kbps, which keeps even long
+    videos small enough to send inline.
+    Args:
+        video_path: The path to the video file.
+        audio_path: The path of the MP3 file to write.
+    Returns:
+        True if audio was extracted, False if the video has no audio track
+        or ffmpeg failed.
+    """
+    try:
+        subprocess.run(
+            [
+                'ffmpeg',
+                '-v',
+                'error',
+                '-y',
+                '-i',
+                video_path,
+                '-vn',
+                '-ac',
+                '1',
+                '-ar',
+                '16000',
+                '-b:a',
+                '32k',
+                audio_path,
+            ],
+            capture_output=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        log.logger.warning(f'Could not extract audio of {video_path}: {e}')
+        return False
+    return os.path.exists(audio_path) and os.path.getsize(audio_path) > 0
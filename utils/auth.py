@@ -15,14 +15,18 @@
 """Credentials validation for Google Sheets, Drive and Vertex AI APIs."""
 # pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, broad-exception-caugh
 
+from __future__ import annotations
+
 from typing import Any, Final
 
 from google.auth import exceptions
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
 
+from utils import lazy
 from utils import logging as log
 
+credentials = lazy.LazyModule('google.oauth2.credentials')
+transport_requests = lazy.LazyModule('google.auth.transport.requests')
+
 _SCOPES: Final[list[str]] = [
     'https://www.googleapis.com/auth/spreadsheets',
     'https://www.googleapis.com/auth/drive',
@@ -30,7 +34,7 @@ _SCOPES: Final[list[str]] = [
 ]
 
 
-def _get_credentials(config: dict[str, Any]) -> Credentials:
+def _get_credentials(config: dict[str, Any]) -> credentials.Credentials:
     """Validates the users credentials have the needed scope.
     Args:
         config: dictionary of user credentials to validate
@@ -44,11 +48,13 @@ def _get_credentials(config: dict[str, Any]) -> Credentials:
         'client_secret': config['client_secret'],
     }
 
-    creds = Credentials.from_authorized_user_info(user_info, _SCOPES)
+    creds = credentials.Credentials.from_authorized_user_info(
+        user_info, _SCOPES
+    )
 
     if creds.expired:
         try:
-            creds.refresh(Request())
+            creds.refresh(transport_requests.Request())
         except exceptions.RefreshError as error:
             if 'invalid_scope' in error.args[0]:
                 log.logger.error(
@@ -56,9 +62,21 @@ def _get_credentials(config: dict[str, Any]) -> Credentials:
                     'Regenerate a new one from the OAuthPlayground'
                     '(Refer to README for more information)'
                 )
-                creds = Credentials.from_authorized_user_info(
+                creds = credentials.Credentials.from_authorized_user_info(
                     user_info, _SCOPES
                 )
     if not creds.valid:
         creds = None
     return creds
+
+
+def bearer_headers(creds: credentials.Credentials) -> dict[str, str]:
+    """Gets the headers authorizing a plain HTTP request, such as ffprobe's.
+    Args:
+        creds: The OAuth credentials, refreshed if their token expired.
+    Returns:
+        The Authorization header.
+    """
+    if not creds.valid:
+        creds.refresh(transport_requests.Request())
+    return {'Authorization': f'Bearer {creds.token}'}
@@ -0,0 +1,224 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for the local cache of downloaded videos."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import collections
+import contextlib
+import os
+import tempfile
+import threading
+import uuid
+from typing import Callable, Iterator, Optional
+
+from utils import logging as log
+
+_TEMP_SUFFIX = '.part'
+
+
+class VideoCache:
+    """Size bounded local cache of videos with LRU eviction.
+    Files are written to a temporary file and renamed into place, so a
+    crashed download never leaves a partial video behind. Pinned files are
+    in use by the pipeline and are never evicted.
+    Attributes:
+        root: The directory holding the cached files.
+        max_bytes: The byte budget of the cache, 0 for unlimited.
+    """
+
+    def __init__(self, root: str, max_bytes: int = 0) -> None:
+        """Initiate the cache and index the files already on disk.
+        Args:
+            root: The directory holding the cached files.
+            max_bytes: The byte budget of the cache, 0 for unlimited.
+        """
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._pins = collections.Counter()
+        self._stale = set()
+        self._size = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._scan()
+
+    def _scan(self) -> None:
+        """Indexes existing files, least recently used first."""
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename.endswith(_TEMP_SUFFIX):
+                    os.remove(path)
+                    continue
+                if filename.startswith('.'):
+                    continue
+                stat = os.stat(path)
+                found.append((stat.st_mtime, path, stat.st_size))
+        for _, path, size in sorted(found):
+            self._entries[path] = size
+            self._size += size
+
+    @property
+    def size(self) -> int:
+        """The number of bytes currently held by the cache."""
+        return self._size
+
+    def path_for(self, name: str) -> str:
+        """Maps an object name to its path inside the cache.
+        Args:
+            name: The object name, may contain '/' separated prefixes.
+        Returns:
+            The absolute path of the cached file.
+        Raises:
+            ValueError: If the name would resolve outside the cache root.
+        """
+        path = os.path.normpath(os.path.join(self.root, name.lstrip('/')))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f'Invalid object name for the cache: {name}')
+        return path
+
+    def fetch(
+        self,
+        name: str,
+        writer: Callable[[str], None],
+        pin: bool = False,
+        refresh: bool = False,
+    ) -> str:
+        """Returns the cached file for name, writing it first on a miss.
+        Args:
+            name: The object name, may contain '/' separated prefixes.
+            writer: Called with a temporary path to write the file contents.
+            pin: Whether to pin the file, to be released by the caller.
+            refresh: Whether to write the file again even if cached, for an
+                object overwritten since. A cached copy still pinned by a
+                reader is kept until released and the new one is written to
+                a fresh path next to it.
+        Returns:
+            The path of the cached file.
+        """
+        path = self.path_for(name)
+        with self._lock:
+            if path in self._entries and refresh:
+                if self._pins.get(path):
+                    self._stale.add(path)
+                    stem, extension = os.path.splitext(path)
+                    path = f'{stem}.{uuid.uuid4().hex[:8]}{extension}'
+                else:
+                    self._remove(path)
+            elif path in self._entries:
+                self._touch(path)
+                if pin:
+                    self._pins[path] += 1
+                return path
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix='.', suffix=_TEMP_SUFFIX
+        )
+        os.close(fd)
+        try:
+            writer(temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self._lock:
+            size = os.path.getsize(path)
+            self._size += size - self._entries.pop(path, 0)
+            self._entries[path] = size
+            if pin:
+                self._pins[path] += 1
+            self._evict(keep=path)
+        return path
+
+    def release(self, path: str) -> None:
+        """Unpins a file pinned by fetch or pin.
+        A copy replaced by a refreshing fetch is removed once unpinned.
+        Args:
+            path: The path of the cached file.
+        """
+        with self._lock:
+            self._pins[path] -= 1
+            if self._pins[path] <= 0:
+                del self._pins[path]
+                if path in self._stale:
+                    self._stale.discard(path)
+                    self._remove(path)
+            self._evict()
+
+    def pin(self, path: str) -> None:
+        """Protects a cached file from eviction until it is released.
+        Args:
+            path: The path of the cached file.
+        """
+        with self._lock:
+            self._pins[path] += 1
+
+    @contextlib.contextmanager
+    def pinned(self, path: str) -> Iterator[str]:
+        """Keeps a cached file pinned for the duration of the context.
+        Args:
+            path: The path of the cached file.
+        Yields:
+            The path of the cached file.
+        """
+        self.pin(path)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def _touch(self, path: str) -> None:
+        """Marks a file as most recently used, on disk and in the index."""
+        self._entries.move_to_end(path)
+        with contextlib.suppress(OSError):
+            os.utime(path)
+
+    def _remove(self, path: str) -> None:
+        """Removes a file from the index and the disk."""
+        if path in self._entries:
+            self._size -= self._entries.pop(path)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """Removes least recently used unpinned files until under budget.
+        Args:
+            keep: A file to keep regardless, the one just written.
+        """
+        if not self.max_bytes:
+            return
+        for path in list(self._entries):
+            if self._size <= self.max_bytes:
+                break
+            if path == keep or self._pins.get(path):
+                continue
+            self._remove(path)
+            self._remove_empty_parents(path)
+            log.logger.info(f'Evicted {path} from the video cache')
+
+    def _remove_empty_parents(self, path: str) -> None:
+        """Removes the directories left empty by an eviction."""
+        directory = os.path.dirname(path)
+        while directory and directory != self.root:
+            try:
+                os.rmdir(directory)
+            except OSError:
+                return
+            directory = os.path.dirname(directory)
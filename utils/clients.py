@@ -0,0 +1,70 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for sharing API clients within a process."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from utils import lazy
+from utils.config import Config
+
+genai = lazy.LazyModule('google.genai')
+storage = lazy.LazyModule('google.cloud.storage')
+
+
+class ClientPool:
+    """Creates each API client once and hands it to every run needing it.
+    Clients keep their connection pools and credentials warm, so runs of
+    several tenants sharing an API key or OAuth client only pay the setup
+    once.
+    """
+
+    def __init__(self) -> None:
+        """Initiate the empty pool."""
+        self._clients: Dict[Hashable, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        """Returns the pooled client for key, creating it on first use."""
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = create()
+            return self._clients[key]
+
+    def genai(self, api_key: str) -> genai.Client:
+        """Gets the GenAI client of an API key.
+        Args:
+            api_key: The Gemini API key.
+        Returns:
+            The client.
+        """
+        return self._get(
+            ('genai', api_key), lambda: genai.Client(api_key=api_key)
+        )
+
+    def storage(self, config: Config) -> storage.Client:
+        """Gets the Cloud Storage client of the config's OAuth credentials.
+        Args:
+            config: The Config object containing configuration parameters.
+        Returns:
+            The client.
+        """
+        return self._get(
+            ('storage', config.client_id, config.refresh_token),
+            lambda: storage.Client(credentials=config.credentials),
+        )
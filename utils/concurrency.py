@@ -0,0 +1,287 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for adapting the concurrency of model calls."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import collections
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import CancelledError
+from typing import Any, Callable, List, Optional, Tuple
+
+from utils import logging as log
+
+_OVERLOAD_CODES = (429, 503, 504)
+_OVERLOAD_STATUSES = ('RESOURCE_EXHAUSTED', 'DEADLINE_EXCEEDED', 'UNAVAILABLE')
+_HEALTHY_SUCCESS_RATE = 0.95
+# Without a latency target, p95 may grow this much over the best observed
+# p95 before concurrency stops increasing.
+_LATENCY_TOLERANCE = 1.5
+_MIN_WINDOW = 5
+_RETRY_BACKOFF_SECONDS = 2.0
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Checks whether an error signals quota exhaustion or overload.
+    Args:
+        error: The error raised by the model call.
+    Returns:
+        True for 429/RESOURCE_EXHAUSTED, unavailability and timeouts.
+    """
+    if isinstance(error, TimeoutError):
+        return True
+    if getattr(error, 'code', None) in _OVERLOAD_CODES:
+        return True
+    message = f'{getattr(error, "status", "")} {error}'
+    return any(status in message for status in _OVERLOAD_STATUSES) or (
+        'timed out' in message.lower()
+    )
+
+
+class CallHandle:
+    """Lets another thread see when a call starts and abandon it.
+    Attributes:
+        started: Set once the call holds a slot and runs, or has ended.
+        started_at: The time.monotonic() value when its latest attempt
+            started, None before.
+    """
+
+    def __init__(self) -> None:
+        """Initiate the handle of a call that has not started."""
+        self.started = threading.Event()
+        self.started_at: Optional[float] = None
+        self._abandoned = False
+        self._slot_holder: Optional['AdaptiveConcurrencyController'] = None
+        self._lock = threading.Lock()
+
+    @property
+    def abandoned(self) -> bool:
+        """Whether the result of the call is no longer needed."""
+        return self._abandoned
+
+    def begin(
+        self, controller: Optional['AdaptiveConcurrencyController']
+    ) -> bool:
+        """Marks an attempt as started in a slot of the controller.
+        Args:
+            controller: The controller the slot is held from, None if the
+                call runs without one.
+        Returns:
+            False if the call was abandoned and must not start.
+        """
+        with self._lock:
+            if self._abandoned:
+                return False
+            self._slot_holder = controller
+            self.started_at = time.monotonic()
+            self.started.set()
+            return True
+
+    def end(self) -> bool:
+        """Marks an attempt as ended.
+        Returns:
+            True if the attempt still holds its slot and must release it.
+        """
+        with self._lock:
+            holding = self._slot_holder is not None
+            self._slot_holder = None
+            return holding
+
+    def abandon(self) -> None:
+        """Abandons the call, freeing its slot for other calls.
+        A running attempt cannot be interrupted and ends at its deadline,
+        but it no longer counts against the limit and is not retried.
+        """
+        with self._lock:
+            self._abandoned = True
+            controller, self._slot_holder = self._slot_holder, None
+        if controller:
+            controller.release()
+
+
+class AdaptiveConcurrencyController:
+    """AIMD controller for the number of concurrent model calls.
+    The limit grows additively while the success rate and p95 latency of
+    recent calls stay healthy, and is cut multiplicatively on overload.
+    Attributes:
+        min_limit: The lowest the limit can go.
+        max_limit: The highest the limit can go.
+        latency_target: p95 latency in seconds considered healthy, 0 to
+            compare against the best p95 observed instead.
+        history: The (time, limit) pairs of every limit change.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        max_limit: int,
+        min_limit: int = 1,
+        latency_target: float = 0.0,
+        decrease_factor: float = 0.5,
+        window: int = 50,
+    ) -> None:
+        """Initiate the controller.
+        Args:
+            initial_limit: The starting concurrency limit.
+            max_limit: The highest the limit can go.
+            min_limit: The lowest the limit can go.
+            latency_target: p95 latency in seconds considered healthy.
+            decrease_factor: Factor applied to the limit on overload.
+            window: Number of recent calls the health is computed over.
+        """
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self._limit = max(min_limit, min(initial_limit, max_limit))
+        self._in_flight = 0
+        self._condition = threading.Condition()
+        self._latencies = collections.deque(maxlen=window)
+        self._outcomes = collections.deque(maxlen=window)
+        self._since_change = 0
+        self._best_p95 = None
+        self._last_decrease = 0.0
+        self.history: List[Tuple[float, int]] = [(time.time(), self._limit)]
+
+    @property
+    def limit(self) -> int:
+        """The current concurrency limit."""
+        return self._limit
+
+    def acquire(self) -> None:
+        """Blocks until a call can start under the current limit."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+
+    def release(self) -> None:
+        """Frees the slot of a finished call."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def call(
+        self,
+        function: Callable[..., Any],
+        *args: Any,
+        max_retries: int = 3,
+        handle: Optional[CallHandle] = None,
+    ) -> Any:
+        """Runs a model call under the limit, retrying it on overload.
+        Args:
+            function: The model call.
+            *args: The arguments of the model call.
+            max_retries: How many times an overloaded call is retried.
+            handle: Optional handle to follow or abandon the call with. An
+                abandoned call gives its slot back, is not retried and its
+                outcome does not count towards the limit.
+        Returns:
+            The result of the model call.
+        Raises:
+            CancelledError: If the call was abandoned before an attempt.
+        """
+        for attempt in range(max_retries + 1):
+            if handle and handle.abandoned:
+                raise CancelledError('The call was abandoned')
+            self.acquire()
+            if handle and not handle.begin(self):
+                self.release()
+                raise CancelledError('The call was abandoned')
+            started = time.monotonic()
+            try:
+                result = function(*args)
+            except Exception as e:
+                if (
+                    (handle and handle.abandoned)
+                    or not self.record_failure(started, e)
+                    or attempt == max_retries
+                ):
+                    raise
+            else:
+                if not (handle and handle.abandoned):
+                    self.record_success(started)
+                return result
+            finally:
+                if not handle or handle.end():
+                    self.release()
+            time.sleep(_RETRY_BACKOFF_SECONDS * 2**attempt * random.random())
+        return None
+
+    def record_success(self, started: float) -> None:
+        """Records a successful call and increases the limit if healthy.
+        Args:
+            started: The time.monotonic() value when the call started.
+        """
+        with self._condition:
+            self._latencies.append(time.monotonic() - started)
+            self._outcomes.append(True)
+            self._since_change += 1
+            if self._since_change >= max(self._limit, _MIN_WINDOW):
+                self._maybe_increase()
+
+    def record_failure(self, started: float, error: BaseException) -> bool:
+        """Records a failed call and decreases the limit on overload.
+        Args:
+            started: The time.monotonic() value when the call started.
+            error: The error raised by the call.
+        Returns:
+            True if the error signals overload and the call can be retried.
+        """
+        overload = is_overload_error(error)
+        with self._condition:
+            self._outcomes.append(False)
+            self._since_change += 1
+            # Calls started before the last decrease saw the old limit.
+            if overload and started >= self._last_decrease:
+                self._set_limit(
+                    int(self._limit * self.decrease_factor),
+                    f'overload: {type(error).__name__}',
+                )
+                self._last_decrease = time.monotonic()
+        return overload
+
+    def _maybe_increase(self) -> None:
+        """Increases the limit by one if recent calls were healthy."""
+        success_rate = sum(self._outcomes) / len(self._outcomes)
+        if len(self._latencies) < 2:
+            return
+        p95 = statistics.quantiles(self._latencies, n=20)[-1]
+        if self._best_p95 is None or p95 < self._best_p95:
+            self._best_p95 = p95
+        latency_target = self.latency_target or (
+            self._best_p95 * _LATENCY_TOLERANCE
+        )
+        if success_rate >= _HEALTHY_SUCCESS_RATE and p95 <= latency_target:
+            self._set_limit(
+                self._limit + 1,
+                f'healthy: success {success_rate:.0%}, p95 {p95:.1f}s',
+            )
+        else:
+            self._since_change = 0
+
+    def _set_limit(self, limit: int, reason: str) -> None:
+        """Applies a new limit within bounds and logs the change."""
+        limit = max(self.min_limit, min(limit, self.max_limit))
+        self._since_change = 0
+        if limit == self._limit:
+            return
+        log.logger.info(
+            f'Concurrency limit {self._limit} -> {limit} ({reason})'
+        )
+        self._limit = limit
+        self.history.append((time.time(), limit))
+        self._condition.notify_all()
@@ -15,14 +15,14 @@
 """Module responsible for reading the app configurations."""
 # pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, protected-access
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-import smart_open
-import yaml
-
-from utils import auth
+from utils import auth, lazy
 from utils.logging import logger
 
+smart_open = lazy.LazyModule('smart_open')
+yaml = lazy.LazyModule('yaml')
+
 _CONFIG_FILE_PATH = './config.yaml'
 
 
@@ -37,16 +37,89 @@ class Config:
         project_id: GCP Project ID
         location: GCP location
         model: AI Model
+        audio_prepass: Whether audio and text rules are reviewed against a
+            transcript of the audio track instead of the video
+        transcription_model: Model transcribing the audio, model if empty
+        text_model: Model reviewing the transcript, model if empty
+        run_mode: 'batch' analyzes the videos once, 'watch' keeps running
+            and analyzes new uploads as they arrive, 'sample' estimates the
+            violation rate of each rule from a stratified sample
+        watch_source: Where a watch reads uploads from - 'pubsub' bucket
+            notifications, 'poll' of the bucket listing or a 'directory'
+        pubsub_subscription: Subscription path of the bucket notifications
+        watch_dir: Local directory videos are dropped into when watching
+        watch_poll_seconds: Seconds between two polls or notification pulls
+        sample_strata: Comma separated listing attributes the sample is
+            stratified on - prefix, month and/or size, none for no strata
+        sample_size: Videos in the first sample
+        sample_target_half_width: Widest acceptable half width of the
+            violation rate intervals, 0 to stop after the first sample
+        sample_max_size: Most videos sampled
+        sample_confidence: Confidence level of the intervals
+        sample_seed: Seed of the sample, for reproducible samples
+        tenants_path: YAML manifest of tenants analyzed in one process,
+            each with its own config values. Empty for a single run
+        tenant_name: Name of the tenant the config belongs to
+        tenant_weight: Share of the tenant relative to the other tenants
         video_source: Where to read videos from - drive/GCS
         bucket_name: Bucket name if videos from GCS
         drive_folder_url: Drive link if videos from drive
+        drive_state_path: File the Drive changes page token is stored in
+        log_format: 'text' or 'json' structured logs
+        trace_path: File the run trace is written to, empty to disable
+        trace_format: 'chrome' trace_event JSON or 'otlp' JSON
+        gcs_prefixes: Bucket prefixes to list in parallel, discovered if empty
+        gcs_include_glob: Server side glob the object names must match
+        gcs_exclude_globs: Globs of object names to skip
+        video_extensions: File extensions treated as videos
+        video_content_types: Content types treated as videos, any if empty
+        updated_since: Only list objects updated at or after this ISO date
+        listing_workers: Number of shards listed concurrently
+        cache_dir: Local directory downloaded videos are cached in
+        cache_max_bytes: Byte budget of the video cache, 0 for unlimited
+        max_concurrency: Highest number of videos analyzed concurrently
+        initial_concurrency: Concurrency the adaptive controller starts at
+        latency_target_seconds: Healthy p95 model latency, 0 for adaptive
+        max_retries: Retries of a model call failing on quota or timeout
+        request_timeout_seconds: Deadline of each model call, 0 for none
+        hedge_percentile: Latency percentile of recent calls after which a
+            duplicate call is issued, 0 to disable hedging
+        hedge_max_ratio: Most duplicate calls per model call made
+        segment_seconds: Length of the segments long videos are split into,
+            0 to analyze videos in one call
+        segment_overlap_seconds: Overlap between consecutive segments
+        memory_budget_bytes: Budget of video bytes held in memory at once
+        inline_max_bytes: Videos larger than this are uploaded, not inlined
+        spreadsheet_id: Spreadsheet each run adds its worksheets to,
+            a new one is created if empty
+        sheets_requests_per_minute: Sheets API write quota to throttle to
+        sheets_max_retries: Retries of a Sheets call failing on quota
+        dry_run: Only estimate the tokens, cost and time of the run
+        schedule_lookahead: Videos considered at once for shortest job first
+            ordering, 0 to keep the listing order
+        schedule_max_skips: Times a video can be passed over before it is
+            analyzed regardless of its size
+        tokens_per_minute: Model token quota videos are admitted under,
+            0 for no limit
+        input_token_price_per_million: Input token price for estimates
+        output_token_price_per_million: Output token price for estimates
+        rules_path: The CSV file of policy rules
+        max_followup_requests: Requests for the rules missing in a truncated
+            or invalid model response, 0 to keep only what was salvaged
+        verdict_store_path: SQLite file per rule verdicts are kept in, so
+            only new or edited rules are re-evaluated. Empty to disable
     """
 
-    def __init__(self) -> None:
-        """Initializes the instance of the config file."""
+    def __init__(self, overrides: Optional[Dict[str, Any]] = None) -> None:
+        """Initializes the instance of the config file.
+        Args:
+            overrides: Optional values replacing those of the config file,
+                e.g. the settings of one tenant.
+        """
         config = self.load_config_from_file()
         if config is None:
             config = {}
+        config = {**config, **(overrides or {})}
 
         self.client_id = config.get('client_id', '')
         self.client_secret = config.get('client_secret')
@@ -56,6 +129,96 @@ class Config:
         self.bucket_name = config.get('bucket_name', '')
         self.location = config.get('location', '')
         self.model = config.get('model', '')
+        self.audio_prepass = bool(config.get('audio_prepass'))
+        self.transcription_model = (
+            config.get('transcription_model') or self.model
+        )
+        self.text_model = config.get('text_model') or self.model
+        self.log_format = config.get('log_format') or 'text'
+        self.trace_path = config.get('trace_path') or ''
+        self.trace_format = config.get('trace_format') or 'chrome'
+        self.run_mode = (config.get('run_mode') or 'BATCH').upper()
+        self.watch_source = (config.get('watch_source') or 'POLL').upper()
+        self.pubsub_subscription = config.get('pubsub_subscription') or ''
+        self.watch_dir = config.get('watch_dir') or './incoming'
+        self.watch_poll_seconds = float(config.get('watch_poll_seconds') or 10)
+        self.sample_strata = config.get('sample_strata') or 'prefix'
+        self.sample_size = int(config.get('sample_size') or 100)
+        sample_target_half_width = config.get('sample_target_half_width')
+        self.sample_target_half_width = (
+            0.05
+            if sample_target_half_width is None
+            else float(sample_target_half_width)
+        )
+        self.sample_max_size = int(config.get('sample_max_size') or 1000)
+        self.sample_confidence = float(config.get('sample_confidence') or 0.95)
+        self.sample_seed = int(config.get('sample_seed') or 0)
+        self.tenants_path = config.get('tenants_path') or ''
+        self.tenant_name = config.get('tenant_name') or 'default'
+        self.tenant_weight = float(config.get('tenant_weight') or 1)
+        self.video_source = (config.get('video_source') or 'GCS').upper()
+        self.drive_folder_url = config.get('drive_folder_url') or ''
+        self.drive_state_path = (
+            config.get('drive_state_path') or './drive_state.json'
+        )
+        self.gcs_prefixes = config.get('gcs_prefixes') or []
+        self.gcs_include_glob = config.get('gcs_include_glob') or ''
+        self.gcs_exclude_globs = config.get('gcs_exclude_globs') or []
+        self.video_extensions = config.get('video_extensions') or ['.mp4']
+        self.video_content_types = config.get('video_content_types') or []
+        self.updated_since = config.get('updated_since') or ''
+        self.listing_workers = config.get('listing_workers') or 8
+        self.cache_dir = config.get('cache_dir') or './temp_videos'
+        self.cache_max_bytes = int(config.get('cache_max_bytes') or 0)
+        self.max_concurrency = int(config.get('max_concurrency') or 16)
+        self.initial_concurrency = int(config.get('initial_concurrency') or 2)
+        self.latency_target_seconds = float(
+            config.get('latency_target_seconds') or 0
+        )
+        max_retries = config.get('max_retries')
+        self.max_retries = 3 if max_retries is None else int(max_retries)
+        request_timeout_seconds = config.get('request_timeout_seconds')
+        self.request_timeout_seconds = (
+            600.0
+            if request_timeout_seconds is None
+            else float(request_timeout_seconds)
+        )
+        self.hedge_percentile = float(config.get('hedge_percentile') or 0)
+        self.hedge_max_ratio = float(config.get('hedge_max_ratio') or 0.1)
+        self.segment_seconds = float(config.get('segment_seconds') or 0)
+        segment_overlap_seconds = config.get('segment_overlap_seconds')
+        self.segment_overlap_seconds = (
+            5.0
+            if segment_overlap_seconds is None
+            else float(segment_overlap_seconds)
+        )
+        self.memory_budget_bytes = int(
+            config.get('memory_budget_bytes') or 1024 * 1024 * 1024
+        )
+        self.inline_max_bytes = int(
+            config.get('inline_max_bytes') or 20 * 1024 * 1024
+        )
+        self.spreadsheet_id = config.get('spreadsheet_id') or ''
+        self.sheets_requests_per_minute = int(
+            config.get('sheets_requests_per_minute') or 60
+        )
+        self.sheets_max_retries = int(config.get('sheets_max_retries') or 5)
+        self.dry_run = bool(config.get('dry_run'))
+        self.schedule_lookahead = int(config.get('schedule_lookahead') or 0)
+        self.schedule_max_skips = int(config.get('schedule_max_skips') or 8)
+        self.tokens_per_minute = int(config.get('tokens_per_minute') or 0)
+        self.input_token_price_per_million = float(
+            config.get('input_token_price_per_million') or 0
+        )
+        self.output_token_price_per_million = float(
+            config.get('output_token_price_per_million') or 0
+        )
+        self.rules_path = config.get('rules_path') or 'rules.csv'
+        max_followup_requests = config.get('max_followup_requests')
+        self.max_followup_requests = (
+            1 if max_followup_requests is None else int(max_followup_requests)
+        )
+        self.verdict_store_path = config.get('verdict_store_path') or ''
 
     def load_config_from_file(self) -> Dict[str, Any]:
         """Loads configuration file from GCS.
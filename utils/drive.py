@@ -0,0 +1,429 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for reading videos from Google Drive."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import collections
+import itertools
+import json
+import os
+import posixpath
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils import lazy
+from utils import logging as log
+from utils.cache import VideoCache
+
+transport_requests = lazy.LazyModule('google.auth.transport.requests')
+
+_DRIVE_API = 'https://www.googleapis.com/drive/v3'
+_FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+_FILE_FIELDS = 'id,name,mimeType,md5Checksum,modifiedTime,size,parents,trashed'
+_DOWNLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+_FOLDER_ID_PATTERN = re.compile(r'(?:folders/|[?&]id=)([\w-]+)')
+
+
+def parse_folder_id(folder: str) -> str:
+    """Extracts the folder id from a Drive folder URL.
+    Args:
+        folder: A Drive folder URL or a bare folder id.
+    Returns:
+        The folder id.
+    """
+    match = _FOLDER_ID_PATTERN.search(folder)
+    return match.group(1) if match else folder.strip()
+
+
+class DriveClient:
+    """Class for handeling the Drive v3 REST API."""
+
+    def __init__(self, credentials: Any) -> None:
+        """Initiate the Drive client.
+        Args:
+            credentials: The OAuth credentials with the drive scope.
+        """
+        self.session = transport_requests.AuthorizedSession(credentials)
+
+    def _get(self, path: str, **params: Any) -> Dict[str, Any]:
+        """Sends a GET request to the Drive API and returns its JSON body."""
+        response = self.session.get(
+            f'{_DRIVE_API}/{path}',
+            params={'supportsAllDrives': 'true', **params},
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def list_children(self, folder_id: str) -> List[Dict[str, Any]]:
+        """Lists the files and folders directly inside a folder.
+        Args:
+            folder_id: The id of the folder.
+        Returns:
+            The metadata of the children.
+        """
+        children = []
+        page_token = None
+        while True:
+            page = self._get(
+                'files',
+                q=f"'{folder_id}' in parents and trashed = false",
+                fields=f'nextPageToken,files({_FILE_FIELDS})',
+                includeItemsFromAllDrives='true',
+                pageSize=1000,
+                pageToken=page_token,
+            )
+            children.extend(page.get('files', []))
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                return children
+
+    def download(self, file_id: str, path: str) -> None:
+        """Streams the content of a file to a local path.
+        Args:
+            file_id: The id of the file.
+            path: The local path to write to.
+        """
+        response = self.session.get(
+            f'{_DRIVE_API}/files/{file_id}',
+            params={'alt': 'media', 'supportsAllDrives': 'true'},
+            stream=True,
+        )
+        response.raise_for_status()
+        with open(path, 'wb') as file:
+            for chunk in response.iter_content(_DOWNLOAD_CHUNK_BYTES):
+                file.write(chunk)
+
+    def media_url(self, file_id: str) -> str:
+        """Builds the URL the content of a file is read from.
+        Args:
+            file_id: The id of the file.
+        Returns:
+            The URL, read with the OAuth credentials as a bearer token.
+        """
+        return f'{_DRIVE_API}/files/{file_id}?alt=media&supportsAllDrives=true'
+
+    def get_start_page_token(self) -> str:
+        """Gets the token of the current position of the changes feed.
+        Returns:
+            The start page token.
+        """
+        return self._get('changes/startPageToken')['startPageToken']
+
+    def list_changes(self, page_token: str) -> Tuple[List[Dict[str, Any]], str]:
+        """Lists the changes since a page token.
+        Args:
+            page_token: The token stored by the previous run.
+        Returns:
+            The changes and the token to store for the next run.
+        """
+        changes = []
+        while True:
+            page = self._get(
+                'changes',
+                pageToken=page_token,
+                fields=(
+                    'nextPageToken,newStartPageToken,'
+                    f'changes(fileId,removed,file({_FILE_FIELDS}))'
+                ),
+                includeItemsFromAllDrives='true',
+                pageSize=1000,
+            )
+            changes.extend(page.get('changes', []))
+            if 'newStartPageToken' in page:
+                return changes, page['newStartPageToken']
+            page_token = page['nextPageToken']
+
+
+class DriveVideoSource:
+    """Incremental source of videos from a Drive folder tree.
+    The first run lists the folder tree in parallel. Later runs read the
+    Drive changes feed from the stored page token and only return the
+    videos that are new or modified since the previous run.
+    Attributes:
+        client: The Drive client.
+        folder_id: The id of the root folder.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        folder_id: str,
+        cache: VideoCache,
+        state_path: str,
+        video_extensions: List[str],
+        max_workers: int = 8,
+    ) -> None:
+        """Initiate the source.
+        Args:
+            client: The Drive client.
+            folder_id: The id of the root folder.
+            cache: The local video cache downloads are written to.
+            state_path: The JSON file the page token and index are kept in.
+            video_extensions: File extensions treated as videos.
+            max_workers: Number of concurrent list and download requests.
+        """
+        self.client = client
+        self.folder_id = folder_id
+        self.cache = cache
+        self.state_path = state_path
+        self.video_extensions = tuple(ext.lower() for ext in video_extensions)
+        self.max_workers = max_workers
+        self._pending_state = None
+        self._synced: List[str] = []
+        self._downloaded: Dict[str, str] = {}
+
+    def _load_state(self) -> Optional[Dict[str, Any]]:
+        """Loads the state of the previous run for the same folder."""
+        if not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path, 'r') as file:
+            state = json.load(file)
+        if state.get('folder_id') != self.folder_id:
+            return None
+        return state
+
+    def _is_video(self, item: Dict[str, Any]) -> bool:
+        """Checks whether a Drive item is a video to analyze."""
+        if item.get('mimeType') == _FOLDER_MIME_TYPE:
+            return False
+        return item['name'].lower().endswith(self.video_extensions)
+
+    def _walk(self) -> Tuple[Dict[str, str], Dict[str, Dict[str, Any]]]:
+        """Lists the folder tree, one request per folder in parallel.
+        Returns:
+            The path of every folder and the metadata of every video, by id.
+        """
+        folders = {self.folder_id: ''}
+        videos = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = {
+                executor.submit(self.client.list_children, self.folder_id): ''
+            }
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    parent_path = pending.pop(future)
+                    for item in future.result():
+                        path = posixpath.join(parent_path, item['name'])
+                        if item['mimeType'] == _FOLDER_MIME_TYPE:
+                            folders[item['id']] = path
+                            future_children = executor.submit(
+                                self.client.list_children, item['id']
+                            )
+                            pending[future_children] = path
+                        elif self._is_video(item):
+                            videos[item['id']] = _video_entry(item, path)
+        return folders, videos
+
+    def _apply_changes(
+        self,
+        changes: List[Dict[str, Any]],
+        folders: Dict[str, str],
+        videos: Dict[str, Dict[str, Any]],
+    ) -> None:
+        """Updates the folder and video index with changes feed entries."""
+        live = {}
+        for change in changes:
+            item = change.get('file')
+            if change.get('removed') or not item or item.get('trashed'):
+                self._move_folder(change['fileId'], None, folders, videos)
+                videos.pop(change['fileId'], None)
+                live.pop(change['fileId'], None)
+            elif item['id'] != self.folder_id:
+                live[item['id']] = item
+
+        # New folders can arrive in any order relative to their parents.
+        added = True
+        while added:
+            added = False
+            for item in live.values():
+                if item['mimeType'] != _FOLDER_MIME_TYPE:
+                    continue
+                path = self._path_in_tree(item, folders)
+                if folders.get(item['id']) != path:
+                    self._move_folder(item['id'], path, folders, videos)
+                    added = True
+
+        for item in live.values():
+            if not self._is_video(item):
+                continue
+            path = self._path_in_tree(item, folders)
+            if path is None:
+                videos.pop(item['id'], None)
+            else:
+                videos[item['id']] = _video_entry(item, path)
+
+    def _move_folder(
+        self,
+        folder_id: str,
+        path: Optional[str],
+        folders: Dict[str, str],
+        videos: Dict[str, Dict[str, Any]],
+    ) -> None:
+        """Moves a folder and its indexed descendants to a new path.
+        Args:
+            folder_id: The id of the renamed, moved or removed folder.
+            path: The new path of the folder, None if it left the tree.
+            folders: The path of every folder, by id.
+            videos: The index entry of every video, by id.
+        """
+        old_path = folders.pop(folder_id, None)
+        if path is not None:
+            folders[folder_id] = path
+        if old_path is None:
+            return
+        prefix = old_path + '/'
+        for descendant, descendant_path in list(folders.items()):
+            if descendant_path.startswith(prefix):
+                if path is None:
+                    del folders[descendant]
+                else:
+                    folders[descendant] = (
+                        path + descendant_path[len(old_path) :]
+                    )
+        for video_id, video in list(videos.items()):
+            if video['path'].startswith(prefix):
+                if path is None:
+                    del videos[video_id]
+                else:
+                    videos[video_id] = {
+                        **video,
+                        'path': path + video['path'][len(old_path) :],
+                    }
+
+    def _path_in_tree(
+        self, item: Dict[str, Any], folders: Dict[str, str]
+    ) -> Optional[str]:
+        """Returns the path of an item if its parent is in the tree."""
+        for parent in item.get('parents', []):
+            if parent in folders:
+                return posixpath.join(folders[parent], item['name'])
+        return None
+
+    def sync(self) -> List[Dict[str, Any]]:
+        """Finds the videos that are new or modified since the last commit.
+        Returns:
+            The metadata of the videos to download and analyze.
+        """
+        with log.tracer.span('list', source='drive'):
+            return self._sync()
+
+    def _sync(self) -> List[Dict[str, Any]]:
+        """Finds the changed videos, see sync."""
+        state = self._load_state()
+        if state:
+            folders, videos = state['folders'], dict(state['videos'])
+            changes, page_token = self.client.list_changes(state['page_token'])
+            self._apply_changes(changes, folders, videos)
+            previous = state['videos']
+            retry = set(state.get('retry', []))
+        else:
+            # Taken before listing so changes made during it are not missed.
+            page_token = self.client.get_start_page_token()
+            folders, videos = self._walk()
+            previous, retry = {}, set()
+
+        self._pending_state = {
+            'folder_id': self.folder_id,
+            'page_token': page_token,
+            'folders': folders,
+            'videos': videos,
+        }
+        changed = [
+            video
+            for file_id, video in videos.items()
+            if file_id in retry
+            or previous.get(file_id, {}).get('version') != video['version']
+        ]
+        self._synced = [video['id'] for video in changed]
+        log.logger.info(
+            f'Drive folder has {len(videos)} videos, '
+            f'{len(changed)} new or modified'
+        )
+        return sorted(changed, key=lambda video: video['path'])
+
+    def commit(self, analyzed: Optional[Iterable[str]] = None) -> None:
+        """Stores the state of the last sync once its videos are processed.
+        Args:
+            analyzed: The local paths of the videos whose analysis produced
+                results. The other synced videos are returned again by the
+                next sync. Every synced video counts as analyzed if not
+                given.
+        """
+        if self._pending_state is None:
+            return
+        if analyzed is not None:
+            done = {
+                self._downloaded[path]
+                for path in analyzed
+                if path in self._downloaded
+            }
+            self._pending_state['retry'] = [
+                file_id for file_id in self._synced if file_id not in done
+            ]
+        temp_path = f'{self.state_path}.tmp'
+        with open(temp_path, 'w') as file:
+            json.dump(self._pending_state, file)
+        os.replace(temp_path, self.state_path)
+        self._pending_state = None
+
+    def iter_downloads(self, videos: List[Dict[str, Any]]) -> Iterator[str]:
+        """Downloads videos concurrently, yielding them in order.
+        At most max_workers downloads run ahead of the consumer, and each
+        file stays pinned in the cache until the next one is requested.
+        Args:
+            videos: The metadata returned by sync.
+        Yields:
+            The local path of each video.
+        """
+        remaining = iter(videos)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            window = collections.deque(
+                executor.submit(self._download, video)
+                for video in itertools.islice(remaining, self.max_workers)
+            )
+            while window:
+                path = window.popleft().result()
+                for video in itertools.islice(remaining, 1):
+                    window.append(executor.submit(self._download, video))
+                try:
+                    yield path
+                finally:
+                    self.cache.release(path)
+
+    def _download(self, video: Dict[str, Any]) -> str:
+        """Downloads one video into the cache, replacing stale copies."""
+        name = f'drive/{video["id"]}/{video["name"]}'
+        with log.tracer.span('download', video=self.cache.path_for(name)):
+            path = self.cache.fetch(
+                name,
+                lambda temp_path: self.client.download(video['id'], temp_path),
+                pin=True,
+                refresh=True,
+            )
+        self._downloaded[path] = video['id']
+        return path
+
+
+def _video_entry(item: Dict[str, Any], path: str) -> Dict[str, Any]:
+    """Builds the index entry of a video from its Drive metadata."""
+    return {
+        'id': item['id'],
+        'name': item['name'],
+        'path': path,
+        'version': item.get('md5Checksum') or item.get('modifiedTime'),
+        'size': int(item.get('size') or 0),
+    }
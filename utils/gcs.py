@@ -0,0 +1,162 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for listing video files in Google Cloud Storage."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, List, Optional
+
+from utils import logging as log
+from utils.config import Config
+
+_ITEM_FIELDS = 'name,size,generation,md5Hash,updated'
+
+
+def _list_fields(with_content_type: bool, with_prefixes: bool) -> str:
+    """Builds the field projection for a list request.
+    Args:
+        with_content_type: Whether to also fetch the object content type.
+        with_prefixes: Whether to fetch the delimiter prefixes.
+    Returns:
+        The fields parameter for the GCS JSON API.
+    """
+    item_fields = _ITEM_FIELDS
+    if with_content_type:
+        item_fields += ',contentType'
+    fields = f'items({item_fields}),nextPageToken'
+    if with_prefixes:
+        fields += ',prefixes'
+    return fields
+
+
+def _parse_updated_since(value: Any) -> Optional[datetime]:
+    """Parses the updated_since config value into an aware datetime.
+    Args:
+        value: An ISO 8601 string, a datetime or an empty value.
+    Returns:
+        The parsed datetime in UTC, or None if no filter is configured.
+    """
+    if not value:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def is_video_blob(
+    blob: Any, config: Config, updated_since: Optional[datetime] = None
+) -> bool:
+    """Checks a listed blob against the client side filters.
+    Args:
+        blob: The listed blob, with projected metadata only.
+        config: The Config object containing configuration parameters.
+        updated_since: Blobs updated before this time are skipped.
+    Returns:
+        True if the blob should be treated as a video to analyze.
+    """
+    name = blob.name
+    if name.endswith('/'):
+        return False
+    extensions = tuple(ext.lower() for ext in config.video_extensions)
+    if extensions and not name.lower().endswith(extensions):
+        return False
+    if config.video_content_types and (
+        blob.content_type not in config.video_content_types
+    ):
+        return False
+    if any(fnmatch.fnmatchcase(name, p) for p in config.gcs_exclude_globs):
+        return False
+    return not (updated_since and blob.updated and blob.updated < updated_since)
+
+
+def _discover_shards(client: Any, config: Config) -> List[str]:
+    """Finds the top level prefixes of the bucket to shard the listing on.
+    Args:
+        client: The storage client.
+        config: The Config object containing configuration parameters.
+    Returns:
+        The prefixes to list in parallel. Objects at the bucket root are
+        covered by an extra shard that does not descend into any prefix.
+    """
+    iterator = client.list_blobs(
+        config.bucket_name,
+        delimiter='/',
+        fields=_list_fields(with_content_type=False, with_prefixes=True),
+    )
+    for _ in iterator:
+        pass
+    return sorted(iterator.prefixes)
+
+
+def _list_shard(
+    client: Any, config: Config, prefix: str, delimiter: Optional[str]
+) -> List[Any]:
+    """Lists one prefix shard of the bucket.
+    Args:
+        client: The storage client.
+        config: The Config object containing configuration parameters.
+        prefix: The prefix to restrict the listing to.
+        delimiter: Delimiter used to list the bucket root only, or None.
+    Returns:
+        The blobs of the shard that pass the configured filters.
+    """
+    blobs = client.list_blobs(
+        config.bucket_name,
+        prefix=prefix or None,
+        delimiter=delimiter,
+        match_glob=config.gcs_include_glob or None,
+        fields=_list_fields(
+            with_content_type=bool(config.video_content_types),
+            with_prefixes=False,
+        ),
+    )
+    updated_since = _parse_updated_since(config.updated_since)
+    return [
+        blob for blob in blobs if is_video_blob(blob, config, updated_since)
+    ]
+
+
+def list_video_blobs(client: Any, config: Config) -> List[Any]:
+    """Lists the video blobs of the configured bucket in parallel shards.
+    When gcs_prefixes is configured those prefixes are the shards, otherwise
+    the top level prefixes of the bucket are discovered first.
+    Args:
+        client: The storage client.
+        config: The Config object containing configuration parameters.
+    Returns:
+        The matching blobs, sorted by name.
+    """
+    if config.gcs_prefixes:
+        shards = [(prefix, None) for prefix in config.gcs_prefixes]
+    else:
+        shards = [('', '/')] + [
+            (prefix, None) for prefix in _discover_shards(client, config)
+        ]
+
+    with ThreadPoolExecutor(max_workers=config.listing_workers) as executor:
+        results = executor.map(
+            lambda shard: _list_shard(client, config, *shard), shards
+        )
+        blobs = {blob.name: blob for shard in results for blob in shard}
+
+    log.logger.info(
+        f'Listed {len(blobs)} videos in gs://{config.bucket_name} '
+        f'across {len(shards)} shards'
+    )
+    return [blobs[name] for name in sorted(blobs)]
@@ -0,0 +1,248 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for hedging slow model calls with a duplicate."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import collections
+import contextvars
+import statistics
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    CancelledError,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Any, Callable, List, Optional
+
+from utils import logging as log
+from utils.concurrency import AdaptiveConcurrencyController, CallHandle
+
+
+class HedgedCaller:
+    """Issues a duplicate of calls still running after a latency percentile.
+    A call's clock starts once it holds a concurrency slot and runs, so
+    time spent queueing for a slot or a thread neither triggers a hedge nor
+    skews the learned latencies. Whichever copy finishes first wins and the
+    other one is cancelled if it has not started yet, or abandoned
+    otherwise: it gives its slot back and is left to its deadline.
+    Attributes:
+        percentile: The latency percentile after which a call is hedged,
+            0 to never hedge.
+        max_hedge_ratio: The most hedges per call made so far.
+        calls: Number of calls made.
+        hedges: Number of duplicate calls issued.
+        hedges_won: Number of duplicates that finished first.
+    """
+
+    def __init__(
+        self,
+        percentile: float,
+        max_hedge_ratio: float,
+        max_workers: int,
+        min_samples: int = 20,
+        window: int = 200,
+        controller: Optional[AdaptiveConcurrencyController] = None,
+        max_retries: int = 3,
+    ) -> None:
+        """Initiate the hedged caller.
+        Args:
+            percentile: The latency percentile after which a call is hedged,
+                0 to never hedge.
+            max_hedge_ratio: The most hedges per call made so far.
+            max_workers: Number of threads running calls and their hedges.
+            min_samples: Calls to observe before the first hedge.
+            window: Number of recent call latencies the percentile uses.
+            controller: Optional concurrency limit every copy runs under.
+            max_retries: How many times the controller retries an
+                overloaded copy.
+        """
+        self.percentile = percentile
+        self.max_hedge_ratio = max_hedge_ratio
+        self.min_samples = min_samples
+        self.controller = controller
+        self.max_retries = max_retries
+        self.calls = 0
+        self.hedges = 0
+        self.hedges_won = 0
+        self._lock = threading.Lock()
+        self._latencies = collections.deque(maxlen=window)
+        self._executor = (
+            ThreadPoolExecutor(max_workers=max_workers) if percentile else None
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """Computes the latency after which a call is hedged.
+        Returns:
+            The percentile of recent latencies in seconds, None when hedging
+            is disabled or too few calls were observed.
+        """
+        with self._lock:
+            if not self.percentile or len(self._latencies) < self.min_samples:
+                return None
+            return statistics.quantiles(
+                self._latencies, n=100, method='inclusive'
+            )[min(99, max(1, round(self.percentile))) - 1]
+
+    def record(self, latency: float) -> None:
+        """Records the latency of a successful call.
+        Args:
+            latency: The call latency in seconds.
+        """
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _reserve_hedge(self) -> bool:
+        """Takes a hedge out of the budget, if any is left."""
+        with self._lock:
+            if self.hedges + 1 > self.max_hedge_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def _run(
+        self, handle: CallHandle, function: Callable[..., Any], *args: Any
+    ) -> Any:
+        """Runs one copy of a call, under the controller if there is one."""
+        if self.controller:
+            return self.controller.call(
+                function, *args, max_retries=self.max_retries, handle=handle
+            )
+        if not handle.begin(None):
+            raise CancelledError('The call was abandoned')
+        return function(*args)
+
+    def _submit(
+        self,
+        run: Callable[..., Any],
+        handle: CallHandle,
+        function: Callable[..., Any],
+        *args: Any,
+    ) -> Future:
+        """Runs a copy on the executor with the caller's trace context."""
+        future = self._executor.submit(
+            contextvars.copy_context().run, run, handle, function, *args
+        )
+        # Waiters on started are also woken by copies that end early.
+        future.add_done_callback(lambda _: handle.started.set())
+        return future
+
+    def call(
+        self,
+        function: Callable[..., Any],
+        *args: Any,
+        copies: Optional[List[Future]] = None,
+    ) -> Any:
+        """Runs a call, hedging it if it runs longer than usual.
+        Args:
+            function: The call.
+            *args: The arguments of the call.
+            copies: Optional list the futures of the call's copies are
+                added to, so resources they share can be cleaned up once
+                the abandoned ones ended too, see defer.
+        Returns:
+            The result of whichever copy of the call finished first.
+        """
+        with self._lock:
+            self.calls += 1
+        delay = self.hedge_delay()
+        primary = CallHandle()
+        if delay is None:
+            result = self._run(primary, function, *args)
+            self.record(time.monotonic() - primary.started_at)
+            return result
+
+        handles = [primary]
+        futures = [self._submit(self._run, primary, function, *args)]
+        primary.started.wait()
+        done, _ = wait(futures, timeout=delay)
+        if not done and self._reserve_hedge():
+            log.logger.info(f'Hedging a call running over {delay:.1f}s')
+            hedge = CallHandle()
+            handles.append(hedge)
+            futures.append(self._submit(self._hedge, hedge, function, *args))
+        if copies is not None:
+            copies.extend(futures)
+        return self._first_result(futures, handles)
+
+    def _hedge(
+        self, handle: CallHandle, function: Callable[..., Any], *args: Any
+    ) -> Any:
+        """Runs the duplicate of a call in its own span."""
+        with log.tracer.span('hedge'):
+            return self._run(handle, function, *args)
+
+    def _first_result(
+        self, futures: List[Future], handles: List[CallHandle]
+    ) -> Any:
+        """Returns the first successful result, raising if all copies fail."""
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                winner = futures.index(future)
+                for other, handle in zip(futures, handles):
+                    if other is not future:
+                        other.cancel()
+                        handle.abandon()
+                self.record(time.monotonic() - handles[winner].started_at)
+                if winner:
+                    with self._lock:
+                        self.hedges_won += 1
+                return future.result()
+        raise error
+
+    @staticmethod
+    def defer(copies: List[Future], cleanup: Callable[[], Any]) -> None:
+        """Runs a cleanup once every copy of some calls has ended.
+        Abandoned copies keep running until their deadline, so resources
+        they share with the winning copy, such as an uploaded video, are
+        only released after them.
+        Args:
+            copies: The futures of the copies, see call.
+            cleanup: The cleanup, run on the thread ending the last copy.
+        """
+        remaining = [len(copies)]
+        lock = threading.Lock()
+
+        def run_cleanup() -> None:
+            try:
+                cleanup()
+            except Exception:
+                log.logger.exception('Cleanup after hedged calls failed')
+
+        def on_done(_: Future) -> None:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            run_cleanup()
+
+        if not copies:
+            run_cleanup()
+            return
+        for future in copies:
+            future.add_done_callback(on_done)
+
+    def shutdown(self) -> None:
+        """Stops the executor without waiting for abandoned calls."""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,64 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for deferring the import of heavy dependencies."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import importlib
+import threading
+import types
+from typing import Any
+
+
+class LazyModule(types.ModuleType):
+    """Module stand-in that imports the real module on first use.
+    Attribute reads, writes and deletes are forwarded to the real module,
+    so code and tests can use it exactly like the imported module.
+    """
+
+    def __init__(self, name: str) -> None:
+        """Initiate the lazy module.
+        Args:
+            name: The fully qualified name of the module to import.
+        """
+        super().__init__(name)
+        object.__setattr__(self, '_lazy_module', None)
+        object.__setattr__(self, '_lazy_lock', threading.Lock())
+
+    def _load(self) -> types.ModuleType:
+        """Imports the real module once and returns it."""
+        module = object.__getattribute__(self, '_lazy_module')
+        if module is None:
+            with object.__getattribute__(self, '_lazy_lock'):
+                module = object.__getattribute__(self, '_lazy_module')
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    object.__setattr__(self, '_lazy_module', module)
+        return module
+
+    def __getattr__(self, name: str) -> Any:
+        """Reads an attribute of the real module."""
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Sets an attribute on the real module."""
+        setattr(self._load(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        """Deletes an attribute of the real module."""
+        delattr(self._load(), name)
+
+    def __dir__(self) -> list[str]:
+        """Lists the attributes of the real module."""
+        return dir(self._load())
@@ -12,16 +12,285 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""File responsible for setting up the logging configurations."""
+"""File responsible for setting up the logging and tracing configurations."""
 # pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
 
+import collections
+import contextlib
+import contextvars
+import json
 import logging
+import os
+import secrets
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+_SERVICE_NAME = 'video_ads_compass'
+# Finished spans kept for export, about a thousand videos' worth.
+_MAX_SPANS = 10_000
 
 logging.basicConfig(
     format='[%(asctime)s][%(name)s][%(levelname)s] %(message)s',
     level=logging.INFO,
     datefmt='%H:%M:%S',
 )
-logger = logging.getLogger('asset_bulk_assign')
-logging.getLogger('google.ads.googleads.client').setLevel(logging.WARNING)
-logging.getLogger('gaarf.query_executor').setLevel(logging.WARNING)
+logger = logging.getLogger(_SERVICE_NAME)
+
+
+class Span:
+    """A timed operation within the trace of a video or of the run.
+    Attributes:
+        name: The name of the operation.
+        trace_id: 32 hex digit id shared by the spans of a trace.
+        span_id: 16 hex digit id of the span.
+        parent_id: The span_id of the parent span, None for a root span.
+        video: The video the span belongs to, None for run level spans.
+        attributes: Extra attributes of the span.
+        start_ns: Start time in nanoseconds since the epoch.
+        end_ns: End time in nanoseconds since the epoch.
+        thread_id: The thread the span ran on.
+        error: The error that ended the span, if any.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent: Optional['Span'],
+        video: Optional[str],
+        attributes: Dict[str, Any],
+    ) -> None:
+        """Initiate and start the span."""
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.video = video
+        self.attributes = attributes
+        if parent and parent.video == video:
+            self.attributes = {**parent.attributes, **attributes}
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.thread_id = threading.get_ident()
+        self.error = None
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    'current_span', default=None
+)
+
+
+class Tracer:
+    """Records spans with one trace per video and exports them to a file.
+    Only the most recent finished spans are kept, so a long running watch
+    exports a rolling window instead of growing without bound.
+    Attributes:
+        dropped: The number of finished spans dropped from the buffer.
+    """
+
+    def __init__(self, max_spans: int = _MAX_SPANS) -> None:
+        """Initiate the tracer.
+        Args:
+            max_spans: The most finished spans kept for export.
+        """
+        self._lock = threading.Lock()
+        self._spans: collections.deque[Span] = collections.deque(
+            maxlen=max_spans
+        )
+        self._trace_ids: Dict[Optional[str], str] = {}
+        self.dropped = 0
+
+    def _trace_id(self, video: Optional[str]) -> str:
+        """Returns the trace id of a video, or of the run for None."""
+        with self._lock:
+            if video not in self._trace_ids:
+                self._trace_ids[video] = secrets.token_hex(16)
+            return self._trace_ids[video]
+
+    @contextlib.contextmanager
+    def span(
+        self,
+        name: str,
+        video: Optional[str] = None,
+        end_trace: bool = False,
+        **attributes: Any,
+    ) -> Iterator[Span]:
+        """Records the block as a span.
+        Args:
+            name: The name of the operation, e.g. 'download' or 'model_call'.
+            video: The video the operation belongs to. Inherited from the
+                enclosing span when not given.
+            end_trace: Whether this is the root span of the video's
+                processing, whose end forgets the trace id of the video.
+            **attributes: Extra attributes, e.g. video_key.
+        Yields:
+            The span.
+        """
+        parent = _current_span.get()
+        if video is None and parent:
+            video = parent.video
+        if parent and parent.video == video:
+            # Late children, e.g. abandoned hedged calls, keep the trace of
+            # their parent even once it ended.
+            trace_id = parent.trace_id
+        else:
+            trace_id = self._trace_id(video)
+            parent = None
+        span = Span(name, trace_id, parent, video, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            with self._lock:
+                if len(self._spans) == self._spans.maxlen:
+                    self.dropped += 1
+                self._spans.append(span)
+                if end_trace and self._trace_ids.get(video) == trace_id:
+                    del self._trace_ids[video]
+
+    @property
+    def spans(self) -> List[Span]:
+        """The finished spans."""
+        with self._lock:
+            return list(self._spans)
+
+    def export(self, path: str, trace_format: str = 'chrome') -> None:
+        """Writes the finished spans to a file.
+        Args:
+            path: The file to write.
+            trace_format: 'chrome' for a Chrome trace_event JSON file that
+                opens in chrome://tracing or Perfetto, 'otlp' for an OTLP
+                JSON file.
+        """
+        if trace_format == 'otlp':
+            content = self.to_otlp()
+        else:
+            content = self.to_chrome_trace()
+        with open(path, 'w') as file:
+            json.dump(content, file)
+        logger.info(
+            f'Wrote {len(self.spans)} spans to {path}, '
+            f'{self.dropped} older spans dropped'
+        )
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Converts the spans to the Chrome trace_event format.
+        Returns:
+            The trace, one complete event per span.
+        """
+        events = []
+        for span in self.spans:
+            args = {**span.attributes, 'trace_id': span.trace_id}
+            if span.video:
+                args['video'] = span.video
+            if span.error:
+                args['error'] = span.error
+            events.append(
+                {
+                    'name': span.name,
+                    'cat': 'video' if span.video else 'run',
+                    'ph': 'X',
+                    'ts': span.start_ns / 1000,
+                    'dur': (span.end_ns - span.start_ns) / 1000,
+                    'pid': os.getpid(),
+                    'tid': span.thread_id,
+                    'args': args,
+                }
+            )
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Converts the spans to the OTLP JSON trace format.
+        Returns:
+            The trace as an OTLP ExportTraceServiceRequest.
+        """
+        otlp_spans = []
+        for span in self.spans:
+            attributes = dict(span.attributes)
+            if span.video:
+                attributes['video'] = span.video
+            otlp_span = {
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns),
+                'attributes': [
+                    {'key': key, 'value': {'stringValue': str(value)}}
+                    for key, value in attributes.items()
+                ],
+                'status': {'code': 2, 'message': span.error}
+                if span.error
+                else {'code': 1},
+            }
+            if span.parent_id:
+                otlp_span['parentSpanId'] = span.parent_id
+            otlp_spans.append(otlp_span)
+        return {
+            'resourceSpans': [
+                {
+                    'resource': {
+                        'attributes': [
+                            {
+                                'key': 'service.name',
+                                'value': {'stringValue': _SERVICE_NAME},
+                            }
+                        ]
+                    },
+                    'scopeSpans': [
+                        {'scope': {'name': _SERVICE_NAME}, 'spans': otlp_spans}
+                    ],
+                }
+            ]
+        }
+
+
+tracer = Tracer()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats log records as JSON carrying the current trace context."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Formats a log record as a JSON line.
+        Args:
+            record: The log record.
+        Returns:
+            The JSON encoded record.
+        """
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        span = _current_span.get()
+        if span:
+            entry['trace_id'] = span.trace_id
+            entry['span_id'] = span.span_id
+            entry['span'] = span.name
+            if span.video:
+                entry['video'] = span.video
+            if 'video_key' in span.attributes:
+                entry['video_key'] = span.attributes['video_key']
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure(log_format: str = 'text') -> None:
+    """Switches the format of the root log handlers.
+    Args:
+        log_format: 'text' for the default format, 'json' for JSON lines.
+    """
+    if log_format != 'json':
+        return
+    for handler in logging.getLogger().handlers:
+        handler.setFormatter(JsonFormatter())
@@ -0,0 +1,102 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for bounding the video bytes held in memory."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import contextlib
+import os
+import threading
+from typing import Iterator
+
+# Uploaded videos are streamed from disk in chunks of this size.
+STREAMED_WEIGHT = 8 * 1024 * 1024
+
+
+def estimate_video_weight(path: str, inline_max_bytes: int) -> int:
+    """Estimates the memory a model call for the video will hold.
+    Args:
+        path: The path to the video file.
+        inline_max_bytes: Videos larger than this are uploaded, not inlined.
+    Returns:
+        The estimated number of bytes held in memory during the call.
+    """
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+    if size > inline_max_bytes:
+        return STREAMED_WEIGHT
+    # Inline videos are held as raw bytes plus their base64 encoding in the
+    # request body.
+    return size + 4 * -(-size // 3)
+
+
+class MemoryBudget:
+    """Admits work by byte weight against a memory budget.
+    Work heavier than the whole budget is still admitted, but only when
+    nothing else is in flight, so it can never deadlock.
+    Attributes:
+        max_bytes: The budget of in-flight bytes.
+        in_flight: The bytes currently admitted.
+        peak: The highest value in_flight has reached.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        """Initiate the budget.
+        Args:
+            max_bytes: The budget of in-flight bytes.
+        """
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.peak = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, weight: int) -> None:
+        """Blocks until the weight fits in the budget, then admits it.
+        Args:
+            weight: The estimated bytes of the work.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: (
+                    self.in_flight == 0
+                    or self.in_flight + weight <= self.max_bytes
+                )
+            )
+            self.in_flight += weight
+            self.peak = max(self.peak, self.in_flight)
+
+    def release(self, weight: int) -> None:
+        """Returns the weight of finished work to the budget.
+        Args:
+            weight: The weight passed to acquire.
+        """
+        with self._condition:
+            self.in_flight -= weight
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def reserve(self, weight: int) -> Iterator[None]:
+        """Holds the weight for the duration of the context.
+        Args:
+            weight: The estimated bytes of the work.
+        Yields:
+            None
+        """
+        self.acquire(weight)
+        try:
+            yield
+        finally:
+            self.release(weight)
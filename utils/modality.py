@@ -0,0 +1,131 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for routing rules to the cheapest modality."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import contextvars
+import os
+import tempfile
+import threading
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import logging as log
+from utils import response_parser
+from utils.audio import AUDIO_MIME_TYPE, extract_audio
+from utils.rules import VISUAL, Rule
+
+
+class TranscriptRouter:
+    """Reviews audio and text rules against a transcript of the audio track.
+    Only visual rules are sent with the video. The transcript of a video is
+    made once and reused by follow-up requests until the video is released.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[str, str], str],
+        analyze_transcript: Callable[[str, List[Rule]], str],
+        executor: Executor,
+        schema: Dict[str, Any],
+    ) -> None:
+        """Initiate the router.
+        Args:
+            transcribe: Transcribes an audio file of the given mime type.
+            analyze_transcript: Reviews rules against a transcript.
+            executor: The executor the transcript review runs on, in
+                parallel with the video request.
+            schema: The response schema the models follow.
+        """
+        self.transcribe = transcribe
+        self.analyze_transcript = analyze_transcript
+        self.executor = executor
+        self.schema = schema
+        self._transcripts: Dict[str, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def transcript(self, video_path: str) -> Optional[str]:
+        """Extracts and transcribes the audio of a video, once.
+        Args:
+            video_path: The path to the video file.
+        Returns:
+            The transcript, None if the video has no usable audio track.
+        """
+        with self._lock:
+            if video_path in self._transcripts:
+                return self._transcripts[video_path]
+        with log.tracer.span('transcribe'):
+            with tempfile.TemporaryDirectory() as directory:
+                audio_path = os.path.join(directory, 'audio.mp3')
+                transcript = None
+                if extract_audio(video_path, audio_path):
+                    transcript = self.transcribe(audio_path, AUDIO_MIME_TYPE)
+        with self._lock:
+            self._transcripts[video_path] = transcript
+        return transcript
+
+    def release(self, video_path: str) -> None:
+        """Forgets the transcript of a video that finished processing.
+        Args:
+            video_path: The path to the video file.
+        """
+        with self._lock:
+            self._transcripts.pop(video_path, None)
+
+    def analyze(
+        self,
+        analyze_video: Callable[..., str],
+        video_path: str,
+        rules: List[Rule],
+        rules_subset: Optional[List[Rule]] = None,
+    ) -> Optional[str]:
+        """Reviews a video, routing audio and text rules to its transcript.
+        Args:
+            analyze_video: Calls the model with the video for a video path
+                and an optional rules subset.
+            video_path: The path to the video file.
+            rules: Every rule of the rules file.
+            rules_subset: Optional subset of the rules to review.
+        Returns:
+            The combined response text, like a single model response.
+        """
+        selected = rules_subset or rules
+        transcript_rules = [
+            rule for rule in selected if rule.modality != VISUAL
+        ]
+        visual_rules = [rule for rule in selected if rule.modality == VISUAL]
+        transcript = self.transcript(video_path) if transcript_rules else None
+        if transcript is None:
+            if rules_subset:
+                return analyze_video(video_path, rules_subset)
+            return analyze_video(video_path)
+
+        log.logger.info(
+            f'Reviewing {len(transcript_rules)} rules against the transcript '
+            f'and {len(visual_rules)} against the video'
+        )
+        transcript_future = self.executor.submit(
+            contextvars.copy_context().run,
+            self.analyze_transcript,
+            transcript,
+            transcript_rules,
+        )
+        texts = []
+        if visual_rules:
+            texts.append(analyze_video(video_path, visual_rules))
+        texts.append(transcript_future.result())
+        return response_parser.combine_responses(
+            [text for text in texts if text], self.schema
+        )
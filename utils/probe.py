@@ -0,0 +1,101 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for probing video files with ffprobe."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import json
+import subprocess
+from typing import Dict, Optional
+
+from utils import logging as log
+
+
+class MediaInfo:
+    """What ffprobe reports about a video file.
+    Attributes:
+        duration: The duration in seconds.
+        width: The width in pixels of the first video stream, 0 if none.
+        height: The height in pixels of the first video stream, 0 if none.
+        has_audio: Whether the file has an audio stream.
+    """
+
+    def __init__(
+        self, duration: float, width: int, height: int, has_audio: bool
+    ) -> None:
+        """Initiate the media info."""
+        self.duration = duration
+        self.width = width
+        self.height = height
+        self.has_audio = has_audio
+
+
+def probe_media(
+    video_path: str, headers: Optional[Dict[str, str]] = None
+) -> Optional[MediaInfo]:
+    """Reads the duration, resolution and audio presence of a video.
+    A URL is read with HTTP range requests, so only the container header
+    and index are fetched, not the whole video.
+    Args:
+        video_path: The path to the video file, or its URL.
+        headers: Optional HTTP headers sent when reading a URL.
+    Returns:
+        The media info, or None if it could not be probed.
+    """
+    header_args = []
+    if headers:
+        header_args = [
+            '-headers',
+            ''.join(f'{name}: {value}\r\n' for name, value in headers.items()),
+        ]
+    try:
+        output = subprocess.run(
+            [
+                'ffprobe',
+                '-v',
+                'error',
+                *header_args,
+                '-show_entries',
+                'format=duration:stream=codec_type,width,height',
+                '-of',
+                'json',
+                video_path,
+            ],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+        probe = json.loads(output)
+        streams = probe.get('streams', [])
+        video = next((s for s in streams if s.get('codec_type') == 'video'), {})
+        return MediaInfo(
+            duration=float(probe['format']['duration']),
+            width=int(video.get('width', 0)),
+            height=int(video.get('height', 0)),
+            has_audio=any(s.get('codec_type') == 'audio' for s in streams),
+        )
+    except (OSError, subprocess.CalledProcessError, ValueError, KeyError) as e:
+        log.logger.warning(f'Could not probe {video_path}: {e}')
+        return None
+
+
+def probe_duration(video_path: str) -> Optional[float]:
+    """Reads the duration of a video with ffprobe.
+    Args:
+        video_path: The path to the video file.
+    Returns:
+        The duration in seconds, or None if it could not be probed.
+    """
+    media_info = probe_media(video_path)
+    return media_info.duration if media_info else None
@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for building compact prompts for the model."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import math
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.rules import Rule
+
+_CHARS_PER_TOKEN = 4
+
+_INSTRUCTIONS = (
+    'You are a strict reviewer of video ads against advertising policy '
+    'rules. Review the whole ad, including on-screen text, speech and '
+    'context, against every rule below.'
+)
+# One instruction per field of the response schema, so the prompt never
+# asks for fields the schema does not accept.
+_FIELD_INSTRUCTIONS = {
+    'overall_compliance_assessment': (
+        'percentage (0-100) of policy compliance of the ad'
+    ),
+    'rule_index': 'the rule id',
+    'rule_violation': 'true if the ad violates the rule',
+    'violation_score': 'severity from 1 (minor) to 5 (severe), 0 if not',
+    'violation_reason': 'the content at fault and why, or why it complies',
+    'violation_time': (
+        'MM:SS start of each violation, comma separated, empty if none'
+    ),
+}
+
+
+def approximate_token_count(text: str) -> int:
+    """Approximates the token count of a text without calling the API.
+    Args:
+        text: The text.
+    Returns:
+        The approximate number of tokens, about four characters each.
+    """
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def encode_rule(rule: Rule) -> str:
+    """Encodes a rule as one compact 'id|description' line.
+    Args:
+        rule: The rule.
+    Returns:
+        The encoded rule.
+    """
+    description = ' '.join(rule.description.split())
+    return f'{rule.index}|{description}'
+
+
+class PromptBuilder:
+    """Builds prompts from rules parsed once and the response schema."""
+
+    def __init__(self, rules: List[Rule], schema: Dict[str, Any]) -> None:
+        """Initiate the prompt builder.
+        Args:
+            rules: Every rule of the rules file.
+            schema: The response schema the model answers with.
+        Raises:
+            ValueError: If the schema has a field the prompt cannot explain.
+        """
+        self.rules = rules
+        properties = schema['properties']
+        rule_fields = properties['rules']['items']['properties']
+        unknown = [
+            field
+            for field in [*properties, *rule_fields]
+            if field != 'rules' and field not in _FIELD_INSTRUCTIONS
+        ]
+        if unknown:
+            raise ValueError(f'No prompt instruction for fields {unknown}')
+        self._header = '\n'.join(
+            [
+                _INSTRUCTIONS,
+                'For each rule answer:',
+                *(
+                    f'- {field}: {_FIELD_INSTRUCTIONS[field]}'
+                    for field in rule_fields
+                ),
+                *(
+                    f'Also answer {field}: {_FIELD_INSTRUCTIONS[field]}.'
+                    for field in properties
+                    if field != 'rules'
+                ),
+                'Rules (id|rule):',
+            ]
+        )
+        self._lines = {rule.hash: encode_rule(rule) for rule in rules}
+        self._full_prompt = self._build(rules)
+
+    def _build(self, rules: List[Rule]) -> str:
+        """Joins the instructions with the encoded rules."""
+        return '\n'.join(
+            [
+                self._header,
+                *(
+                    self._lines.get(rule.hash) or encode_rule(rule)
+                    for rule in rules
+                ),
+            ]
+        )
+
+    def build(self, rules: Optional[List[Rule]] = None) -> str:
+        """Builds the prompt for a rules subset.
+        Args:
+            rules: Optional subset of the rules, all rules if not given.
+        Returns:
+            The prompt.
+        """
+        if not rules:
+            return self._full_prompt
+        return self._build(rules)
+
+    def count_tokens(
+        self,
+        rules: Optional[List[Rule]] = None,
+        counter: Callable[[str], int] = approximate_token_count,
+    ) -> int:
+        """Counts the tokens of a prompt.
+        Args:
+            rules: Optional subset of the rules, all rules if not given.
+            counter: Counts the tokens of a text, e.g. through the model's
+                count tokens API. Approximated locally if not given.
+        Returns:
+            The number of tokens of the prompt.
+        """
+        return counter(self.build(rules))
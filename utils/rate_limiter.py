@@ -0,0 +1,113 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for throttling calls to per-minute API quotas."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Token bucket refilling at a fixed rate per period.
+    Attributes:
+        rate: Tokens added per period, 0 for no limit.
+        period: The period in seconds, a minute for per-minute quotas.
+        capacity: The most tokens the bucket holds, i.e. the largest burst.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        period: float = 60.0,
+        capacity: Optional[float] = None,
+    ) -> None:
+        """Initiate the rate limiter with a full bucket.
+        Args:
+            rate: Tokens added per period, 0 for no limit.
+            period: The period in seconds.
+            capacity: The most tokens the bucket holds, the rate if not given.
+        """
+        self.rate = rate
+        self.period = period
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """Adds the tokens accrued since the last refill."""
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated) * self.rate / self.period,
+        )
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        """The tokens that can be taken without waiting."""
+        if not self.rate:
+            return float('inf')
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        """Takes tokens if they are available, without waiting.
+        Args:
+            amount: The number of tokens.
+        Returns:
+            True if the tokens were taken.
+        """
+        if not self.rate:
+            return True
+        with self._lock:
+            self._refill()
+            if self._tokens < min(amount, self.capacity):
+                return False
+            self._tokens -= amount
+            return True
+
+    def acquire(self, amount: float = 1) -> float:
+        """Waits until tokens are available and takes them.
+        Amounts above the capacity wait for a full bucket and leave it in
+        debt, so the calls that follow are delayed accordingly.
+        Args:
+            amount: The number of tokens.
+        Returns:
+            The seconds spent waiting.
+        """
+        if not self.rate:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                needed = min(amount, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= amount
+                    return waited
+                delay = (needed - self._tokens) * self.period / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def drain(self) -> None:
+        """Empties the bucket after the API reported quota exhaustion.
+        Every caller then backs off until tokens accrue again.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0)
@@ -0,0 +1,225 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for parsing model responses, salvaging partial ones."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import logging as log
+from utils.rules import Rule
+
+_RULES_PATTERN = re.compile(r'"rules"\s*:\s*\[')
+_OVERALL_PATTERN = re.compile(
+    r'"overall_compliance_assessment"\s*:\s*(-?\d+(?:\.\d+)?)'
+)
+_TYPES = {
+    'string': str,
+    'boolean': bool,
+    'object': dict,
+    'array': list,
+}
+
+
+def matches_schema(value: Any, schema: Dict[str, Any]) -> bool:
+    """Checks a value against the subset of JSON schema the model uses.
+    Args:
+        value: The parsed JSON value.
+        schema: The schema, with type, properties, items and required.
+    Returns:
+        True if the value matches the schema.
+    """
+    schema_type = schema.get('type')
+    if schema_type in ('integer', 'number'):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return False
+        return schema_type == 'number' or float(value).is_integer()
+    if schema_type in _TYPES and not isinstance(value, _TYPES[schema_type]):
+        return False
+    if schema_type == 'object':
+        if any(key not in value for key in schema.get('required', [])):
+            return False
+        return all(
+            matches_schema(value[key], property_schema)
+            for key, property_schema in schema.get('properties', {}).items()
+            if key in value
+        )
+    if schema_type == 'array':
+        return all(matches_schema(item, schema['items']) for item in value)
+    return True
+
+
+def _salvage_rules(text: str) -> List[Any]:
+    """Decodes every complete element of the rules array of broken JSON.
+    Elements that fail to decode are skipped up to the next object, and
+    decoding stops where the text was truncated.
+    """
+    match = _RULES_PATTERN.search(text)
+    if not match:
+        return []
+    decoder = json.JSONDecoder()
+    rules, position = [], match.end()
+    while position < len(text):
+        while position < len(text) and text[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(text) or text[position] == ']':
+            break
+        try:
+            rule, position = decoder.raw_decode(text, position)
+        except ValueError:
+            position = text.find('{', position + 1)
+            if position < 0:
+                break
+            continue
+        rules.append(rule)
+    return rules
+
+
+def parse_response(text: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Parses a model response, keeping every valid rule object.
+    Truncated or malformed JSON is salvaged instead of failing the video.
+    Args:
+        text: The response text.
+        schema: The response schema the model was asked to follow.
+    Returns:
+        The response with only the rules matching the schema. The overall
+        compliance assessment is None if it could not be recovered.
+    """
+    try:
+        result = json.loads(text)
+    except ValueError:
+        overall = _OVERALL_PATTERN.search(text)
+        result = {
+            'overall_compliance_assessment': float(overall.group(1))
+            if overall
+            else None,
+            'rules': _salvage_rules(text),
+        }
+        log.logger.warning(
+            f'Salvaged {len(result["rules"])} rules from malformed response'
+        )
+    if not isinstance(result, dict):
+        result = {}
+    properties = schema['properties']
+    overall = result.get('overall_compliance_assessment')
+    rules = result.get('rules')
+    return {
+        'overall_compliance_assessment': overall
+        if matches_schema(overall, properties['overall_compliance_assessment'])
+        else None,
+        'rules': [
+            rule
+            for rule in (rules if isinstance(rules, list) else [])
+            if matches_schema(rule, properties['rules']['items'])
+        ],
+    }
+
+
+def compliance_percentage(rules: List[Dict[str, Any]]) -> float:
+    """Computes the overall compliance as the share of rules not violated.
+    Args:
+        rules: The per rule verdicts.
+    Returns:
+        The percentage of compliant rules, 100 without rules.
+    """
+    if not rules:
+        return 100
+    compliant = sum(not rule['rule_violation'] for rule in rules)
+    return round(100 * compliant / len(rules), 2)
+
+
+def combine_responses(texts: List[str], schema: Dict[str, Any]) -> str:
+    """Combines responses reviewing disjoint rule subsets of one video.
+    Args:
+        texts: The response texts.
+        schema: The response schema the model was asked to follow.
+    Returns:
+        The combined response text. The overall compliance is the share of
+        rules not violated, as no single response saw every rule.
+    """
+    rules = [
+        rule for text in texts for rule in parse_response(text, schema)['rules']
+    ]
+    return json.dumps(
+        {
+            'overall_compliance_assessment': compliance_percentage(rules),
+            'rules': rules,
+        }
+    )
+
+
+def _rule_key(rule_id: Any) -> str:
+    """Normalizes a rule id, an int or a non numeric str, for comparison."""
+    if isinstance(rule_id, float) and rule_id.is_integer():
+        rule_id = int(rule_id)
+    return str(rule_id)
+
+
+def analyze_with_followup(
+    analyze: Callable[[Optional[List[Rule]]], Optional[str]],
+    rules: List[Rule],
+    schema: Dict[str, Any],
+    rules_subset: Optional[List[Rule]] = None,
+    max_followups: int = 1,
+) -> Optional[Dict[str, Any]]:
+    """Calls the model and re-asks it only for rules missing in the answer.
+    Args:
+        analyze: Calls the model for a rules subset, or for the whole rules
+            file when given None, and returns the response text.
+        rules: Every rule of the rules file.
+        schema: The response schema the model was asked to follow.
+        rules_subset: Optional subset of the rules to evaluate.
+        max_followups: How many follow-up requests may be made.
+    Returns:
+        The parsed response, None if the model returned nothing.
+    Raises:
+        ValueError: If nothing could be recovered from the responses.
+    """
+    expected = rules_subset or rules
+    text = analyze(rules_subset)
+    if not text:
+        return None
+    with log.tracer.span('parse'):
+        result = parse_response(text, schema)
+    for _ in range(max_followups):
+        answered = {_rule_key(rule['rule_index']) for rule in result['rules']}
+        missing = [
+            rule for rule in expected if _rule_key(rule.index) not in answered
+        ]
+        if not missing:
+            break
+        log.logger.warning(
+            f'Response is missing {len(missing)} of {len(expected)} rules, '
+            'requesting only those'
+        )
+        text = analyze(missing)
+        if not text:
+            break
+        missing_indexes = {_rule_key(rule.index) for rule in missing}
+        with log.tracer.span('parse'):
+            followup = parse_response(text, schema)
+        result['rules'].extend(
+            rule
+            for rule in followup['rules']
+            if _rule_key(rule['rule_index']) in missing_indexes
+        )
+    if not result['rules'] and result['overall_compliance_assessment'] is None:
+        raise ValueError('Nothing could be recovered from the response')
+    if result['overall_compliance_assessment'] is None:
+        result['overall_compliance_assessment'] = compliance_percentage(
+            result['rules']
+        )
+    return result
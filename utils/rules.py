@@ -0,0 +1,107 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for reading the policy rules file."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import csv
+import hashlib
+import io
+from typing import List, Optional, Union
+
+VISUAL = 'visual'
+# Rules about spoken or scripted claims, evaluable from the audio transcript.
+TRANSCRIPT_MODALITIES = ('audio', 'text')
+_MODALITY_COLUMN = 'modality'
+
+
+class Rule:
+    """A single policy rule of the rules file.
+    Attributes:
+        index: The rule id from the first column, as reported by the model.
+        header: The column names of the rules file.
+        fields: The values of the row.
+        hash: Hash of the row, changes whenever the rule is edited.
+        modality: The optional Modality column, 'audio' or 'text' for rules
+            evaluable from the transcript, 'visual' otherwise.
+    """
+
+    def __init__(self, header: List[str], fields: List[str]) -> None:
+        """Initiate the rule from a row of the rules file.
+        Args:
+            header: The column names of the rules file.
+            fields: The values of the row.
+        """
+        self.header = header
+        self.fields = [field.strip() for field in fields]
+        rule_id = self.fields[0]
+        self.index: Union[int, str] = (
+            int(rule_id) if rule_id.isdigit() else rule_id
+        )
+        self.hash = hashlib.sha256(
+            '\x1f'.join(self.fields).encode('utf-8')
+        ).hexdigest()
+        self._modality_column = _column_index(header, _MODALITY_COLUMN)
+        modality = self._field(self._modality_column).lower()
+        self.modality = (
+            modality if modality in TRANSCRIPT_MODALITIES else VISUAL
+        )
+
+    def _field(self, column: Optional[int]) -> str:
+        """Reads a column of the row, empty if it is missing."""
+        if column is None or column >= len(self.fields):
+            return ''
+        return self.fields[column]
+
+    @property
+    def description(self) -> str:
+        """The text of the rule, every column after the id but the modality."""
+        return ' '.join(
+            field
+            for column, field in enumerate(self.fields)
+            if column and column != self._modality_column and field
+        )
+
+
+def _column_index(header: List[str], name: str) -> Optional[int]:
+    """Finds a column by its case insensitive name."""
+    for column, column_name in enumerate(header):
+        if column_name.strip().lower() == name:
+            return column
+    return None
+
+
+def parse_rules(rules_content: str) -> List[Rule]:
+    """Parses the CSV content of a rules file.
+    Args:
+        rules_content: The CSV text, with a header row.
+    Returns:
+        The rules, in file order.
+    """
+    rows = [row for row in csv.reader(io.StringIO(rules_content)) if row]
+    if not rows:
+        return []
+    header, *body = rows
+    return [Rule(header, row) for row in body if row[0].strip()]
+
+
+def load_rules(rules_path: str) -> List[Rule]:
+    """Loads and parses a rules file.
+    Args:
+        rules_path: The path to the CSV rules file.
+    Returns:
+        The rules, in file order.
+    """
+    with open(rules_path, 'r', newline='') as file:
+        return parse_rules(file.read())
@@ -0,0 +1,305 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for estimating violation rates from a sample."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import collections
+import math
+import random
+import statistics
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from utils import logging as log
+
+# Size is the duration proxy available before download: at a typical ad
+# bitrate of about 2 Mbps these are roughly 40s, 3min and 13min.
+_SIZE_BUCKETS = (
+    (10 * 1024 * 1024, '<10MB'),
+    (50 * 1024 * 1024, '10-50MB'),
+    (200 * 1024 * 1024, '50-200MB'),
+    (math.inf, '>=200MB'),
+)
+_ROOT_PREFIX = '(root)'
+_UNKNOWN = 'unknown'
+
+
+def _prefix(blob: Any) -> str:
+    """The top level prefix of a listed blob."""
+    head, separator, _ = blob.name.partition('/')
+    return head if separator else _ROOT_PREFIX
+
+
+def _month(blob: Any) -> str:
+    """The upload month of a listed blob."""
+    return blob.updated.strftime('%Y-%m') if blob.updated else _UNKNOWN
+
+
+def _size(blob: Any) -> str:
+    """The size bucket of a listed blob."""
+    if blob.size is None:
+        return _UNKNOWN
+    return next(label for limit, label in _SIZE_BUCKETS if blob.size < limit)
+
+
+_STRATA = {
+    'prefix': _prefix,
+    'month': _month,
+    'size': _size,
+}
+
+
+def stratum_key(strata: str) -> Callable[[Any], str]:
+    """Builds the function assigning a listed blob to its stratum.
+    Args:
+        strata: Comma separated blob attributes to stratify on, among
+            'prefix', 'month' and 'size'. Empty or 'none' for a simple
+            random sample.
+    Returns:
+        The function mapping a blob to its stratum name.
+    Raises:
+        ValueError: If an attribute is not supported.
+    """
+    names = [
+        name.strip().lower()
+        for name in strata.split(',')
+        if name.strip() and name.strip().lower() != 'none'
+    ]
+    unknown = [name for name in names if name not in _STRATA]
+    if unknown:
+        raise ValueError(f'Unsupported sample strata {unknown}')
+    if not names:
+        return lambda _: 'all'
+    return lambda blob: '|'.join(_STRATA[name](blob) for name in names)
+
+
+class StratifiedSampler:
+    """Draws a growing sample without replacement, proportional to strata.
+    Attributes:
+        population: The number of items of each stratum.
+        sampled: The number of items drawn from each stratum so far.
+    """
+
+    def __init__(
+        self,
+        items: Iterable[Any],
+        key: Callable[[Any], Hashable],
+        seed: Optional[int] = None,
+    ) -> None:
+        """Initiate the sampler.
+        Args:
+            items: The whole population.
+            key: Maps an item to its stratum.
+            seed: Seed of the shuffle, for reproducible samples.
+        """
+        self._strata: Dict[Hashable, List[Any]] = collections.defaultdict(list)
+        for item in items:
+            self._strata[key(item)].append(item)
+        shuffle = random.Random(seed).shuffle
+        for stratum in sorted(self._strata, key=str):
+            shuffle(self._strata[stratum])
+        self.population = {
+            stratum: len(items) for stratum, items in self._strata.items()
+        }
+        self.sampled = dict.fromkeys(self._strata, 0)
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether every item was drawn."""
+        return self.sampled == self.population
+
+    def _allocate(self, total: int) -> Dict[Hashable, int]:
+        """Splits a sample size across strata proportionally to their size.
+        Every stratum gets at least one item when the sample is large
+        enough, and no stratum gives back items already drawn.
+        """
+        size = sum(self.population.values())
+        total = min(total, size)
+        quotas = {
+            stratum: total * count / size
+            for stratum, count in self.population.items()
+        }
+        targets = {
+            stratum: max(
+                self.sampled[stratum],
+                math.floor(quota),
+                1 if total >= len(quotas) else 0,
+            )
+            for stratum, quota in quotas.items()
+        }
+        by_remainder = sorted(
+            quotas, key=lambda stratum: targets[stratum] - quotas[stratum]
+        )
+        missing = total - sum(targets.values())
+        while missing > 0:
+            open_strata = [
+                stratum
+                for stratum in by_remainder
+                if targets[stratum] < self.population[stratum]
+            ]
+            for stratum in open_strata[:missing]:
+                targets[stratum] += 1
+            missing = total - sum(targets.values())
+        return targets
+
+    def draw(self, total: int) -> List[Tuple[Hashable, Any]]:
+        """Grows the sample to a total size.
+        Args:
+            total: The size of the whole sample after this draw.
+        Returns:
+            The newly drawn (stratum, item) pairs.
+        """
+        drawn = []
+        for stratum, target in self._allocate(total).items():
+            items = self._strata[stratum][self.sampled[stratum] : target]
+            drawn.extend((stratum, item) for item in items)
+            self.sampled[stratum] += len(items)
+        return drawn
+
+
+class RateEstimate:
+    """Estimated share of the population violating a rule.
+    Attributes:
+        rate: The stratified estimate of the violation rate.
+        low: The lower bound of the confidence interval.
+        high: The upper bound of the confidence interval.
+        sampled: The number of sampled videos with a verdict for the rule.
+    """
+
+    def __init__(
+        self, rate: float, low: float, high: float, sampled: int
+    ) -> None:
+        """Initiate the estimate."""
+        self.rate = rate
+        self.low = low
+        self.high = high
+        self.sampled = sampled
+
+    @property
+    def half_width(self) -> float:
+        """Half the width of the confidence interval."""
+        return (self.high - self.low) / 2
+
+
+def estimate_rate(
+    counts: Dict[Hashable, Tuple[int, int]],
+    population: Dict[Hashable, int],
+    confidence: float = 0.95,
+) -> RateEstimate:
+    """Estimates a violation rate from the verdicts of a stratified sample.
+    Each stratum's proportion is adjusted as in the Agresti-Coull interval,
+    adding z^2/2 violations and z^2/2 compliant videos, so a stratum where
+    every sampled video complied still has a non zero variance. The
+    variances and adjustments are weighted by stratum size and shrunk by
+    the finite population correction, so a census has no uncertainty.
+    Strata without verdicts are left out of the weights.
+    Args:
+        counts: The (violations, verdicts) of each sampled stratum.
+        population: The number of videos of each stratum.
+        confidence: The confidence level of the interval.
+    Returns:
+        The estimate.
+    """
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    counts = {stratum: c for stratum, c in counts.items() if c[1]}
+    size = sum(population[stratum] for stratum in counts)
+    rate = center = variance = 0.0
+    for stratum, (violations, verdicts) in counts.items():
+        weight = population[stratum] / size
+        adjusted_verdicts = verdicts + z * z
+        adjusted = (violations + z * z / 2) / adjusted_verdicts
+        correction = max(0.0, 1 - verdicts / population[stratum])
+        observed = violations / verdicts
+        rate += weight * observed
+        center += weight * (observed + (adjusted - observed) * correction)
+        variance += (
+            weight**2 * adjusted * (1 - adjusted) / adjusted_verdicts
+        ) * correction
+    margin = z * math.sqrt(variance)
+    return RateEstimate(
+        rate,
+        max(0.0, min(rate, center - margin)),
+        min(1.0, max(rate, center + margin)),
+        sum(verdicts for _, verdicts in counts.values()),
+    )
+
+
+def sample_until_precision(
+    sampler: StratifiedSampler,
+    analyze: Callable[
+        [List[Tuple[Hashable, Any]]], Iterable[Tuple[Hashable, Any, bool]]
+    ],
+    initial_size: int,
+    target_half_width: float,
+    max_size: int,
+    confidence: float = 0.95,
+) -> Dict[Any, RateEstimate]:
+    """Samples in rounds until every rule's rate is precise enough.
+    The next sample size is projected from the widest interval, whose width
+    shrinks with the square root of the sample size.
+    Args:
+        sampler: The sampler of the population.
+        analyze: Analyzes a batch of (stratum, item) pairs, returning the
+            (stratum, rule, violated) verdicts.
+        initial_size: The size of the first sample.
+        target_half_width: The widest acceptable half width of the
+            intervals, 0 to stop after the first sample.
+        max_size: The largest sample size.
+        confidence: The confidence level of the intervals.
+    Returns:
+        The estimate of each rule.
+    """
+    counts = collections.defaultdict(
+        lambda: collections.defaultdict(lambda: [0, 0])
+    )
+    size = min(initial_size, max_size)
+    while True:
+        batch = sampler.draw(size)
+        for stratum, rule, violated in analyze(batch) if batch else []:
+            count = counts[rule][stratum]
+            count[0] += bool(violated)
+            count[1] += 1
+        estimates = {
+            rule: estimate_rate(strata, sampler.population, confidence)
+            for rule, strata in counts.items()
+        }
+        widest = max(
+            (estimate.half_width for estimate in estimates.values()),
+            default=math.inf,
+        )
+        sampled = sum(sampler.sampled.values())
+        log.logger.info(
+            f'Sampled {sampled} of {sum(sampler.population.values())} '
+            f'videos, widest interval +/-{widest:.3f}'
+        )
+        if (
+            not target_half_width
+            or not estimates
+            or widest <= target_half_width
+            or not batch
+            or sampler.exhausted
+            or size >= max_size
+        ):
+            return estimates
+        projected = math.ceil(sampled * (widest / target_half_width) ** 2)
+        size = min(max_size, max(size + 1, projected))
@@ -0,0 +1,235 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for estimating and ordering the work of a run."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import os
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TypeVar,
+)
+
+from utils.probe import MediaInfo, probe_media
+from utils.segments import plan_segments
+
+# Video is tokenized at one frame per second, 258 tokens per frame at the
+# default media resolution, plus 32 tokens per second of audio.
+_VIDEO_TOKENS_PER_SECOND = 258
+_AUDIO_TOKENS_PER_SECOND = 32
+_OUTPUT_TOKENS_PER_RULE = 80
+# Bitrate assumed for videos ffprobe cannot read, about 2 Mbps.
+_FALLBACK_BYTES_PER_SECOND = 250_000
+
+Job = TypeVar('Job')
+_END = object()
+
+
+def _local_size(path: str) -> int:
+    """Reads the size of a local file, 0 if it does not exist."""
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+class JobEstimate:
+    """Estimated size of the analysis of one video.
+    Attributes:
+        path: The path to the video file.
+        media_info: What ffprobe reported, None if the video was not probed
+            and its duration was guessed from its size.
+        duration: The duration in seconds.
+        calls: Number of model calls, more than one for segmented videos.
+        input_tokens: Estimated prompt and media tokens of all calls.
+        output_tokens: Estimated response tokens of all calls.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        media_info: Optional[MediaInfo],
+        duration: float,
+        calls: int,
+        input_tokens: int,
+        output_tokens: int,
+    ) -> None:
+        """Initiate the estimate."""
+        self.path = path
+        self.media_info = media_info
+        self.duration = duration
+        self.calls = calls
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+
+    @property
+    def total_tokens(self) -> int:
+        """The input and output tokens together."""
+        return self.input_tokens + self.output_tokens
+
+
+class TokenEstimator:
+    """Estimates the tokens of a video from its probed duration and audio."""
+
+    def __init__(
+        self,
+        prompt_tokens: int,
+        rule_count: int,
+        segment_seconds: float = 0,
+        overlap_seconds: float = 0,
+        probe: Optional[Callable[[str], Optional[MediaInfo]]] = None,
+        size: Optional[Callable[[str], int]] = None,
+    ) -> None:
+        """Initiate the estimator.
+        Args:
+            prompt_tokens: The tokens of the prompt sent with every call.
+            rule_count: The number of rules answered in every response.
+            segment_seconds: Length of the segments long videos are split
+                into, 0 if they are not.
+            overlap_seconds: Overlap between consecutive segments.
+            probe: Reads the media info of a video file, ffprobe if not
+                given.
+            size: Reads the size in bytes of a video ffprobe cannot read,
+                the local file size if not given.
+        """
+        self.prompt_tokens = prompt_tokens
+        self.rule_count = rule_count
+        self.segment_seconds = segment_seconds
+        self.overlap_seconds = overlap_seconds
+        self.probe = probe or probe_media
+        self.size = size or _local_size
+
+    def estimate(self, path: str) -> JobEstimate:
+        """Estimates the tokens of analyzing a video.
+        Args:
+            path: The path to the video file, or its URL.
+        Returns:
+            The estimate.
+        """
+        media_info = self.probe(path)
+        if media_info:
+            duration, has_audio = media_info.duration, media_info.has_audio
+        else:
+            duration = self.size(path) / _FALLBACK_BYTES_PER_SECOND
+            has_audio = True
+
+        spans = [(0.0, duration)]
+        if self.segment_seconds and duration > self.segment_seconds:
+            spans = plan_segments(
+                duration, self.segment_seconds, self.overlap_seconds
+            )
+        billed_seconds = sum(end - start for start, end in spans)
+        tokens_per_second = _VIDEO_TOKENS_PER_SECOND + (
+            _AUDIO_TOKENS_PER_SECOND if has_audio else 0
+        )
+        calls = len(spans)
+        return JobEstimate(
+            path,
+            media_info,
+            duration,
+            calls=calls,
+            input_tokens=round(
+                billed_seconds * tokens_per_second + calls * self.prompt_tokens
+            ),
+            output_tokens=calls * self.rule_count * _OUTPUT_TOKENS_PER_RULE,
+        )
+
+
+def shortest_job_first(
+    jobs: Iterable[Job],
+    cost: Callable[[Job], float],
+    lookahead: int,
+    max_skips: int,
+) -> Iterator[Job]:
+    """Reorders jobs so the cheapest of the next few goes first.
+    Jobs are pulled lazily into a window of lookahead jobs. A job passed
+    over max_skips times is dispatched next regardless of its cost, so one
+    long video is delayed but never starved by a stream of short ones.
+    Args:
+        jobs: The jobs in arrival order.
+        cost: The estimated cost of a job.
+        lookahead: How many jobs are considered at once.
+        max_skips: How many times a job can be passed over.
+    Yields:
+        The jobs in dispatch order.
+    """
+    source = iter(jobs)
+    window: List[List[Any]] = []
+    arrival = 0
+
+    def fill() -> None:
+        nonlocal arrival
+        while len(window) < max(1, lookahead):
+            job = next(source, _END)
+            if job is _END:
+                return
+            window.append([cost(job), arrival, 0, job])
+            arrival += 1
+
+    fill()
+    while window:
+        starving = [entry for entry in window if entry[2] >= max_skips]
+        if starving:
+            chosen = min(starving, key=lambda entry: entry[1])
+        else:
+            chosen = min(window, key=lambda entry: (entry[0], entry[1]))
+        window.remove(chosen)
+        for entry in window:
+            entry[2] += 1
+        yield chosen[3]
+        fill()
+
+
+def summarize_estimates(
+    estimates: List[JobEstimate],
+    tokens_per_minute: float = 0,
+    input_price_per_million: float = 0,
+    output_price_per_million: float = 0,
+) -> Dict[str, Any]:
+    """Summarizes the estimates of a run before running it.
+    Args:
+        estimates: The estimate of every video.
+        tokens_per_minute: The token quota, 0 if unknown.
+        input_price_per_million: Price of a million input tokens, 0 if
+            unknown.
+        output_price_per_million: Price of a million output tokens, 0 if
+            unknown.
+    Returns:
+        The totals, with the cost and the minutes the token quota allows
+        when they are known.
+    """
+    input_tokens = sum(estimate.input_tokens for estimate in estimates)
+    output_tokens = sum(estimate.output_tokens for estimate in estimates)
+    summary = {
+        'videos': len(estimates),
+        'unprobed_videos': sum(not e.media_info for e in estimates),
+        'video_seconds': round(sum(e.duration for e in estimates), 1),
+        'model_calls': sum(estimate.calls for estimate in estimates),
+        'input_tokens': input_tokens,
+        'output_tokens': output_tokens,
+    }
+    if input_price_per_million or output_price_per_million:
+        summary['estimated_cost'] = round(
+            input_tokens / 1e6 * input_price_per_million
+            + output_tokens / 1e6 * output_price_per_million,
+            4,
+        )
+    if tokens_per_minute:
+        summary['minimum_minutes'] = round(
+            (input_tokens + output_tokens) / tokens_per_minute, 1
+        )
+    return summary
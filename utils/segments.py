@@ -0,0 +1,218 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for analyzing long videos in time segments."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import contextvars
+import json
+import re
+from concurrent.futures import Executor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_TIMESTAMP_PATTERN = re.compile(
+    r'\b(?:(\d+):)?(\d{1,2}):(\d{2}(?:\.\d+)?)\b|\b(\d+(?:\.\d+)?)s\b'
+)
+
+
+def plan_segments(
+    duration: float, segment_seconds: float, overlap_seconds: float
+) -> List[Tuple[float, float]]:
+    """Splits a video duration into overlapping time windows.
+    Args:
+        duration: The duration of the video in seconds.
+        segment_seconds: The length of each window.
+        overlap_seconds: How much consecutive windows overlap.
+    Returns:
+        The (start, end) seconds of each window, covering the whole video.
+    Raises:
+        ValueError: If the overlap is not shorter than the windows, so the
+            windows would not advance.
+    """
+    if overlap_seconds >= segment_seconds:
+        raise ValueError(
+            f'Segment overlap {overlap_seconds}s must be shorter than the '
+            f'{segment_seconds}s segments'
+        )
+    step = segment_seconds - overlap_seconds
+    segments = []
+    start = 0.0
+    while True:
+        end = min(start + segment_seconds, duration)
+        segments.append((start, end))
+        if end >= duration:
+            return segments
+        start += step
+
+
+def parse_timestamp(text: str) -> Optional[float]:
+    """Parses the first timestamp of a violation_time value.
+    Args:
+        text: A value such as '1:05', '00:01:05-00:01:10' or '65s'.
+    Returns:
+        The timestamp in seconds, or None if the text has no timestamp.
+    """
+    match = _TIMESTAMP_PATTERN.search(text or '')
+    return _match_seconds(match) if match else None
+
+
+def format_timestamp(seconds: float) -> str:
+    """Formats seconds as MM:SS, or HH:MM:SS past the hour.
+    Args:
+        seconds: The timestamp in seconds.
+    Returns:
+        The formatted timestamp.
+    """
+    minutes, secs = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f'{hours:02d}:{minutes:02d}:{secs:02d}'
+    return f'{minutes:02d}:{secs:02d}'
+
+
+def offset_violation_time(text: str, offset: float) -> str:
+    """Shifts every timestamp in a violation_time value by an offset.
+    Args:
+        text: The violation_time reported for a segment.
+        offset: The start of the segment in seconds.
+    Returns:
+        The violation_time with absolute timestamps.
+    """
+    if not text or not offset:
+        return text
+    return _TIMESTAMP_PATTERN.sub(
+        lambda match: format_timestamp(_match_seconds(match) + offset), text
+    )
+
+
+def _match_seconds(match: re.Match) -> float:
+    """Converts a timestamp pattern match to seconds."""
+    hours, minutes, seconds, plain_seconds = match.groups()
+    if plain_seconds is not None:
+        return float(plain_seconds)
+    return int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def merge_segment_results(
+    segment_results: List[Tuple[float, Dict[str, Any]]],
+    dedupe_seconds: float,
+) -> Dict[str, Any]:
+    """Merges the per segment results of a video into one result.
+    A rule is violated if any segment violates it and keeps the highest
+    severity. Findings reported by two overlapping segments for the same
+    moment are kept once, with the higher of their scores.
+    Args:
+        segment_results: The (segment start, parsed result) of each segment.
+        dedupe_seconds: Findings of a rule closer than this are duplicates.
+    Returns:
+        The merged result, in the same format as a single model response.
+    """
+    findings_by_rule = {}
+    for offset, result in segment_results:
+        for segment_rule in result.get('rules', []):
+            rule = dict(segment_rule)
+            rule['violation_time'] = offset_violation_time(
+                rule.get('violation_time', ''), offset
+            )
+            findings_by_rule.setdefault(rule['rule_index'], []).append(rule)
+
+    merged_rules = []
+    for rule_index in sorted(findings_by_rule):
+        findings = findings_by_rule[rule_index]
+        violations = [f for f in findings if f.get('rule_violation')]
+        if not violations:
+            merged_rules.append(findings[0])
+            continue
+        violations.sort(
+            key=lambda f: parse_timestamp(f['violation_time']) or 0.0
+        )
+        kept, last_time = [], None
+        for finding in violations:
+            time = parse_timestamp(finding['violation_time'])
+            if (
+                kept
+                and time is not None
+                and last_time is not None
+                and time - last_time <= dedupe_seconds
+            ):
+                if finding['violation_score'] > kept[-1]['violation_score']:
+                    kept[-1] = finding
+                continue
+            kept.append(finding)
+            last_time = time
+        merged_rules.append(
+            {
+                'rule_index': rule_index,
+                'rule_violation': True,
+                'violation_score': max(f['violation_score'] for f in kept),
+                'violation_reason': ' | '.join(
+                    f['violation_reason'] for f in kept
+                ),
+                'violation_time': ', '.join(
+                    f['violation_time'] for f in kept if f['violation_time']
+                ),
+            }
+        )
+
+    assessments = [
+        result['overall_compliance_assessment']
+        for _, result in segment_results
+        if result.get('overall_compliance_assessment') is not None
+    ]
+    return {
+        'overall_compliance_assessment': min(assessments, default=None),
+        'rules': merged_rules,
+    }
+
+
+def analyze_segmented(
+    analyze_segment: Callable[[float, float], str],
+    duration: float,
+    segment_seconds: float,
+    overlap_seconds: float,
+    executor: Executor,
+    parse: Callable[[str], Dict[str, Any]] = json.loads,
+) -> str:
+    """Analyzes the segments of a video in parallel and merges them.
+    Args:
+        analyze_segment: Calls the model for the (start, end) of a segment.
+        duration: The duration of the video in seconds.
+        segment_seconds: The length of each segment.
+        overlap_seconds: How much consecutive segments overlap.
+        executor: The executor the segment calls run on.
+        parse: Parses the response text of a segment.
+    Returns:
+        The merged result as JSON text, like a single model response.
+    """
+    segments = plan_segments(duration, segment_seconds, overlap_seconds)
+    futures = [
+        (
+            start,
+            executor.submit(
+                contextvars.copy_context().run, analyze_segment, start, end
+            ),
+        )
+        for start, end in segments
+    ]
+    # Every segment call ends before returning, even when one failed, so
+    # the caller can release what the calls share.
+    wait([future for _, future in futures])
+    segment_results = []
+    for start, future in futures:
+        result_text = future.result()
+        if result_text:
+            segment_results.append((start, parse(result_text)))
+    return json.dumps(
+        merge_segment_results(segment_results, dedupe_seconds=overlap_seconds)
+    )
@@ -15,113 +15,377 @@
 """Module responsible for interacting with Google Sheets."""
 # pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, g-importing-member, broad-exception-caught
 
-from datetime import datetime
+from __future__ import annotations
 
-import gspread
-import pandas as pd
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
 
+from utils import lazy
 from utils import logging as log
+from utils.concurrency import is_overload_error
 from utils.config import Config
+from utils.rate_limiter import RateLimiter
+
+gspread = lazy.LazyModule('gspread')
+pd = lazy.LazyModule('pandas')
+
+_RETRY_BACKOFF_SECONDS = 2.0
+_DEFAULT_SHEET_ID = 0
+_HEADER_FORMAT = {
+    'textFormat': {'bold': True},
+    'backgroundColor': {'red': 0.8, 'green': 0.9, 'blue': 1.0},
+}
+_VIOLATION_COLOR = {'red': 1.0, 'green': 0.8, 'blue': 0.8}
+_VIDEO_BORDER = {
+    'style': 'SOLID',
+    'width': 2,
+    'color': {'red': 0, 'green': 0, 'blue': 0},
+}
 
 
-class GoogleSheetsHandler:
-    """Class for handeling Google Sheets."""
+def summarize_by_video(df: pd.DataFrame) -> pd.DataFrame:
+    """Summarizes the per rule results of each video.
+    Args:
+        df: The flattened per rule results.
+    Returns:
+        One row per video with its rule, violation and score counts.
+    """
+    return (
+        df.assign(
+            violated_score=df['violation_score'].where(df['rule_violation'])
+        )
+        .groupby(['video_key', 'video_uri'], sort=True)
+        .agg(
+            overall_compliance_assessment=(
+                'overall_compliance_assessment',
+                'first',
+            ),
+            rules=('rule_index', 'count'),
+            violations=('rule_violation', 'sum'),
+            max_violation_score=('violated_score', 'max'),
+        )
+        .reset_index()
+    )
 
-    def __init__(self, config: Config):
-        """Inititate the handler.
+
+def summarize_by_rule(df: pd.DataFrame) -> pd.DataFrame:
+    """Summarizes the results of each rule across videos.
+    Args:
+        df: The flattened per rule results.
+    Returns:
+        One row per rule with its violation count, rate and scores.
+    """
+    summary = (
+        df.assign(
+            violated_score=df['violation_score'].where(df['rule_violation'])
+        )
+        .groupby('rule_index', sort=True)
+        .agg(
+            videos=('video_key', 'nunique'),
+            violations=('rule_violation', 'sum'),
+            violation_rate=('rule_violation', 'mean'),
+            mean_violation_score=('violated_score', 'mean'),
+            max_violation_score=('violated_score', 'max'),
+        )
+        .reset_index()
+    )
+    return summary.round({'violation_rate': 3, 'mean_violation_score': 2})
+
+
+def _to_values(df: pd.DataFrame) -> List[List[Any]]:
+    """Converts a DataFrame to sheet values, with a header row."""
+    values = df.astype(object).where(df.notna(), '').values.tolist()
+    return [df.columns.tolist()] + values
+
+
+class SheetsRunWriter:
+    """Writes each run to its own worksheets of one reused spreadsheet.
+    Write requests are throttled to the per-minute Sheets quota and retried
+    with backoff when the quota is exceeded anyway. A run takes a fixed
+    number of requests: one to add the worksheets, one for all values and
+    one for all formatting, whatever the number of rows.
+    """
+
+    def __init__(
+        self, config: Config, rate_limiter: Optional[RateLimiter] = None
+    ) -> None:
+        """Inititate the writer.
         Args:
             config: The Config object containing configuration parameters.
+            rate_limiter: Optional limiter shared with other writers, one
+                for the configured per-minute quota if not given.
         """
         self.gc = gspread.Client(config.credentials)
+        self.spreadsheet_id = config.spreadsheet_id
+        self.max_retries = config.sheets_max_retries
+        self.rate_limiter = rate_limiter or RateLimiter(
+            config.sheets_requests_per_minute
+        )
+        self._stream = None
+        self._stream_lock = threading.Lock()
+        self._delete_default_sheet = False
+
+    def _call(self, function: Callable[..., Any], *args: Any) -> Any:
+        """Calls the Sheets API under the quota, retrying on quota errors.
+        Args:
+            function: The gspread call.
+            *args: The arguments of the call.
+        Returns:
+            The result of the call.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return function(*args)
+            except Exception as e:
+                if attempt == self.max_retries or not is_overload_error(e):
+                    raise
+                self.rate_limiter.drain()
+                delay = (
+                    _RETRY_BACKOFF_SECONDS * 2**attempt * (1 + random.random())
+                )
+                log.logger.warning(
+                    f'Sheets quota exceeded, retrying in {delay:.1f}s'
+                )
+                time.sleep(delay)
+        return None
 
-    def create_spreadsheet(
-        self, spreadsheet_name_prefix: str = 'Video Ads Compass Output'
+    def open_spreadsheet(
+        self, spreadsheet_name: str = 'Video Ads Compass Output'
     ) -> gspread.Spreadsheet:
-        """Creates a new Google Sheet.
+        """Opens the configured spreadsheet, creating it on the first run.
         Args:
-            spreadsheet_name_prefix: The prefix for the spreadsheet name.
+            spreadsheet_name: The name of a newly created spreadsheet.
         Returns:
-            The created spreadsheet.
+            The spreadsheet.
         """
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        spreadsheet_name = f'{spreadsheet_name_prefix} {timestamp}'
-        try:
-            return self.gc.create(spreadsheet_name)
-        except Exception as e:
-            log.logging.error(f'Error creating spreadsheet: {e}')
-
-    def upload_dataframe(
-        self, spreadsheet: gspread.Spreadsheet, dataframe: pd.DataFrame
-    ) -> None:
-        """Uploads a Pandas DataFrame to a Google Sheet.
+        if self.spreadsheet_id:
+            return self._call(self.gc.open_by_key, self.spreadsheet_id)
+        spreadsheet = self._call(self.gc.create, spreadsheet_name)
+        self.spreadsheet_id = spreadsheet.id
+        self._delete_default_sheet = True
+        log.logger.info(
+            f'Created spreadsheet {spreadsheet.id}, set spreadsheet_id in '
+            'the config to add the next runs to it'
+        )
+        return spreadsheet
+
+    def write_run(
+        self, df: pd.DataFrame, run_name: Optional[str] = None
+    ) -> str:
+        """Writes the results of a run and their summaries.
         Args:
-            spreadsheet: The Google Sheet to upload the DataFrame to.
-            dataframe: The Pandas DataFrame to upload.
+            df: The flattened per rule results.
+            run_name: The prefix of the run worksheets, the time if not given.
+        Returns:
+            The URL of the spreadsheet.
         """
-        try:
-            worksheet = spreadsheet.sheet1
-            worksheet.update(
-                [dataframe.columns.values.tolist()] + dataframe.values.tolist()
-            )
-        except Exception as e:
-            log.logging.error(f'Error uploading dataframe to spreadsheet: {e}')
+        run_name = run_name or datetime.now().strftime('%Y%m%d_%H%M%S')
+        tables = {
+            f'{run_name} results': df,
+            f'{run_name} by video': summarize_by_video(df),
+            f'{run_name} by rule': summarize_by_rule(df),
+        }
+        spreadsheet = self.open_spreadsheet()
+        sheet_ids = self._add_worksheets(spreadsheet, tables)
 
-    def format_spreadsheet(self, spreadsheet: gspread.Spreadsheet) -> str:
-        """Formats the Google Sheet according to the provided instructions.
+        format_requests = [
+            request
+            for sheet_id, table in zip(sheet_ids, tables.values())
+            for request in self._header_requests(sheet_id, table)
+        ]
+        format_requests += self._results_requests(sheet_ids[0], df)
+        self._call(spreadsheet.batch_update, {'requests': format_requests})
+        return spreadsheet.url
+
+    def _add_worksheets(
+        self,
+        spreadsheet: gspread.Spreadsheet,
+        tables: Dict[str, pd.DataFrame],
+    ) -> List[int]:
+        """Adds a worksheet per table and writes the tables in two requests.
+        The empty default worksheet of a newly created spreadsheet is
+        deleted along with the first worksheets added.
         Args:
-            spreadsheet: The Google Sheet to format.
+            spreadsheet: The spreadsheet.
+            tables: The tables by worksheet title.
         Returns:
-            The URL of the formatted spreadsheet.
+            The ids of the added worksheets.
         """
-        worksheet = spreadsheet.sheet1
+        requests = [
+            {
+                'addSheet': {
+                    'properties': {
+                        'title': title,
+                        'gridProperties': {
+                            'rowCount': len(table) + 1,
+                            'columnCount': len(table.columns),
+                            'frozenRowCount': 1,
+                        },
+                    }
+                }
+            }
+            for title, table in tables.items()
+        ]
+        if self._delete_default_sheet:
+            requests.append({'deleteSheet': {'sheetId': _DEFAULT_SHEET_ID}})
+        response = self._call(spreadsheet.batch_update, {'requests': requests})
+        self._delete_default_sheet = False
+        sheet_ids = [
+            reply['addSheet']['properties']['sheetId']
+            for reply in response['replies']
+            if 'addSheet' in reply
+        ]
 
-        worksheet.format(
-            'A1:I1',
+        self._call(
+            spreadsheet.values_batch_update,
             {
-                'textFormat': {
-                    'bold': True,
-                },
-                'backgroundColor': {
-                    'red': 0.8,
-                    'green': 0.9,
-                    'blue': 1.0,
-                },
+                'valueInputOption': 'USER_ENTERED',
+                'data': [
+                    {'range': f"'{title}'!A1", 'values': _to_values(table)}
+                    for title, table in tables.items()
+                ],
             },
         )
+        return sheet_ids
 
-        df = pd.DataFrame(worksheet.get_all_records())
-        for index, row in df.iterrows():
-            if row.get('rule_violation') == 'TRUE':
-                worksheet.format(
-                    f'A{index+2}:I{index+2}',
+    def write_table(self, df: pd.DataFrame, title: str) -> str:
+        """Writes a table to its own worksheet with a formatted header.
+        Args:
+            df: The table.
+            title: The title of the worksheet.
+        Returns:
+            The URL of the spreadsheet.
+        """
+        spreadsheet = self.open_spreadsheet()
+        (sheet_id,) = self._add_worksheets(spreadsheet, {title: df})
+        self._call(
+            spreadsheet.batch_update,
+            {'requests': self._header_requests(sheet_id, df)},
+        )
+        return spreadsheet.url
+
+    def append_results(
+        self, df: pd.DataFrame, run_name: Optional[str] = None
+    ) -> str:
+        """Appends results to the worksheet of a streaming run.
+        The worksheet is added and formatted by the first call, each later
+        call takes a single append request. Safe to call from several
+        threads.
+        Args:
+            df: The flattened per rule results of one or more videos.
+            run_name: The prefix of the run worksheet, the time if not given.
+        Returns:
+            The URL of the spreadsheet.
+        """
+        with self._stream_lock:
+            if self._stream is None:
+                run_name = run_name or datetime.now().strftime('%Y%m%d_%H%M%S')
+                title = f'{run_name} results'
+                spreadsheet = self.open_spreadsheet()
+                header = df.iloc[:0]
+                (sheet_id,) = self._add_worksheets(spreadsheet, {title: header})
+                self._call(
+                    spreadsheet.batch_update,
                     {
-                        'backgroundColor': {
-                            'red': 1.0,
-                            'green': 0.8,
-                            'blue': 0.8,
-                        },
+                        'requests': self._header_requests(sheet_id, header)
+                        + self._results_requests(sheet_id, header)
                     },
                 )
+                self._stream = (spreadsheet, title)
+            spreadsheet, title = self._stream
+            self._call(
+                spreadsheet.values_append,
+                f"'{title}'!A1",
+                {
+                    'valueInputOption': 'USER_ENTERED',
+                    'insertDataOption': 'INSERT_ROWS',
+                },
+                {'values': _to_values(df)[1:]},
+            )
+        return spreadsheet.url
 
-        current_video_key = None
-        for index, row in df.iterrows():
-            if row.get('video_key') != current_video_key:
-                worksheet.format(
-                    f'A{index+2}:I{index+2}',
-                    {
-                        'borders': {
-                            'top': {
-                                'style': 'SOLID',
-                                'width': 2,
-                                'color': {
-                                    'red': 0,
-                                    'green': 0,
-                                    'blue': 0,
-                                },
-                            },
-                        }
+    @staticmethod
+    def _header_requests(
+        sheet_id: int, table: pd.DataFrame
+    ) -> List[Dict[str, Any]]:
+        """Builds the requests formatting the header row of a table."""
+        return [
+            {
+                'repeatCell': {
+                    'range': {
+                        'sheetId': sheet_id,
+                        'startRowIndex': 0,
+                        'endRowIndex': 1,
+                        'startColumnIndex': 0,
+                        'endColumnIndex': len(table.columns),
                     },
-                )
-                current_video_key = row.get('video_key')
+                    'cell': {'userEnteredFormat': _HEADER_FORMAT},
+                    'fields': 'userEnteredFormat(textFormat,backgroundColor)',
+                }
+            }
+        ]
 
-        return spreadsheet.url
+    @staticmethod
+    def _results_requests(
+        sheet_id: int, df: pd.DataFrame
+    ) -> List[Dict[str, Any]]:
+        """Builds the requests highlighting violations and video groups.
+        Violations are highlighted by one conditional format rule instead of
+        a request per row.
+        """
+        columns = len(df.columns)
+        violation_cell = gspread.utils.rowcol_to_a1(
+            2, df.columns.get_loc('rule_violation') + 1
+        )
+        requests = [
+            {
+                'addConditionalFormatRule': {
+                    'rule': {
+                        'ranges': [
+                            {
+                                'sheetId': sheet_id,
+                                'startRowIndex': 1,
+                                'startColumnIndex': 0,
+                                'endColumnIndex': columns,
+                            }
+                        ],
+                        'booleanRule': {
+                            'condition': {
+                                'type': 'CUSTOM_FORMULA',
+                                'values': [
+                                    {
+                                        'userEnteredValue': (
+                                            f'=${violation_cell}=TRUE'
+                                        )
+                                    }
+                                ],
+                            },
+                            'format': {'backgroundColor': _VIOLATION_COLOR},
+                        },
+                    },
+                    'index': 0,
+                }
+            }
+        ]
+        video_keys = df['video_key']
+        starts_video = video_keys.ne(video_keys.shift()).tolist()
+        for position in (i for i, starts in enumerate(starts_video) if starts):
+            requests.append(
+                {
+                    'updateBorders': {
+                        'range': {
+                            'sheetId': sheet_id,
+                            'startRowIndex': position + 1,
+                            'endRowIndex': position + 2,
+                            'startColumnIndex': 0,
+                            'endColumnIndex': columns,
+                        },
+                        'top': _VIDEO_BORDER,
+                    }
+                }
+            )
+        return requests
@@ -0,0 +1,283 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for sharing one process between several tenants."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import heapq
+import itertools
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+from utils import lazy
+from utils.clients import ClientPool
+from utils.concurrency import AdaptiveConcurrencyController
+from utils.config import Config
+from utils.memory_budget import MemoryBudget
+from utils.rate_limiter import RateLimiter
+
+smart_open = lazy.LazyModule('smart_open')
+yaml = lazy.LazyModule('yaml')
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """Loads the tenants of a manifest file.
+    The manifest holds a 'tenants' list, each tenant being the config
+    values that differ from config.yaml, e.g. its bucket_name, rules_path,
+    model and spreadsheet_id, plus a unique tenant_name and an optional
+    tenant_weight.
+    Args:
+        path: The local or gs:// path of the YAML manifest.
+    Returns:
+        The config overrides of each tenant.
+    Raises:
+        ValueError: If a tenant has no name, a duplicate name, a weight
+            that is not positive or the drive_state_path of another tenant.
+    """
+    with smart_open.open(path, 'rb') as manifest_file:
+        manifest = yaml.load(manifest_file, Loader=yaml.SafeLoader) or {}
+    tenants = manifest.get('tenants') or []
+    names = [tenant.get('tenant_name') for tenant in tenants]
+    if not all(names) or len(set(names)) != len(names):
+        raise ValueError(f'Tenants need unique tenant_name values: {names}')
+    for tenant in tenants:
+        if float(tenant.get('tenant_weight') or 1) <= 0:
+            raise ValueError(f'Tenant weights must be positive: {tenant}')
+    state_paths = [
+        tenant['drive_state_path']
+        for tenant in tenants
+        if tenant.get('drive_state_path')
+    ]
+    if len(set(state_paths)) != len(state_paths):
+        raise ValueError(
+            f'Tenants need their own drive_state_path values: {state_paths}'
+        )
+    return tenants
+
+
+def tenant_path(path: str, tenant: str) -> str:
+    """Namespaces a file path shared by default, such as the Drive state.
+    Args:
+        path: The path of the base config.
+        tenant: The tenant name.
+    Returns:
+        The path with the tenant name before its extension.
+    """
+    root, extension = os.path.splitext(path)
+    return f'{root}.{tenant}{extension}'
+
+
+class FairScheduler:
+    """Shares a number of slots between tenants by weighted fair queuing.
+    Each request is tagged with a virtual finish time, the later of the
+    scheduler's virtual time and the tenant's previous tag, plus its cost
+    divided by the tenant's weight. Free slots go to the waiting request
+    with the earliest tag, so tenants get slots in proportion to their
+    weights and an idle tenant does not bank credit while away.
+    """
+
+    def __init__(self, slots: int) -> None:
+        """Initiate the scheduler.
+        Args:
+            slots: The number of slots, e.g. the videos analyzed at once.
+        """
+        self.slots = slots
+        self._in_use = 0
+        self._virtual_time = 0.0
+        self._finish_tags: Dict[str, float] = {}
+        self._waiting: List[List[Any]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def acquire(self, tenant: str, weight: float = 1, cost: float = 1) -> float:
+        """Waits for a slot and takes it.
+        Args:
+            tenant: The tenant taking the slot.
+            weight: The share of the tenant relative to the others.
+            cost: The cost of the work the slot is taken for.
+        Returns:
+            The seconds spent waiting.
+        """
+        started = time.monotonic()
+        with self._lock:
+            tag = (
+                max(self._virtual_time, self._finish_tags.get(tenant, 0.0))
+                + cost / weight
+            )
+            self._finish_tags[tenant] = tag
+            if self._in_use < self.slots and not self._waiting:
+                self._in_use += 1
+                self._virtual_time = tag
+                return 0.0
+            granted = threading.Event()
+            heapq.heappush(self._waiting, [tag, next(self._sequence), granted])
+        granted.wait()
+        return time.monotonic() - started
+
+    def release(self) -> None:
+        """Frees a slot, handing it to the earliest tagged waiting request."""
+        with self._lock:
+            if self._waiting:
+                tag, _, granted = heapq.heappop(self._waiting)
+                self._virtual_time = tag
+                granted.set()
+            else:
+                self._in_use -= 1
+
+
+class TenantShare:
+    """The slots of a fair scheduler as seen by one tenant."""
+
+    def __init__(
+        self, scheduler: FairScheduler, tenant: str, weight: float
+    ) -> None:
+        """Initiate the share.
+        Args:
+            scheduler: The scheduler shared by the tenants.
+            tenant: The tenant name.
+            weight: The share of the tenant relative to the others.
+        """
+        self.scheduler = scheduler
+        self.tenant = tenant
+        self.weight = weight
+
+    def acquire(self, cost: float = 1) -> float:
+        """Waits for a slot of the tenant, see FairScheduler.acquire."""
+        return self.scheduler.acquire(self.tenant, self.weight, cost)
+
+    def release(self) -> None:
+        """Frees a slot of the tenant."""
+        self.scheduler.release()
+
+
+class TenantMetrics:
+    """Counters of the work done for one tenant.
+    Attributes:
+        videos: Number of videos analyzed.
+        failed_videos: Number of videos without results.
+        verdicts: Number of per rule verdicts.
+        estimated_tokens: Estimated model tokens of the analyzed videos.
+        queue_seconds: Total time videos waited for a slot.
+        run_seconds: Wall time of the tenant's run.
+        error: Why the tenant's run failed, empty if it did not.
+    """
+
+    def __init__(self) -> None:
+        """Initiate the counters at zero."""
+        self.videos = 0
+        self.failed_videos = 0
+        self.verdicts = 0
+        self.estimated_tokens = 0
+        self.queue_seconds = 0.0
+        self.run_seconds = 0.0
+        self.error = ''
+        self._lock = threading.Lock()
+
+    def record_dispatch(self, queue_seconds: float, tokens: int) -> None:
+        """Records a video taking a slot.
+        Args:
+            queue_seconds: The time the video waited for its slot.
+            tokens: The estimated tokens of the video, 0 if not estimated.
+        """
+        with self._lock:
+            self.queue_seconds += queue_seconds
+            self.estimated_tokens += tokens
+
+    def record_video(self, verdicts: int) -> None:
+        """Records an analyzed video.
+        Args:
+            verdicts: The number of per rule verdicts of the video.
+        """
+        with self._lock:
+            self.videos += 1
+            self.failed_videos += not verdicts
+            self.verdicts += verdicts
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The counters, for logging."""
+        with self._lock:
+            return {
+                'videos': self.videos,
+                'failed_videos': self.failed_videos,
+                'verdicts': self.verdicts,
+                'estimated_tokens': self.estimated_tokens,
+                'queue_seconds': round(self.queue_seconds, 1),
+                'run_seconds': round(self.run_seconds, 1),
+                'error': self.error,
+            }
+
+
+class SharedResources:
+    """Clients, quotas and slots shared by the runs of one process.
+    A single run creates its own. Runs of several tenants share one, so
+    they draw on one model quota and one memory budget, and get slots by
+    weighted fair queuing.
+    Attributes:
+        clients: The pool of API clients.
+        scheduler: The scheduler of the video analysis slots.
+        token_limiter: The model token quota videos are admitted under.
+        memory_budget: The budget of video bytes held in memory at once.
+        controller: The adaptive limit of concurrent model calls.
+    """
+
+    def __init__(self, config: Config) -> None:
+        """Initiate the shared resources.
+        Args:
+            config: The Config object whose limits are shared.
+        """
+        self.clients = ClientPool()
+        self.scheduler = FairScheduler(config.max_concurrency)
+        self.token_limiter = RateLimiter(config.tokens_per_minute)
+        self.memory_budget = MemoryBudget(config.memory_budget_bytes)
+        self.controller = AdaptiveConcurrencyController(
+            initial_limit=config.initial_concurrency,
+            max_limit=config.max_concurrency,
+            latency_target=config.latency_target_seconds,
+        )
+        self._metrics: Dict[str, TenantMetrics] = {}
+        self._lock = threading.Lock()
+
+    def share(self, config: Config) -> TenantShare:
+        """Gets the slots of the config's tenant.
+        Args:
+            config: The Config object of the tenant.
+        Returns:
+            The tenant's share of the scheduler.
+        """
+        return TenantShare(
+            self.scheduler, config.tenant_name, config.tenant_weight
+        )
+
+    def metrics(self, tenant: str) -> TenantMetrics:
+        """Gets the metrics of a tenant.
+        Args:
+            tenant: The tenant name.
+        Returns:
+            The tenant's metrics.
+        """
+        with self._lock:
+            return self._metrics.setdefault(tenant, TenantMetrics())
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Collects the metrics of every tenant.
+        Returns:
+            The metrics by tenant name.
+        """
+        with self._lock:
+            return {
+                tenant: metrics.as_dict()
+                for tenant, metrics in sorted(self._metrics.items())
+            }
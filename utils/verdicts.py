@@ -0,0 +1,160 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for storing per video, per rule verdicts."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import logging as log
+from utils.response_parser import compliance_percentage
+from utils.rules import Rule
+
+_FINGERPRINT_CHUNK_BYTES = 1024 * 1024
+
+
+def video_fingerprint(video_path: str) -> str:
+    """Identifies the content of a video without hashing all of it.
+    The size and the first and last megabyte are hashed, so the fingerprint
+    survives the video being evicted from the cache and downloaded again.
+    Args:
+        video_path: The path to the video file.
+    Returns:
+        The hex digest identifying the video.
+    """
+    size = os.path.getsize(video_path)
+    digest = hashlib.sha256(str(size).encode('utf-8'))
+    with open(video_path, 'rb') as video_file:
+        digest.update(video_file.read(_FINGERPRINT_CHUNK_BYTES))
+        if size > _FINGERPRINT_CHUNK_BYTES:
+            video_file.seek(
+                max(_FINGERPRINT_CHUNK_BYTES, size - _FINGERPRINT_CHUNK_BYTES)
+            )
+            digest.update(video_file.read())
+    return digest.hexdigest()
+
+
+class VerdictStore:
+    """SQLite store of model verdicts keyed by video, model and rule hash."""
+
+    def __init__(self, path: str, model: str) -> None:
+        """Initiate the store, creating the database if needed.
+        Args:
+            path: The path to the SQLite database file.
+            model: The model name, verdicts of other models are not reused.
+        """
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS verdicts ('
+                'video TEXT NOT NULL, model TEXT NOT NULL, '
+                'rule_hash TEXT NOT NULL, verdict TEXT NOT NULL, '
+                'PRIMARY KEY (video, model, rule_hash))'
+            )
+
+    def get(
+        self, video: str, rule_hashes: List[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Reads the stored verdicts of a video.
+        Args:
+            video: The fingerprint of the video.
+            rule_hashes: The hashes of the rules to look up.
+        Returns:
+            The stored verdicts by rule hash, missing rules are left out.
+        """
+        if not rule_hashes:
+            return {}
+        placeholders = ', '.join('?' * len(rule_hashes))
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT rule_hash, verdict FROM verdicts WHERE video = ? '
+                f'AND model = ? AND rule_hash IN ({placeholders})',
+                (video, self.model, *rule_hashes),
+            ).fetchall()
+        return {rule_hash: json.loads(verdict) for rule_hash, verdict in rows}
+
+    def put(self, video: str, verdicts: Dict[str, Dict[str, Any]]) -> None:
+        """Stores verdicts of a video, replacing older ones.
+        Args:
+            video: The fingerprint of the video.
+            verdicts: The verdicts by rule hash.
+        """
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)',
+                [
+                    (video, self.model, rule_hash, json.dumps(verdict))
+                    for rule_hash, verdict in verdicts.items()
+                ],
+            )
+
+    def close(self) -> None:
+        """Closes the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def evaluate(
+        self,
+        video: str,
+        rules: List[Rule],
+        analyze: Callable[[Optional[List[Rule]]], Optional[Dict[str, Any]]],
+    ) -> Optional[Dict[str, Any]]:
+        """Evaluates a video, sending the model only rules without a verdict.
+        Args:
+            video: The fingerprint of the video.
+            rules: The current rules.
+            analyze: Calls the model for a rules subset, or for the whole
+                rules file when given None, and returns the parsed response.
+        Returns:
+            The response covering every rule, None if the model call failed.
+            When stored verdicts were reused, the overall compliance is the
+            share of rules not violated, as the model only saw a subset.
+        """
+        cached = self.get(video, [rule.hash for rule in rules])
+        pending = [rule for rule in rules if rule.hash not in cached]
+        log.logger.info(
+            f'Reusing {len(cached)} verdicts, evaluating {len(pending)} rules'
+        )
+        fresh = {}
+        if pending:
+            result = analyze(pending if cached else None)
+            if not result:
+                return None
+            # Ids are matched as text, as non numeric rule ids stay strings.
+            rules_by_index = {str(rule.index): rule for rule in pending}
+            for verdict in result['rules']:
+                rule = rules_by_index.get(str(verdict.get('rule_index')))
+                if rule:
+                    fresh[rule.hash] = verdict
+            self.put(video, fresh)
+            if not cached:
+                return result
+
+        verdicts = []
+        for rule in rules:
+            verdict = fresh.get(rule.hash) or cached.get(rule.hash)
+            if verdict:
+                verdicts.append({**verdict, 'rule_index': rule.index})
+        return {
+            'overall_compliance_assessment': compliance_percentage(verdicts),
+            'rules': verdicts,
+        }
@@ -15,147 +15,338 @@
 """Module responsible for interacting with Vertex AI API."""
 # pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
 
-from typing import Any, Dict
+from __future__ import annotations
 
-from google import genai
-from google.genai import types
+import contextlib
+import copy
+import functools
+import os
+import time
+from typing import Any, Dict, Iterator, List, Optional
 
+from utils import lazy
+from utils import logging as log
+from utils.clients import ClientPool
 from utils.config import Config
+from utils.prompt import PromptBuilder
+from utils.rules import Rule, load_rules
+
+genai = lazy.LazyModule('google.genai')
+types = lazy.LazyModule('google.genai.types')
+
+_UPLOAD_POLL_SECONDS = 2
+_TRANSCRIPTION_PROMPT = (
+    'Transcribe the speech in this audio track of a video ad verbatim. '
+    'Start each sentence on a new line with its [MM:SS] start time. '
+    'Answer with an empty text if there is no speech.'
+)
+
+_RULE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'rule_index': {'type': 'integer'},
+        'rule_violation': {'type': 'boolean'},
+        'violation_score': {'type': 'integer'},
+        'violation_reason': {'type': 'string'},
+        'violation_time': {'type': 'string'},
+    },
+    'required': [
+        'rule_index',
+        'rule_violation',
+        'violation_score',
+        'violation_reason',
+        'violation_time',
+    ],
+}
+
+RESPONSE_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'overall_compliance_assessment': {'type': 'number'},
+        'rules': {
+            'type': 'array',
+            'items': _RULE_SCHEMA,
+        },
+    },
+    'required': ['overall_compliance_assessment', 'rules'],
+}
+
+
+def _format_offset(seconds: Optional[float]) -> Optional[str]:
+    """Formats a segment offset the way VideoMetadata expects it."""
+    if seconds is None:
+        return None
+    return f'{seconds:.3f}s'
 
 
 class VertexAIHandler:
     """Class for handeling Vertex AI API."""
 
-    def __init__(self, config: Config) -> None:
+    def __init__(
+        self,
+        config: Config,
+        clients: Optional[ClientPool] = None,
+        rules: Optional[List[Rule]] = None,
+    ) -> None:
         """Initiate the Vertex AI API handler.
         Args:
             config: The Config object containing configuration parameters.
+            clients: Optional pool to reuse the GenAI client of.
+            rules: Optional rules already loaded by the caller, the rules
+                file is parsed on first use if not given.
         """
-        self.client = genai.Client(api_key=config.ai_api_key)
+        if clients:
+            self.client = clients.genai(config.ai_api_key)
+        else:
+            self.client = genai.Client(api_key=config.ai_api_key)
         self.model = config.model
+        self.inline_max_bytes = config.inline_max_bytes
+        self.rules_path = config.rules_path
+        self.rules = rules
+        self.request_timeout_seconds = config.request_timeout_seconds
+        self.transcription_model = config.transcription_model
+        self.text_model = config.text_model
         self.response_mime_type = 'application/json'
 
-    def analyze_video(self, video_path: str) -> str:
+    def analyze_video(
+        self,
+        video_path: str,
+        start_offset: Optional[float] = None,
+        end_offset: Optional[float] = None,
+        rules: Optional[List[Rule]] = None,
+    ) -> str:
         """Calls the genai generate content api to analyze video.
         Args:
             video_path: The path to the video file.
+            start_offset: Optional start in seconds of the segment to analyze.
+            end_offset: Optional end in seconds of the segment to analyze.
+            rules: Optional subset of the rules to review, all if not given.
         Returns:
             The GenAI generated content in the form of a string.
         """
+        with self.video_part(video_path) as video_part:
+            return self.analyze_video_part(
+                video_part, start_offset, end_offset, rules
+            )
 
-        video_file_name = video_path
-        video_bytes = open(video_file_name, 'rb').read()
+    @contextlib.contextmanager
+    def video_part(self, video_path: str) -> Iterator[types.Part]:
+        """Builds the video part of a request, inline or uploaded.
+        Uploaded videos are deleted from the Files API when the context exits,
+        so the part can be reused for several segment requests.
+        Args:
+            video_path: The path to the video file.
+        Yields:
+            The video part of the request.
+        """
+        if os.path.getsize(video_path) <= self.inline_max_bytes:
+            with open(video_path, 'rb') as video_file:
+                video_bytes = video_file.read()
+            yield types.Part(
+                inline_data=types.Blob(
+                    data=video_bytes,
+                    mime_type='video/mp4',
+                )
+            )
+            return
+
+        uploaded_file = self._upload_video(video_path)
+        try:
+            yield types.Part.from_uri(
+                file_uri=uploaded_file.uri,
+                mime_type=uploaded_file.mime_type,
+            )
+        finally:
+            self.client.files.delete(name=uploaded_file.name)
+
+    def analyze_video_part(
+        self,
+        video_part: types.Part,
+        start_offset: Optional[float] = None,
+        end_offset: Optional[float] = None,
+        rules: Optional[List[Rule]] = None,
+    ) -> str:
+        """Calls the genai generate content api for a video part.
+        Args:
+            video_part: The video part built by video_part.
+            start_offset: Optional start in seconds of the segment to analyze.
+            end_offset: Optional end in seconds of the segment to analyze.
+            rules: Optional subset of the rules to review, all if not given.
+        Returns:
+            The GenAI generated content in the form of a string.
+        """
+        if start_offset is not None or end_offset is not None:
+            video_part = video_part.model_copy(
+                update={
+                    'video_metadata': types.VideoMetadata(
+                        start_offset=_format_offset(start_offset),
+                        end_offset=_format_offset(end_offset),
+                    )
+                }
+            )
 
         response = self.client.models.generate_content(
             model=self.model,
             contents=types.Content(
                 parts=[
                     types.Part(
-                        text=self.prompt,
+                        text=self.build_prompt(rules),
                     ),
+                    video_part,
+                ]
+            ),
+            config=self._request_config(),
+        )
+
+        if response:
+            return response.text
+        return None
+
+    def transcribe_audio(self, audio_path: str, mime_type: str) -> str:
+        """Transcribes an audio track with the transcription model.
+        Args:
+            audio_path: The path to the audio file.
+            mime_type: The mime type of the audio file.
+        Returns:
+            The transcript, with the start time of each sentence.
+        """
+        with open(audio_path, 'rb') as audio_file:
+            audio_bytes = audio_file.read()
+        response = self.client.models.generate_content(
+            model=self.transcription_model,
+            contents=types.Content(
+                parts=[
+                    types.Part(text=_TRANSCRIPTION_PROMPT),
                     types.Part(
                         inline_data=types.Blob(
-                            data=video_bytes,
-                            mime_type='video/mp4',
+                            data=audio_bytes, mime_type=mime_type
                         )
                     ),
                 ]
             ),
-            config={
-                'response_mime_type': self.response_mime_type,
-                'response_schema': self.response_schema,
-            },
+            config=self._request_config(structured=False),
         )
+        if response and response.text:
+            return response.text
+        return ''
 
+    def analyze_transcript(self, transcript: str, rules: List[Rule]) -> str:
+        """Calls the text model to review rules against a transcript.
+        Args:
+            transcript: The transcript of the audio track of the video.
+            rules: The audio and text rules to review.
+        Returns:
+            The GenAI generated content in the form of a string.
+        """
+        response = self.client.models.generate_content(
+            model=self.text_model,
+            contents=types.Content(
+                parts=[
+                    types.Part(text=self.build_prompt(rules)),
+                    types.Part(
+                        text='The video is not attached. Review the rules '
+                        'against this transcript of its audio track:\n'
+                        f'{transcript or "(no speech)"}'
+                    ),
+                ]
+            ),
+            config=self._request_config(),
+        )
         if response:
             return response.text
         return None
 
+    def _request_config(self, structured: bool = True) -> Dict[str, Any]:
+        """Builds the generate content config with the call deadline.
+        Args:
+            structured: Whether to ask for JSON following response_schema.
+        Returns:
+            The request config.
+        """
+        request_config = {}
+        if structured:
+            request_config['response_mime_type'] = self.response_mime_type
+            request_config['response_schema'] = self.response_schema
+        if self.request_timeout_seconds:
+            request_config['http_options'] = {
+                'timeout': int(self.request_timeout_seconds * 1000)
+            }
+        return request_config
+
+    def _upload_video(self, video_path: str) -> types.File:
+        """Streams a video to the Files API instead of inlining its bytes.
+        Args:
+            video_path: The path to the video file.
+        Returns:
+            The uploaded file, once it is ready to be referenced.
+        Raises:
+            ValueError: If the uploaded video could not be processed.
+        """
+        uploaded_file = self.client.files.upload(
+            file=video_path, config={'mime_type': 'video/mp4'}
+        )
+        while uploaded_file.state == types.FileState.PROCESSING:
+            time.sleep(_UPLOAD_POLL_SECONDS)
+            uploaded_file = self.client.files.get(name=uploaded_file.name)
+        if uploaded_file.state == types.FileState.FAILED:
+            raise ValueError(f'Upload of {video_path} failed to process')
+        return uploaded_file
+
     @property
     def response_schema(self) -> Dict[str, Any]:
         """Generates correct response schema.
         Returns:
             The response schema.
         """
-        rule_schema = {
-            'type': 'object',
-            'properties': {
-                'rule_index': {'type': 'integer'},
-                'rule_violation': {'type': 'boolean'},
-                'violation_score': {'type': 'integer'},
-                'violation_reason': {'type': 'string'},
-                'violation_time': {'type': 'string'},
-            },
-            'required': [
-                'rule_index',
-                'rule_violation',
-                'violation_score',
-                'violation_reason',
-                'violation_time',
-            ],
-        }
-
-        response_schema = {
-            'type': 'object',
-            'properties': {
-                'overall_compliance_assessment': {'type': 'number'},
-                'rules': {
-                    'type': 'array',
-                    'items': rule_schema,
-                },
-            },
-            'required': ['overall_compliance_assessment', 'rules'],
-        }
-        return response_schema
+        return copy.deepcopy(RESPONSE_SCHEMA)
+
+    @functools.cached_property
+    def prompt_builder(self) -> PromptBuilder:
+        """The prompt builder, parsing the rules file on first use."""
+        rules = self.rules
+        if rules is None:
+            rules = load_rules(self.rules_path)
+        return PromptBuilder(rules, RESPONSE_SCHEMA)
 
     @property
-    def prompt(self) -> None:
+    def prompt(self) -> str:
         """Build the prompt for GenAI model from base prompt and rules file.
         Returns:
             The prompt for the GenAI model.
         """
-        # Load rules file
-        with open('rules.csv', 'r') as file:
-            rules_content = file.read()
-
-        prompt = f"""You are an experienced advertising content reviewer.
-            You specialize in determining whether or not a video ad violates google ads policy or not.
-            Please conduct a strict content review of the video ad provided according to the detailed review tags - added below in csv format.
-            Your judgment will directly affect the launch and promotion of this video ad, so please take every detail seriously.
-            Based on the attached policy rules, analyze the video and for each policy rule determine if it violates it or not.
-            If it does violate it, score the seriousness of the violation on a scale of 1 to 5,
-            explain the reason for your decision, and provide the timestamp for the violation part.
-
-            Video Ad Policy Review Instructions:
-            - Carefully watch the entire video ad from start to finish
-            - Analyze each frame and content element against the attached policy rules
-            - Be thorough and objective in your assessment
-            - Consider context, intent, and potential viewer interpretation
-
-            Detailed Review Methodology:
-            1. For each policy rule, provide a comprehensive analysis
-            2. If a rule is violated, clearly document:
-               - Specific timestamp(s) of violation
-               - Exact content causing the violation
-               - Visual or contextual details
-
-            3. Assess violation severity and potential impact
-
-            Output Format (for each rule):
-            {{
-                "rule_index": int,                 # Policy rule index number
-                "rule_violation": bool,             # Whether rule is violated
-                "violation_score": int,             # Severity (1-5)
-                "confidence_score": float,          # Confidence in assessment (0.0-1.0)
-                "violation_reason": str,            # Detailed explanation
-                "violation_timestamp": str,         # Specific timestamp of violation
-            }}
-
-            Final Report Requirements:
-            - Overall Compliance Assessment: Provide a summary percentage of policy compliance
-            - The answer for each rule according to the provided format
-
-            Here are the review tags, in a CSV format:
-            {rules_content}
-            """
-        return prompt
+        return self.build_prompt()
+
+    def build_prompt(self, rules: Optional[List[Rule]] = None) -> str:
+        """Build the prompt for GenAI model from base prompt and rules.
+        Args:
+            rules: Optional subset of the rules, the rules file if not given.
+        Returns:
+            The prompt for the GenAI model.
+        """
+        return self.prompt_builder.build(rules)
+
+    def count_tokens(self, text: str) -> int:
+        """Counts the tokens of a text with the model's tokenizer.
+        Args:
+            text: The text.
+        Returns:
+            The number of tokens.
+        """
+        return self.client.models.count_tokens(
+            model=self.model, contents=text
+        ).total_tokens
+
+    def count_prompt_tokens(self, rules: Optional[List[Rule]] = None) -> int:
+        """Counts the tokens of the prompt, approximating if the API fails.
+        Args:
+            rules: Optional subset of the rules, the rules file if not given.
+        Returns:
+            The number of tokens of the prompt.
+        """
+        try:
+            tokens = self.prompt_builder.count_tokens(rules, self.count_tokens)
+        except Exception as e:
+            log.logger.warning(f'Could not count prompt tokens: {e}')
+            tokens = self.prompt_builder.count_tokens(rules)
+        log.logger.info(f'The prompt takes {tokens} tokens')
+        return tokens
@@ -0,0 +1,323 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Module responsible for watching for newly uploaded videos."""
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+
+import json
+import os
+import threading
+import time
+import types
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from utils import gcs, lazy
+from utils import logging as log
+from utils.config import Config
+
+api_exceptions = lazy.LazyModule('google.api_core.exceptions')
+
+_FINALIZE_EVENT = 'OBJECT_FINALIZE'
+# Ack deadline the leases of pulled notifications are extended to.
+_ACK_DEADLINE_SECONDS = 60
+# Leases are given up after this long, so a video that failed is delivered
+# again instead of being held forever.
+_MAX_LEASE_SECONDS = 3600
+
+
+def poll_new(
+    list_versions: Callable[[], Iterable[Tuple[str, Hashable]]],
+    interval_seconds: float,
+    stop: threading.Event,
+    include_existing: bool = False,
+) -> Iterator[str]:
+    """Polls a listing and yields the names that are new or changed.
+    An object overwritten under the same name is yielded again, since its
+    version, such as its GCS generation or modification time, changed.
+    Args:
+        list_versions: Lists the current (name, version) pairs.
+        interval_seconds: Seconds between two listings.
+        stop: Ends the watch when set.
+        include_existing: Whether the names of the first listing are yielded
+            too, instead of only the ones appearing later.
+    Yields:
+        The new or changed names in listing order.
+    """
+    seen = set() if include_existing else set(list_versions())
+    while not stop.is_set():
+        listing = list(list_versions())
+        for name, version in listing:
+            if (name, version) not in seen:
+                yield name
+        seen = set(listing)
+        stop.wait(interval_seconds)
+
+
+class DirectoryWatcher:
+    """Lists the videos dropped into a local directory.
+    A file is only listed once its size is unchanged since the previous
+    listing, so files still being copied in are not picked up half written.
+    Hidden files are skipped, so uploads can also be written under a
+    hidden name and renamed when complete.
+    """
+
+    def __init__(self, directory: str, extensions: List[str]) -> None:
+        """Initiate the watcher.
+        Args:
+            directory: The directory videos are dropped into.
+            extensions: File extensions treated as videos.
+        """
+        self.directory = directory
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self._sizes: Dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def list_ready(self) -> List[Tuple[str, int]]:
+        """Lists the complete videos of the directory.
+        Returns:
+            The (path, modification time in ns) of the videos whose size
+            settled, sorted.
+        """
+        sizes, mtimes = {}, {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if (
+                    entry.is_file()
+                    and not entry.name.startswith('.')
+                    and entry.name.lower().endswith(self.extensions)
+                ):
+                    stat = entry.stat()
+                    sizes[entry.path] = stat.st_size
+                    mtimes[entry.path] = stat.st_mtime_ns
+        ready = [
+            (path, mtimes[path])
+            for path, size in sizes.items()
+            if size and self._sizes.get(path) == size
+        ]
+        self._sizes = sizes
+        return sorted(ready)
+
+
+def _uploaded_object(message: Any, config: Config) -> Optional[str]:
+    """Reads the object of a bucket notification, if it is a new video.
+    Args:
+        message: The Pub/Sub message of a Cloud Storage notification.
+        config: The Config object containing configuration parameters.
+    Returns:
+        The object name, None for other events, buckets or files.
+    """
+    attributes = message.attributes
+    if attributes.get('eventType') != _FINALIZE_EVENT:
+        return None
+    if attributes.get('bucketId') != config.bucket_name:
+        return None
+    try:
+        payload = json.loads(message.data or b'{}')
+    except ValueError:
+        payload = {}
+    blob = types.SimpleNamespace(
+        name=attributes.get('objectId', ''),
+        content_type=payload.get('contentType'),
+        updated=None,
+    )
+    return blob.name if gcs.is_video_blob(blob, config) else None
+
+
+class NotificationLeases:
+    """Holds the pulled notifications of videos until their results are in.
+    The ack deadline of every held message is extended in the background,
+    so a video waiting or being analyzed longer than the subscription's
+    deadline is not delivered again. A message is acknowledged by ack once
+    the results of its video are written. Leases are given up after
+    max_lease_seconds and returned on close, so videos that failed or were
+    not started are delivered again.
+    """
+
+    def __init__(
+        self,
+        subscriber: Any,
+        subscription: str,
+        deadline_seconds: int = _ACK_DEADLINE_SECONDS,
+        max_lease_seconds: float = _MAX_LEASE_SECONDS,
+    ) -> None:
+        """Initiate the leases and start extending them.
+        Args:
+            subscriber: The Pub/Sub subscriber client.
+            subscription: The subscription path.
+            deadline_seconds: The ack deadline leases are extended to.
+            max_lease_seconds: How long a message is held at most.
+        """
+        self.subscriber = subscriber
+        self.subscription = subscription
+        self.deadline_seconds = deadline_seconds
+        self.max_lease_seconds = max_lease_seconds
+        self._leases: Dict[Hashable, List[Tuple[str, float]]] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, key: Hashable, ack_id: str) -> None:
+        """Holds a pulled message until the video of key is acked.
+        Args:
+            key: The video the message notified.
+            ack_id: The ack id of the message.
+        """
+        with self._lock:
+            self._leases.setdefault(key, []).append((ack_id, time.monotonic()))
+        self._modify([ack_id], self.deadline_seconds)
+
+    def ack(self, key: Hashable) -> None:
+        """Acknowledges the messages held for a video.
+        Args:
+            key: The video whose results were written.
+        """
+        with self._lock:
+            leases = self._leases.pop(key, [])
+        if leases:
+            self.subscriber.acknowledge(
+                request={
+                    'subscription': self.subscription,
+                    'ack_ids': [ack_id for ack_id, _ in leases],
+                }
+            )
+
+    def move(self, key: Hashable, new_key: Hashable) -> None:
+        """Holds the messages of a video until new_key is acked instead.
+        Args:
+            key: The video the messages notified.
+            new_key: The video they are now acked by.
+        """
+        with self._lock:
+            leases = self._leases.pop(key, [])
+            if leases:
+                self._leases.setdefault(new_key, []).extend(leases)
+
+    def extend(self) -> None:
+        """Extends the deadline of the held messages, dropping stale ones."""
+        expiry = time.monotonic() - self.max_lease_seconds
+        with self._lock:
+            for key in list(self._leases):
+                leases = [
+                    lease for lease in self._leases[key] if lease[1] > expiry
+                ]
+                if leases:
+                    self._leases[key] = leases
+                else:
+                    del self._leases[key]
+            ack_ids = [
+                ack_id
+                for leases in self._leases.values()
+                for ack_id, _ in leases
+            ]
+        self._modify(ack_ids, self.deadline_seconds)
+
+    def close(self) -> None:
+        """Stops extending and returns the held messages for redelivery."""
+        self._closed.set()
+        self._thread.join()
+        with self._lock:
+            ack_ids = [
+                ack_id
+                for leases in self._leases.values()
+                for ack_id, _ in leases
+            ]
+            self._leases.clear()
+        self._modify(ack_ids, 0)
+
+    def _modify(self, ack_ids: List[str], deadline_seconds: int) -> None:
+        """Sets the ack deadline of messages."""
+        if not ack_ids:
+            return
+        try:
+            self.subscriber.modify_ack_deadline(
+                request={
+                    'subscription': self.subscription,
+                    'ack_ids': ack_ids,
+                    'ack_deadline_seconds': deadline_seconds,
+                }
+            )
+        except api_exceptions.GoogleAPICallError as e:
+            log.logger.warning(f'Could not extend notification leases: {e}')
+
+    def _run(self) -> None:
+        """Extends the leases well before their deadline until closed."""
+        while not self._closed.wait(self.deadline_seconds / 3):
+            self.extend()
+
+
+def iter_notifications(
+    subscriber: Any,
+    config: Config,
+    stop: threading.Event,
+    leases: NotificationLeases,
+    lease_key: Optional[Callable[[str], Hashable]] = None,
+    max_messages: int = 10,
+) -> Iterator[str]:
+    """Pulls the object finalize notifications of the bucket.
+    Notifications of videos are held by leases until the consumer acks
+    them, so an interrupted daemon gets the videos it had not finished
+    again. Other notifications are acknowledged right away.
+    Args:
+        subscriber: The Pub/Sub subscriber client.
+        config: The Config object containing configuration parameters.
+        stop: Ends the watch when set.
+        leases: Holds the notifications of the videos until acked.
+        lease_key: Maps an object name to the key it is acked by, the
+            name itself if not given.
+        max_messages: The most messages a pull returns.
+    Yields:
+        The names of the uploaded video objects.
+    """
+    subscription = config.pubsub_subscription
+    while not stop.is_set():
+        try:
+            response = subscriber.pull(
+                request={
+                    'subscription': subscription,
+                    'max_messages': max_messages,
+                },
+                timeout=config.watch_poll_seconds,
+            )
+        except api_exceptions.DeadlineExceeded:
+            continue
+        names, other_ack_ids = [], []
+        for received in response.received_messages:
+            name = _uploaded_object(received.message, config)
+            if name:
+                leases.add(
+                    lease_key(name) if lease_key else name, received.ack_id
+                )
+                names.append(name)
+            else:
+                other_ack_ids.append(received.ack_id)
+        if other_ack_ids:
+            subscriber.acknowledge(
+                request={'subscription': subscription, 'ack_ids': other_ack_ids}
+            )
+        for name in names:
+            log.logger.info(
+                f'Upload notified: gs://{config.bucket_name}/{name}'
+            )
+            yield name
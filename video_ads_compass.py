@@ -13,123 +13,1068 @@
 # limitations under the License.
 
 """Main module for the Video Ads Compass application."""
-# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary
+# pylint: disable=C0330, g-bad-import-order, g-multiple-import, bad-indentation, g-no-space-after-docstring-summary, broad-exception-caught
 
+from __future__ import annotations
+
+import contextlib
+import copy
+import functools
 import json
 import os
-import traceback
-from typing import List
-
-import pandas as pd
-from google.cloud import storage
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
+from utils import (
+    auth,
+    gcs,
+    lazy,
+    response_parser,
+    sampling,
+    scheduling,
+    segments,
+)
+from utils import logging as log
+from utils.cache import VideoCache
+from utils.clients import ClientPool
 from utils.config import Config
-from utils.sheets import GoogleSheetsHandler
-from utils.vertex_ai import VertexAIHandler
+from utils.drive import DriveClient, DriveVideoSource, parse_folder_id
+from utils.hedging import HedgedCaller
+from utils.memory_budget import estimate_video_weight
+from utils.modality import TranscriptRouter
+from utils.probe import MediaInfo, probe_duration, probe_media
+from utils.rules import Rule, load_rules
+from utils.sheets import SheetsRunWriter
+from utils.tenants import SharedResources, load_manifest, tenant_path
+from utils.verdicts import VerdictStore, video_fingerprint
+from utils.vertex_ai import RESPONSE_SCHEMA, VertexAIHandler
+from utils.watch import (
+    DirectoryWatcher,
+    NotificationLeases,
+    iter_notifications,
+    poll_new,
+)
+
+pd = lazy.LazyModule('pandas')
+storage = lazy.LazyModule('google.cloud.storage')
+pubsub_v1 = lazy.LazyModule('google.cloud.pubsub_v1')
 
-_DESTINATION_DIR = './temp_videos'
+RESULT_COLUMNS = [
+    'video_type',
+    'video_key',
+    'video_uri',
+    'overall_compliance_assessment',
+    'rule_index',
+    'rule_violation',
+    'violation_score',
+    'violation_reason',
+    'violation_time',
+]
 
 
-def download_and_list_video_files_gcs(config: Config) -> List[str]:
-    """Lists and downloads MP4 files within the specified GCS bucket.
+def download_and_list_video_files_gcs(
+    config: Config, cache: Optional[VideoCache] = None
+) -> List[str]:
+    """Lists and downloads video files within the specified GCS bucket.
+    The files are pinned in the cache, so fetching later blobs cannot evict
+    them before they are used. The caller releases each one with
+    cache.release when done.
 
     Args:
         config: The Config object containing configuration parameters.
+        cache: The local video cache, created from the config if not given.
     Returns:
         A list of paths to the downloaded video files.
     """
+    cache = cache or VideoCache(config.cache_dir, config.cache_max_bytes)
     client = storage.Client(credentials=config.credentials)
+    with log.tracer.span('list', source='gcs'):
+        blobs = gcs.list_video_blobs(client, config)
     video_files = []
-    for blob in client.list_blobs(config.bucket_name):
-        blob_file_path = f'{_DESTINATION_DIR}/{blob.name}'
-        if 'mp4' in blob.name:
-            if not os.path.exists(blob_file_path):
-                blob.download_to_filename(blob_file_path)
-            video_files.append(blob_file_path)
+    for blob in blobs:
+        with log.tracer.span('download', video=cache.path_for(blob.name)):
+            video_files.append(
+                cache.fetch(blob.name, blob.download_to_filename, pin=True)
+            )
     return video_files
 
 
+def iter_video_files_gcs(
+    config: Config, cache: VideoCache, clients: Optional[ClientPool] = None
+) -> Iterator[str]:
+    """Lists video files and downloads each one as it is consumed.
+    Each file stays pinned in the cache until the next one is requested,
+    so the cache budget only needs to hold the videos in flight.
+
+    Args:
+        config: The Config object containing configuration parameters.
+        cache: The local video cache.
+        clients: Optional pool to reuse the storage client of.
+    Yields:
+        The path to each downloaded video file.
+    """
+    if clients:
+        client = clients.storage(config)
+    else:
+        client = storage.Client(credentials=config.credentials)
+    with log.tracer.span('list', source='gcs'):
+        blobs = gcs.list_video_blobs(client, config)
+    yield from iter_blob_downloads(blobs, cache)
+
+
+def iter_blob_downloads(
+    blobs: Iterable[Any], cache: VideoCache
+) -> Iterator[str]:
+    """Downloads each listed blob as it is consumed.
+    Each file stays pinned in the cache until the next one is requested.
+
+    Args:
+        blobs: The listed video blobs.
+        cache: The local video cache.
+    Yields:
+        The path to each downloaded video file.
+    """
+    for blob in blobs:
+        with log.tracer.span('download', video=cache.path_for(blob.name)):
+            path = cache.fetch(blob.name, blob.download_to_filename, pin=True)
+        try:
+            yield path
+        finally:
+            cache.release(path)
+
+
+def create_drive_video_source(
+    config: Config, cache: VideoCache
+) -> DriveVideoSource:
+    """Creates the incremental source of videos in the Drive folder.
+
+    Args:
+        config: The Config object containing configuration parameters.
+        cache: The local video cache.
+    Returns:
+        The Drive video source.
+    """
+    return DriveVideoSource(
+        DriveClient(config.credentials),
+        parse_folder_id(config.drive_folder_url),
+        cache,
+        config.drive_state_path,
+        config.video_extensions,
+        max_workers=config.listing_workers,
+    )
+
+
+def create_token_estimator(
+    config: Config,
+    prompt_tokens: int,
+    rules: List[Rule],
+    probe: Optional[Callable[[str], Optional[MediaInfo]]] = None,
+    size: Optional[Callable[[str], int]] = None,
+) -> scheduling.TokenEstimator:
+    """Creates the estimator of the tokens each video will take.
+
+    Args:
+        config: The Config object containing configuration parameters.
+        prompt_tokens: The tokens of the prompt sent with every model call.
+        rules: The rules answered in every response.
+        probe: Optional reader of the media info of a video, ffprobe of
+            the local file if not given.
+        size: Optional reader of the size of a video, the local file size
+            if not given.
+    Returns:
+        The token estimator.
+    """
+    return scheduling.TokenEstimator(
+        prompt_tokens=prompt_tokens,
+        rule_count=len(rules),
+        segment_seconds=config.segment_seconds,
+        overlap_seconds=config.segment_overlap_seconds,
+        probe=probe,
+        size=size,
+    )
+
+
+def schedule_videos(
+    video_uris: Iterable[str],
+    config: Config,
+    estimator: Optional[scheduling.TokenEstimator] = None,
+    cache: Optional[VideoCache] = None,
+) -> Iterator[Tuple[int, str, Optional[scheduling.JobEstimate]]]:
+    """Keys and estimates videos, ordering them shortest job first.
+    Videos are pinned in the cache as soon as they enter the scheduling
+    window, so they stay cached until their analysis finishes.
+
+    Args:
+        video_uris: The video URIs in listing order, consumed lazily.
+        config: The Config object containing configuration parameters.
+        estimator: Optional token estimator, needed to reorder videos.
+        cache: The video cache, to keep videos pinned while waiting.
+    Returns:
+        The (listing key, path, estimate) of each video in dispatch order.
+    """
+
+    def jobs() -> Iterator[Tuple[int, str, Optional[scheduling.JobEstimate]]]:
+        for key, file_path in enumerate(video_uris):
+            if cache:
+                cache.pin(file_path)
+            estimate = None
+            if estimator:
+                with log.tracer.span('estimate', video=file_path):
+                    estimate = estimator.estimate(file_path)
+            yield key, file_path, estimate
+
+    if not (estimator and config.schedule_lookahead):
+        return jobs()
+    return scheduling.shortest_job_first(
+        jobs(),
+        cost=lambda job: job[2].total_tokens,
+        lookahead=config.schedule_lookahead,
+        max_skips=config.schedule_max_skips,
+    )
+
+
+def estimate_run(
+    video_uris: Iterable[str],
+    config: Config,
+    probe: Optional[Callable[[str], Optional[MediaInfo]]] = None,
+    size: Optional[Callable[[str], int]] = None,
+) -> Dict[str, Any]:
+    """Estimates the tokens, cost and time of a run without running it.
+
+    Args:
+        video_uris: The video URIs to estimate.
+        config: The Config object containing configuration parameters.
+        probe: Optional reader of the media info of a video, ffprobe of
+            the local file if not given.
+        size: Optional reader of the size of a video, the local file size
+            if not given.
+    Returns:
+        The totals of the run, see scheduling.summarize_estimates.
+    """
+    rules = load_rules(config.rules_path)
+    estimator = create_token_estimator(
+        config,
+        VertexAIHandler(config, rules=rules).count_prompt_tokens(),
+        rules,
+        probe,
+        size,
+    )
+    estimates = [
+        estimate
+        for _, _, estimate in schedule_videos(video_uris, config, estimator)
+    ]
+    return scheduling.summarize_estimates(
+        estimates,
+        config.tokens_per_minute,
+        config.input_token_price_per_million,
+        config.output_token_price_per_million,
+    )
+
+
+def list_remote_videos(
+    config: Config,
+    resources: SharedResources,
+    drive_source: Optional[DriveVideoSource] = None,
+) -> Dict[str, int]:
+    """Lists the URLs the configured videos are read from, not downloading.
+
+    Args:
+        config: The Config object containing configuration parameters.
+        resources: The shared resources, to reuse the storage client of.
+        drive_source: The Drive video source, when reading from Drive.
+    Returns:
+        The size in bytes of each video by its URL.
+    """
+    if drive_source:
+        return {
+            drive_source.client.media_url(video['id']): video.get('size', 0)
+            for video in drive_source.sync()
+        }
+    with log.tracer.span('list', source='gcs'):
+        blobs = gcs.list_video_blobs(resources.clients.storage(config), config)
+    return {blob.public_url: blob.size or 0 for blob in blobs}
+
+
+def _analyze_video_rules(
+    analyze_video: Callable[..., str],
+    key: int,
+    file_path: str,
+    rules: Optional[List[Rule]] = None,
+    verdict_store: Optional[VerdictStore] = None,
+    max_followups: int = 1,
+) -> List[Dict[str, Any]]:
+    """Analyzes one video and flattens its per rule results.
+
+    Args:
+        analyze_video: The function calling the model for a video path and
+            an optional rules subset.
+        key: The key of the video within the run.
+        file_path: The path to the video file.
+        rules: The current rules, to find rules missing in a response and
+            to use a verdict store.
+        verdict_store: Optional store of earlier verdicts, so only rules
+            without a verdict for this video are sent to the model.
+        max_followups: How many requests for the rules missing in a
+            truncated or invalid response may be made.
+    Returns:
+        The per rule results of the video, empty if it failed.
+    """
+
+    def analyze_text(rules_subset: Optional[List[Rule]]) -> Optional[str]:
+        if rules_subset:
+            return analyze_video(file_path, rules_subset)
+        return analyze_video(file_path)
+
+    def analyze(rules_subset: Optional[List[Rule]]) -> Optional[Dict]:
+        return response_parser.analyze_with_followup(
+            analyze_text,
+            rules or [],
+            RESPONSE_SCHEMA,
+            rules_subset,
+            max_followups,
+        )
+
+    try:
+        if verdict_store:
+            result = verdict_store.evaluate(
+                video_fingerprint(file_path), rules, analyze
+            )
+        else:
+            result = analyze(None)
+        if not result:
+            return []
+        for rule in result['rules']:
+            rule['video_type'] = 'all'
+            rule['video_key'] = key
+            rule['video_uri'] = file_path
+            rule['overall_compliance_assessment'] = result[
+                'overall_compliance_assessment'
+            ]
+        return result['rules']
+    except Exception:
+        # A video whose model calls timed out or kept failing after their
+        # retries fails alone instead of the whole run.
+        log.logger.exception(f'Error processing URI {file_path}')
+        return []
+
+
+def results_to_df(results: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Flattens per rule results into the DataFrame written to the sink.
+
+    Args:
+        results: The per rule results of one or more videos.
+    Returns:
+        The results with the sink columns, empty if there are none.
+    """
+    if not results:
+        return pd.DataFrame()
+    return pd.DataFrame(results)[RESULT_COLUMNS]
+
+
+def _log_failure(file_path: str, future: Future) -> None:
+    """Logs the failure of a video whose results are streamed."""
+    if not future.cancelled() and future.exception():
+        log.logger.error(
+            f'Error processing URI {file_path}', exc_info=future.exception()
+        )
+
+
+def _create_video_analyzer(
+    config: Config,
+    vertex_ai_handler: VertexAIHandler,
+    hedged_caller: HedgedCaller,
+    executor: ThreadPoolExecutor,
+    rules: List[Rule],
+    media_infos: Dict[str, Optional[MediaInfo]],
+    verdict_store: Optional[VerdictStore] = None,
+) -> Callable[[int, str], List[Dict[str, Any]]]:
+    """Builds the analysis chain run for each video.
+    Model calls are hedged and retried. Videos longer than the configured
+    segment length are analyzed as parallel time segments, audio and text
+    rules are reviewed against the transcript with the audio pre-pass, and
+    only rules without a stored verdict are sent with a verdict store.
+
+    Args:
+        config: The Config object containing configuration parameters.
+        vertex_ai_handler: The handler calling the model.
+        hedged_caller: Runs the model calls with their hedges and retries.
+        executor: Runs the segments and transcripts of a video in parallel.
+        rules: The rules.
+        media_infos: The media probed while estimating, by video path.
+            The entry of a video is removed once it is analyzed.
+        verdict_store: Optional store of earlier verdicts.
+    Returns:
+        A function analyzing a video by its key and path, returning its
+        per rule results, empty if it failed.
+    """
+
+    def call_model(
+        function: Callable[..., str],
+        *args: Any,
+        copies: Optional[List[Future]] = None,
+    ) -> str:
+        with log.tracer.span('model_call'):
+            return hedged_caller.call(function, *args, copies=copies)
+
+    def analyze_video(
+        file_path: str, rules_subset: Optional[List[Rule]] = None
+    ) -> str:
+        rules_kwargs = {'rules': rules_subset} if rules_subset else {}
+        duration = None
+        if config.segment_seconds and file_path in media_infos:
+            media_info = media_infos[file_path]
+            duration = media_info.duration if media_info else None
+        elif config.segment_seconds:
+            with log.tracer.span('preprocess'):
+                duration = probe_duration(file_path)
+        if not duration or duration <= config.segment_seconds:
+            return call_model(
+                functools.partial(
+                    vertex_ai_handler.analyze_video, **rules_kwargs
+                ),
+                file_path,
+            )
+        # The uploaded video is deleted once every copy of the segment calls
+        # ended, including hedges abandoned while still using it.
+        cleanup = contextlib.ExitStack()
+        video_part = cleanup.enter_context(
+            vertex_ai_handler.video_part(file_path)
+        )
+        copies = []
+        try:
+            return segments.analyze_segmented(
+                lambda start, end: call_model(
+                    functools.partial(
+                        vertex_ai_handler.analyze_video_part, **rules_kwargs
+                    ),
+                    video_part,
+                    start,
+                    end,
+                    copies=copies,
+                ),
+                duration,
+                config.segment_seconds,
+                config.segment_overlap_seconds,
+                executor,
+                parse=functools.partial(
+                    response_parser.parse_response, schema=RESPONSE_SCHEMA
+                ),
+            )
+        finally:
+            hedged_caller.defer(copies, cleanup.close)
+
+    router = None
+    if config.audio_prepass:
+        router = TranscriptRouter(
+            lambda audio_path, mime_type: call_model(
+                vertex_ai_handler.transcribe_audio, audio_path, mime_type
+            ),
+            lambda transcript, rules_subset: call_model(
+                vertex_ai_handler.analyze_transcript, transcript, rules_subset
+            ),
+            executor,
+            RESPONSE_SCHEMA,
+        )
+
+    def analyze_routed(
+        file_path: str, rules_subset: Optional[List[Rule]] = None
+    ) -> str:
+        return router.analyze(analyze_video, file_path, rules, rules_subset)
+
+    def analyze(key: int, file_path: str) -> List[Dict[str, Any]]:
+        try:
+            with log.tracer.span(
+                'analyze', video=file_path, end_trace=True, video_key=key
+            ):
+                return _analyze_video_rules(
+                    analyze_routed if router else analyze_video,
+                    key,
+                    file_path,
+                    rules,
+                    verdict_store,
+                    config.max_followup_requests,
+                )
+        finally:
+            media_infos.pop(file_path, None)
+            if router:
+                router.release(file_path)
+
+    return analyze
+
+
+def _dispatch_videos(
+    video_uris: Iterable[str],
+    config: Config,
+    analyze: Callable[[int, str], List[Dict[str, Any]]],
+    resources: SharedResources,
+    estimator: Optional[scheduling.TokenEstimator],
+    media_infos: Dict[str, Optional[MediaInfo]],
+    cache: Optional[VideoCache] = None,
+    on_result: Optional[Callable[[pd.DataFrame], None]] = None,
+) -> Dict[int, List[Dict[str, Any]]]:
+    """Analyzes videos concurrently under the limits shared by the run.
+    Each video takes a slot of its tenant, its estimated weight of the
+    memory budget and, when estimated, its tokens of the per minute quota
+    before it is analyzed. Slot and memory are given back once it is done.
+
+    Args:
+        video_uris: The video URIs to process, consumed lazily.
+        config: The Config object containing configuration parameters.
+        analyze: Analyzes a video by its key and path.
+        resources: The slots, quotas and memory budget of the run.
+        estimator: Optional estimator of the tokens of a video, to order
+            and admit videos by their tokens.
+        media_infos: Receives the media probed while estimating.
+        cache: The video cache, to keep videos pinned while in flight.
+        on_result: Optional sink called with the results of each video.
+    Returns:
+        The per rule results by video key, empty when they were streamed to
+        on_result.
+    """
+    results_by_key = {}
+    slots = resources.share(config)
+    budget = resources.memory_budget
+    metrics = resources.metrics(config.tenant_name)
+
+    def run(key: int, file_path: str, weight: int) -> None:
+        video_results = []
+        try:
+            video_results = analyze(key, file_path)
+            if not on_result:
+                results_by_key[key] = video_results
+            elif video_results:
+                on_result(results_to_df(video_results))
+        finally:
+            metrics.record_video(len(video_results))
+            budget.release(weight)
+            slots.release()
+            if cache:
+                cache.release(file_path)
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=config.max_concurrency) as executor:
+        for key, file_path, estimate in schedule_videos(
+            video_uris, config, estimator, cache
+        ):
+            weight = estimate_video_weight(file_path, config.inline_max_bytes)
+            # Every video costs one slot turn, so tenant weights compare
+            # alike whether or not a tenant estimates tokens.
+            tokens = estimate.total_tokens if estimate else 0
+            metrics.record_dispatch(slots.acquire(), tokens)
+            budget.acquire(weight)
+            log.logger.debug(
+                f'Admitted {file_path}, in-flight video bytes: '
+                f'{budget.in_flight} (peak {budget.peak})'
+            )
+            if estimate:
+                resources.token_limiter.acquire(estimate.total_tokens)
+                media_infos[file_path] = estimate.media_info
+            future = executor.submit(run, key, file_path, weight)
+            if on_result:
+                future.add_done_callback(
+                    functools.partial(_log_failure, file_path)
+                )
+            else:
+                futures.append(future)
+    for future in futures:
+        future.result()
+    return results_by_key
+
+
 def process_videos_and_create_df(
-    video_uris: List[str], config: Config
+    video_uris: Iterable[str],
+    config: Config,
+    cache: Optional[VideoCache] = None,
+    on_result: Optional[Callable[[pd.DataFrame], None]] = None,
+    resources: Optional[SharedResources] = None,
+    rules: Optional[List[Rule]] = None,
 ) -> pd.DataFrame:
-    """Processes video URIs and analyzes them.
+    """Processes video URIs and analyzes them concurrently.
     Creates a flattened DataFrame.
 
+    Videos are admitted by their estimated in-memory weight against the
+    configured memory budget, so concurrency is high for small videos and
+    bounded for large ones. Model calls run under an adaptive concurrency
+    limit that backs off on quota errors and timeouts. Each call has a
+    deadline and is optionally hedged by a duplicate when slower than
+    usual. Videos longer than the configured segment length are analyzed as
+    parallel time segments.
+    With a verdict store configured, only rules added or edited since a
+    video was last analyzed are sent to the model. With the audio pre-pass,
+    audio and text rules are reviewed against a transcript by a cheaper
+    text model and only visual rules are sent with the video.
+    Videos can be ordered shortest job first by their estimated tokens and
+    admitted under the tokens per minute quota. Runs of several tenants
+    share their clients, quota, memory budget and video slots, the slots
+    being split by weighted fair queuing.
+
     Args:
-        video_uris: A list of video URIs to process.
+        video_uris: The video URIs to process, consumed lazily.
         config: The Config object containing configuration parameters.
+        cache: The video cache, to keep videos pinned while in flight.
+        on_result: Optional sink called with the results of each video as
+            soon as it is analyzed. The results are then not kept and a
+            failing video is logged instead of failing the run, so a watch
+            runs indefinitely.
+        resources: The clients, quotas and slots shared with the runs of
+            other tenants, the run's own if not given.
+        rules: The rules, loaded from the configured rules file if not
+            given.
     Returns:
-        A flattened DataFrame containing the analysis results.
+        A flattened DataFrame containing the analysis results, empty when
+        they were streamed to on_result.
     """
 
-    all_results = []
-    vertex_ai_handler = VertexAIHandler(config)
+    if config.segment_seconds:
+        # Fails fast on a segment overlap instead of once per video.
+        segments.plan_segments(
+            0, config.segment_seconds, config.segment_overlap_seconds
+        )
+    resources = resources or SharedResources(config)
+    if rules is None:
+        rules = load_rules(config.rules_path)
+    vertex_ai_handler = VertexAIHandler(config, resources.clients, rules)
+    hedged_caller = HedgedCaller(
+        config.hedge_percentile,
+        config.hedge_max_ratio,
+        max_workers=2 * config.max_concurrency,
+        controller=resources.controller,
+        max_retries=config.max_retries,
+    )
+    segment_executor = ThreadPoolExecutor(max_workers=config.max_concurrency)
+    estimator = None
+    if config.schedule_lookahead or config.tokens_per_minute:
+        estimator = create_token_estimator(
+            config, vertex_ai_handler.count_prompt_tokens(), rules
+        )
+    verdict_store = None
+    if config.verdict_store_path:
+        verdict_store = VerdictStore(config.verdict_store_path, config.model)
+    # Media probed while estimating, so videos are not probed twice.
+    media_infos: Dict[str, Optional[MediaInfo]] = {}
+
+    analyze = _create_video_analyzer(
+        config,
+        vertex_ai_handler,
+        hedged_caller,
+        segment_executor,
+        rules,
+        media_infos,
+        verdict_store,
+    )
+    try:
+        results_by_key = _dispatch_videos(
+            video_uris,
+            config,
+            analyze,
+            resources,
+            estimator,
+            media_infos,
+            cache,
+            on_result,
+        )
+    finally:
+        segment_executor.shutdown()
+        hedged_caller.shutdown()
+        if verdict_store:
+            verdict_store.close()
+
+    budget = resources.memory_budget
+    log.logger.info(
+        f'In-flight video bytes: {budget.in_flight} now, peak {budget.peak} '
+        f'(budget {budget.max_bytes})'
+    )
+    if config.hedge_percentile:
+        log.logger.info(
+            f'Hedged {hedged_caller.hedges} of {hedged_caller.calls} model '
+            f'calls, {hedged_caller.hedges_won} hedges finished first'
+        )
+    log.logger.info(
+        'Concurrency limit over time: '
+        + ', '.join(str(limit) for _, limit in resources.controller.history)
+    )
+    return results_to_df(
+        [rule for key in sorted(results_by_key) for rule in results_by_key[key]]
+    )
+
 
-    for key, file_path in enumerate(video_uris):
+def iter_watched_videos(
+    config: Config,
+    cache: VideoCache,
+    stop: threading.Event,
+    leases: Optional[NotificationLeases] = None,
+) -> Iterator[str]:
+    """Yields the videos uploaded after the watch started, as they arrive.
+    Uploads are read from the bucket notifications of a Pub/Sub
+    subscription, by polling the bucket listing, or from a local drop
+    directory. Overwritten objects are yielded again. Downloaded files stay
+    pinned in the cache until the next one is requested.
+
+    Args:
+        config: The Config object containing configuration parameters.
+        cache: The local video cache.
+        stop: Ends the watch when set.
+        leases: Holds the Pub/Sub notifications until acked by the path of
+            their video, needed when reading notifications.
+    Yields:
+        The path to each new video file.
+    """
+    if config.watch_source == 'DIRECTORY':
+        watcher = DirectoryWatcher(config.watch_dir, config.video_extensions)
+        yield from poll_new(
+            watcher.list_ready,
+            config.watch_poll_seconds,
+            stop,
+            include_existing=True,
+        )
+        return
+
+    client = storage.Client(credentials=config.credentials)
+    bucket = client.bucket(config.bucket_name)
+    if config.watch_source == 'PUBSUB':
+        names = iter_notifications(
+            leases.subscriber, config, stop, leases, cache.path_for
+        )
+    else:
+        names = poll_new(
+            lambda: [
+                (blob.name, blob.generation)
+                for blob in gcs.list_video_blobs(client, config)
+            ],
+            config.watch_poll_seconds,
+            stop,
+        )
+    for name in names:
+        # An upload may overwrite an object analyzed before, or one still
+        # being analyzed, whose new version then gets a path of its own.
+        with log.tracer.span('download', video=cache.path_for(name)):
+            path = cache.fetch(
+                name,
+                bucket.blob(name).download_to_filename,
+                pin=True,
+                refresh=True,
+            )
+        if leases and path != cache.path_for(name):
+            leases.move(cache.path_for(name), path)
         try:
-            result_text = vertex_ai_handler.analyze_video(file_path)
-            if result_text:
-                result = json.loads(result_text)
-                for rule in result['rules']:
-                    rule['video_type'] = 'all'
-                    rule['video_key'] = key
-                    rule['video_uri'] = file_path
-                    rule['overall_compliance_assessment'] = result[
-                        'overall_compliance_assessment'
-                    ]
-                all_results.extend(result['rules'])
-        except ValueError as e:
-            print(f'Error processing URI {file_path}: {e}')
-            traceback.print_exc()
-
-    if not all_results:
-        return pd.DataFrame()
+            yield path
+        finally:
+            cache.release(path)
+
+
+def watch_videos(
+    config: Config, cache: VideoCache, stop: threading.Event
+) -> None:
+    """Analyzes new uploads as they arrive until stop is set.
+    The model client, prompt and rules stay loaded for the whole watch and
+    the results of each video are appended to the spreadsheet as soon as it
+    is analyzed. A Pub/Sub notification is acknowledged once the results
+    of its video are written.
+
+    Args:
+        config: The Config object containing configuration parameters.
+        cache: The local video cache.
+        stop: Ends the watch when set, after the videos in flight.
+    """
+    if config.schedule_lookahead:
+        log.logger.info('Uploads are analyzed in arrival order when watching')
+        config = copy.copy(config)
+        config.schedule_lookahead = 0
+    writer = SheetsRunWriter(config)
+    leases = None
+    if config.watch_source == 'PUBSUB':
+        leases = NotificationLeases(
+            pubsub_v1.SubscriberClient(credentials=config.credentials),
+            config.pubsub_subscription,
+        )
+
+    def stream(df: pd.DataFrame) -> None:
+        video_uri = df['video_uri'].iloc[0]
+        with log.tracer.span('sink', sink='sheets'):
+            output_url = writer.append_results(df)
+        if leases:
+            leases.ack(video_uri)
+        log.logger.info(f'Analyzed {video_uri}, results at {output_url}')
+
+    log.logger.info(f'Watching for uploads ({config.watch_source})')
+    try:
+        process_videos_and_create_df(
+            iter_watched_videos(config, cache, stop, leases),
+            config,
+            cache,
+            on_result=stream,
+        )
+    finally:
+        if leases:
+            leases.close()
+    log.logger.info('Stopped watching for uploads')
+
 
-    df = pd.DataFrame(all_results)
-    df = df[
+def sample_videos(
+    config: Config, cache: VideoCache
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Estimates per rule violation rates from a stratified sample.
+    The bucket listing is split into strata on the listed metadata, so
+    only the sampled videos are downloaded and analyzed. Samples are added
+    in rounds until every interval is within the target half width.
+
+    Args:
+        config: The Config object containing configuration parameters.
+        cache: The local video cache.
+    Returns:
+        The per rule results of the sampled videos, and the estimated
+        violation rate of each rule with its confidence interval.
+    Raises:
+        ValueError: If videos are not read from a GCS bucket.
+    """
+    if config.video_source != 'GCS':
+        raise ValueError('Sampling is only supported for GCS buckets')
+    resources = SharedResources(config)
+    with log.tracer.span('list', source='gcs'):
+        blobs = gcs.list_video_blobs(resources.clients.storage(config), config)
+    sampler = sampling.StratifiedSampler(
+        blobs, sampling.stratum_key(config.sample_strata), config.sample_seed
+    )
+    log.logger.info(f'Sampling strata: {json.dumps(sampler.population)}')
+    rules = load_rules(config.rules_path)
+    rounds = []
+    dispatched = 0
+
+    def analyze(
+        batch: List[Tuple[str, Any]],
+    ) -> List[Tuple[str, int, bool]]:
+        nonlocal dispatched
+        strata = {cache.path_for(blob.name): stratum for stratum, blob in batch}
+        df = process_videos_and_create_df(
+            iter_blob_downloads([blob for _, blob in batch], cache),
+            config,
+            cache,
+            resources=resources,
+            rules=rules,
+        )
+        offset, dispatched = dispatched, dispatched + len(batch)
+        if df.empty:
+            return []
+        df['video_key'] += offset
+        rounds.append(df)
+        return [
+            (strata[row.video_uri], row.rule_index, row.rule_violation)
+            for row in df.itertuples()
+        ]
+
+    estimates = sampling.sample_until_precision(
+        sampler,
+        analyze,
+        config.sample_size,
+        config.sample_target_half_width,
+        config.sample_max_size,
+        config.sample_confidence,
+    )
+    df_estimates = pd.DataFrame(
         [
-            'video_type',
-            'video_key',
-            'video_uri',
-            'overall_compliance_assessment',
-            'rule_index',
-            'rule_violation',
-            'violation_score',
-            'violation_reason',
-            'violation_time',
+            {
+                'rule_index': rule,
+                'violation_rate': round(estimate.rate, 4),
+                'ci_low': round(estimate.low, 4),
+                'ci_high': round(estimate.high, 4),
+                'sampled_videos': estimate.sampled,
+                'population_videos': sum(sampler.population.values()),
+            }
+            for rule, estimate in sorted(
+                estimates.items(), key=lambda item: str(item[0])
+            )
         ]
-    ]
+    )
+    df_results = (
+        pd.concat(rounds, ignore_index=True) if rounds else pd.DataFrame()
+    )
+    return df_results, df_estimates
+
 
-    return df
+def run_batch(
+    config: Config,
+    cache: VideoCache,
+    resources: Optional[SharedResources] = None,
+) -> None:
+    """Analyzes the configured videos once and writes the results.
 
+    Args:
+        config: The Config object containing configuration parameters.
+        cache: The local video cache.
+        resources: The clients, quotas and slots shared with the runs of
+            other tenants, the run's own if not given.
+    """
+    resources = resources or SharedResources(config)
+    drive_source = None
+    if config.video_source == 'DRIVE':
+        drive_source = create_drive_video_source(config, cache)
 
-def main():
+    if config.dry_run:
+        # ffprobe reads the header of each video over HTTP range requests
+        # instead of downloading it.
+        sizes = list_remote_videos(config, resources, drive_source)
+        credentials = config.credentials
+        estimate = estimate_run(
+            sizes,
+            config,
+            probe=lambda url: probe_media(
+                url, auth.bearer_headers(credentials)
+            ),
+            size=sizes.get,
+        )
+        log.logger.info(f'Dry run estimate: {json.dumps(estimate)}')
+        return
+
+    if drive_source:
+        video_uris = drive_source.iter_downloads(drive_source.sync())
+    else:
+        video_uris = iter_video_files_gcs(config, cache, resources.clients)
+
+    df_results = process_videos_and_create_df(
+        video_uris, config, cache, resources=resources
+    )
+
+    if not df_results.empty:
+        with log.tracer.span('sink', sink='sheets'):
+            output_url = SheetsRunWriter(config).write_run(df_results)
+        log.logger.info(
+            'Finished Video Ads Compass analysis. '
+            f'Find results here: {output_url}'
+        )
+    else:
+        log.logger.info('No results to upload to Google Sheets.')
+
+    if drive_source:
+        # Videos that failed or returned nothing are synced again next run.
+        drive_source.commit(
+            set(df_results['video_uri']) if not df_results.empty else set()
+        )
+
+
+def run_tenants(config: Config) -> Dict[str, Dict[str, Any]]:
+    """Runs every tenant of the manifest in one process.
+    Tenants run concurrently, each with its own bucket, rules, model and
+    spreadsheet, over one client pool. They share the concurrency, token
+    quota and memory budget of the base config and get video slots by
+    weighted fair queuing, so a large tenant cannot starve the others.
+    Tenants without their own drive_state_path get the base one with their
+    name added, so they do not overwrite each other's Drive position.
+
+    Args:
+        config: The base Config object, naming the tenants manifest.
+    Returns:
+        The metrics of each tenant, with the error of a failed run.
+    """
+    resources = SharedResources(config)
+    tenant_configs = []
+    for tenant in load_manifest(config.tenants_path):
+        tenant_config = Config(tenant)
+        if not tenant.get('drive_state_path'):
+            tenant_config.drive_state_path = tenant_path(
+                tenant_config.drive_state_path, tenant_config.tenant_name
+            )
+        tenant_configs.append(tenant_config)
+
+    def run(tenant_config: Config) -> None:
+        started = time.monotonic()
+        try:
+            with log.tracer.span('tenant', tenant=tenant_config.tenant_name):
+                run_batch(
+                    tenant_config,
+                    VideoCache(
+                        os.path.join(
+                            tenant_config.cache_dir, tenant_config.tenant_name
+                        ),
+                        tenant_config.cache_max_bytes,
+                    ),
+                    resources,
+                )
+        finally:
+            resources.metrics(tenant_config.tenant_name).run_seconds = (
+                time.monotonic() - started
+            )
+
+    with ThreadPoolExecutor(max_workers=len(tenant_configs) or 1) as executor:
+        futures = {
+            tenant_config.tenant_name: executor.submit(run, tenant_config)
+            for tenant_config in tenant_configs
+        }
+    for tenant, future in futures.items():
+        if future.exception():
+            log.logger.error(
+                f'Tenant {tenant} failed', exc_info=future.exception()
+            )
+            resources.metrics(tenant).error = repr(future.exception())
+    report = resources.report()
+    for tenant, metrics in report.items():
+        log.logger.info(f'Tenant {tenant}: {json.dumps(metrics)}')
+    return report
+
+
+def main() -> int:
     """Main function to orchestrate the Video Ads Compass workflow.
 
     Args:
         None
     Returns:
-        None
+        The exit status, 1 if a tenant failed.
     """
 
     config = Config()
+    log.configure(config.log_format)
+    cache = VideoCache(config.cache_dir, config.cache_max_bytes)
 
-    video_uris = download_and_list_video_files_gcs(config)
+    if config.run_mode == 'WATCH':
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop.set())
+        watch_videos(config, cache, stop)
+        if config.trace_path:
+            log.tracer.export(config.trace_path, config.trace_format)
+        return 0
 
-    df_results = process_videos_and_create_df(video_uris, config)
-
-    if not df_results.empty:
-        sheets_handler = GoogleSheetsHandler(config)
-        spreadsheet = sheets_handler.create_spreadsheet()
-        sheets_handler.upload_dataframe(spreadsheet, df_results)
-        output_url = sheets_handler.format_spreadsheet(spreadsheet)
-        print(
-            'Finished Video Ads Compass analysis. '
-            f'Find results here: {output_url}'
+    if config.run_mode == 'SAMPLE':
+        df_results, df_estimates = sample_videos(config, cache)
+        run_name = datetime.now().strftime('%Y%m%d_%H%M%S')
+        writer = SheetsRunWriter(config)
+        with log.tracer.span('sink', sink='sheets'):
+            if not df_results.empty:
+                writer.write_run(df_results, run_name)
+            output_url = writer.write_table(
+                df_estimates, f'{run_name} estimates'
+            )
+        log.logger.info(
+            f'Finished sampling {len(df_results)} verdicts. '
+            f'Find the estimates here: {output_url}'
         )
+        if config.trace_path:
+            log.tracer.export(config.trace_path, config.trace_format)
+        return 0
+
+    status = 0
+    if config.tenants_path:
+        report = run_tenants(config)
+        status = int(any(metrics['error'] for metrics in report.values()))
     else:
-        print('No results to upload to Google Sheets.')
+        run_batch(config, cache)
+    if config.trace_path:
+        log.tracer.export(config.trace_path, config.trace_format)
+    return status
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())